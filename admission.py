@@ -0,0 +1,121 @@
+# admission.py - ওভারলোডে নিচু অগ্রাধিকারের কাজ বাদ/পিছিয়ে দেওয়া
+# স্পাইকের সময় প্রতিটি আপডেট পুরোপুরি প্রসেস হলে (AI, লিডারবোর্ড স্ক্যান ইত্যাদি) সবার লেটেন্সি
+# ভেঙে পড়ে। আপডেট প্রসেসর প্রতিটি আপডেট হ্যান্ডলারে পাঠানোর আগে এখানে জিজ্ঞেস করে:
+#   - ওয়ালেট, ম্যাচ, রুম কোড, রেজিস্ট্রেশন ইত্যাদি সবসময় চলে
+#   - নিচু অগ্রাধিকার (AI, লিডারবোর্ড, প্রোফাইল) একসাথে ADMISSION_LOW_CONCURRENCY টির বেশি চলে না
+#     (বাকিগুলো অপেক্ষা করে), আর ওভারলোডে সরাসরি "ব্যস্ত" উত্তর পায়
+# ওভারলোড = in-flight আপডেট ADMISSION_MAX_INFLIGHT ছাড়ালে বা স্লটের অপেক্ষার EWMA
+# ADMISSION_LATENCY ছাড়ালে; দুটোই ADMISSION_RECOVER অনুপাতের নিচে নামলে স্বাভাবিক।
+import logging
+import time
+from typing import Any, Dict, Optional
+from telegram import Update
+import config
+
+logger = logging.getLogger(__name__)
+
+AI = 'ai'
+LEADERBOARD = 'leaderboard'
+PROFILE = 'profile'
+
+BUSY_TEXT = "⏳ এই মুহূর্তে অনেক চাপ, কিছুক্ষণ পরে আবার চেষ্টা করুন।"
+
+# মেইন কীবোর্ডের বাটন/কমান্ড -> নিচু অগ্রাধিকারের ধরন
+_LOW_TEXTS = {"📋 Profile": PROFILE, "🏆 Leaderboard": LEADERBOARD}
+_LOW_COMMANDS = {'ask': AI}
+_LOW_CALLBACKS = {'hist_': PROFILE}  # callback_data প্রিফিক্স
+
+def classify(update: object) -> Optional[str]:
+    """বাদ দেওয়া যায় এমন আপডেট হলে তার ধরন, না হলে None
+
+    সাধারণ টেক্সট (AI fallback) এখানে ধরা যায় না, কারণ সেটি ইউজারের স্টেটের উপর নির্ভর করে;
+    হ্যান্ডলার নিজে admit(AI) জিজ্ঞেস করে ও scheduling.low_priority() এ low স্লট নেয়।
+    """
+    if not isinstance(update, Update):
+        return None
+    if update.callback_query and update.callback_query.data:
+        data = update.callback_query.data
+        return next((kind for prefix, kind in _LOW_CALLBACKS.items() if data.startswith(prefix)), None)
+    if not update.message or not update.message.text:
+        return None
+    text = update.message.text.strip()
+    if text.startswith('/'):
+        parts = text[1:].split(maxsplit=1)
+        return _LOW_COMMANDS.get(parts[0].split('@')[0].lower()) if parts else None
+    return _LOW_TEXTS.get(text)
+
+class AdmissionController:
+    """in-flight আপডেট ও সাম্প্রতিক লেটেন্সি দেখে নিচু অগ্রাধিকারের কাজ ভর্তি করা"""
+    def __init__(self, max_inflight: int = config.ADMISSION_MAX_INFLIGHT,
+                 latency: float = config.ADMISSION_LATENCY, recover: float = config.ADMISSION_RECOVER):
+        self.max_inflight = max_inflight
+        self.latency = latency
+        self.recover = recover
+        self.inflight = 0
+        self.latency_ewma = 0.0
+        self.overloaded = False
+        self.overloaded_since = 0.0
+        self.overload_episodes = 0
+        self.admitted: Dict[str, int] = {}
+        self.shed: Dict[str, int] = {}
+
+    def enter(self) -> None:
+        self.inflight += 1
+
+    def leave(self, seconds: Optional[float]) -> None:
+        """একটি আপডেট শেষ (আসা থেকে স্লট পাওয়া পর্যন্ত অপেক্ষা; বাদ দেওয়া/ব্যর্থ আপডেটে None)"""
+        self.inflight -= 1
+        if seconds is not None:
+            self.latency_ewma += config.ADMISSION_EWMA_ALPHA * (seconds - self.latency_ewma)
+
+    def _update_state(self) -> bool:
+        if self.inflight <= 1:
+            # কিছুই চলছে না: পুরনো লেটেন্সি EWMA দিয়ে আটকে থাকার কারণ নেই
+            hot = False
+        elif self.overloaded:
+            hot = (self.inflight >= self.max_inflight * self.recover
+                   or self.latency_ewma >= self.latency * self.recover)
+        else:
+            hot = self.inflight >= self.max_inflight or self.latency_ewma >= self.latency
+        if hot != self.overloaded:
+            self.overloaded = hot
+            if hot:
+                self.overloaded_since = time.monotonic()
+                self.overload_episodes += 1
+                logger.warning(f"Admission: overload ({self.inflight} in flight, "
+                               f"latency ewma {self.latency_ewma * 1000:.0f} ms), shedding low-priority work")
+            else:
+                logger.info(f"Admission: recovered after {time.monotonic() - self.overloaded_since:.1f}s, "
+                            f"shed so far {sum(self.shed.values())}")
+        return hot
+
+    def admit(self, kind: str) -> bool:
+        """নিচু অগ্রাধিকারের কাজ এখন চালানো যাবে কিনা (না হলে shed গোনা হয়)"""
+        if self._update_state():
+            self.shed[kind] = self.shed.get(kind, 0) + 1
+            return False
+        self.admitted[kind] = self.admitted.get(kind, 0) + 1
+        return True
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'overloaded': self._update_state(), 'inflight': self.inflight, 'max_inflight': self.max_inflight,
+                'latency_ewma_ms': round(self.latency_ewma * 1000, 1),
+                'latency_limit_ms': round(self.latency * 1000), 'episodes': self.overload_episodes,
+                'admitted': dict(self.admitted), 'shed': dict(self.shed)}
+
+async def reply_busy(update: object) -> None:
+    """বাদ দেওয়া আপডেটের দ্রুত উত্তর (হ্যান্ডলার, DB বা AI না ছুঁয়ে)
+
+    বাটনে (callback) নতুন মেসেজ নয়, answer() - না হলে বাটনের স্পিনার আটকে থাকে।
+    """
+    try:
+        if not isinstance(update, Update):
+            return
+        if update.callback_query:
+            await update.callback_query.answer(BUSY_TEXT)
+        elif update.effective_message:
+            await update.effective_message.reply_text(BUSY_TEXT)
+    except Exception as e:
+        logger.debug(f"Busy reply failed: {e}")
+
+controller = AdmissionController()
@@ -3,43 +3,52 @@ import requests
 import config
 import logging
 import db
+import faq
 import asyncio
 import json
-from typing import Optional, Dict, Any
+import monitor
+import resilience
+from typing import Optional, Dict, Any, AsyncIterator, Tuple
 import time
 
 logger = logging.getLogger(__name__)
 
-# Retry mechanism
-MAX_RETRIES = 2
-RETRY_DELAY = 1  # второе
+# ব্রেকার ও AIMD সীমা প্রসেস-প্রতি (প্রতিটি webhook worker নিজের হিসাব রাখে)
+breaker = resilience.CircuitBreaker('groq', config.AI_BREAKER_FAILURES, config.AI_BREAKER_COOLDOWN,
+                                    config.AI_BREAKER_MAX_COOLDOWN)
+limiter = resilience.AIMDLimiter(config.AI_CONCURRENCY_INITIAL, config.AI_CONCURRENCY_MIN,
+                                 config.AI_CONCURRENCY_MAX, config.AI_LATENCY_TARGET)
 
-async def get_ai_response(user_query: str, user_info: Optional[Dict[str, Any]] = None, retry_count: int = 0) -> str:
-    """
-    Groq API ব্যবহার করে AI রেসপন্সপান (উন্নত সংস্করণ)
-    """
+DEGRADED_REPLY = ("AI সাপোর্ট সাময়িকভাবে ব্যস্ত। নিয়মাবলী দেখতে /rules লিখুন, "
+                  "টাকা সংক্রান্ত সমস্যায় অ্যাডমিনের সাথে যোগাযোগ করুন।")
+
+def health() -> Dict[str, Any]:
+    """ব্রেকার ও concurrency সীমার অবস্থা"""
+    return resilience.snapshot(breaker, limiter)
+
+async def build_payload(user_query: str, user_info: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Groq chat completions রিকোয়েস্ট বডি"""
+    # 1. ডাটাবেস থেকে রুলস আনা
     try:
-        # 1. ডাটাবেস থেকে রুলস আনা
-        try:
-            rules = await db.get_setting('rules_text')
-            if not rules:
-                rules = "সাধারণ eFootball নিয়মাবলী প্রযোজ্য।"
-        except Exception as e:
-            logger.warning(f"Failed to fetch rules: {e}")
-            rules = "সাধারণ নিয়মাবলী।"
-
-        # 2. ইউজার ইনফো নিরাপদে পান
-        user_name = 'Guest'
-        user_balance = 0
-        user_wins = 0
-
-        if user_info:
-            user_name = user_info.get('ingame_name', 'Guest') or 'Guest'
-            user_balance = user_info.get('balance', 0) or 0
-            user_wins = user_info.get('wins', 0) or 0
-
-        # 3. প্রম্পট তৈরি (System Prompt - উন্নত)
-        system_prompt = f'''আপনি 'eFootball Tournament Bot' এর একজন AI Admin।
+        rules = await db.get_setting('rules_text')
+        if not rules:
+            rules = "সাধারণ eFootball নিয়মাবলী প্রযোজ্য।"
+    except Exception as e:
+        logger.warning(f"Failed to fetch rules: {e}")
+        rules = "সাধারণ নিয়মাবলী।"
+
+    # 2. ইউজার ইনফো নিরাপদে পান
+    user_name = 'Guest'
+    user_balance = 0
+    user_wins = 0
+
+    if user_info:
+        user_name = user_info.get('ingame_name', 'Guest') or 'Guest'
+        user_balance = user_info.get('balance', 0) or 0
+        user_wins = user_info.get('wins', 0) or 0
+
+    # 3. প্রম্পট তৈরি (System Prompt - উন্নত)
+    system_prompt = f'''আপনি 'eFootball Tournament Bot' এর একজন AI Admin।
 ভাষা: বাংলা (Bangla)।
 উত্তর ছোট, বন্ধুত্বপূর্ণ এবং সহায়ক রাখুন (৫০-১০০ শব্দের মধ্যে)।
 
@@ -63,71 +72,193 @@ async def get_ai_response(user_query: str, user_info: Optional[Dict[str, Any]] =
 3. টাকার সমস্যা নিয়ে আসলে সরাসরি অ্যাডমিনদের সাথে যোগাযোগ করতে বলুন
 4. অবশ্যই বন্ধুত্বপূর্ণ এবং পেশাদার থাকুন'''
 
-        # 4. Groq API রিকোয়েস্ট
-        url = "https://api.groq.com/openai/v1/chat/completions"
-
-        headers = {
-            "Authorization": f"Bearer {config.GROQ_API_KEY}",
-            "Content-Type": "application/json"
-        }
-
-        payload = {
-            "model": "mixtral-8x7b-32768",  # Groq এর দ্রুত মডেল
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_query[:500]}  # 500 অক্ষর সীমা
-            ],
-            "temperature": 0.7,
-            "max_tokens": 256,  # আরো ছোট রেসপন্স
-            "top_p": 0.95
-        }
-
-        # 5. রিকোয়েস্ট পাঠানো
-        loop = asyncio.get_event_loop()
-        response = await asyncio.wait_for(
-            loop.run_in_executor(
-                None,
-                lambda: requests.post(
-                    url,
-                    headers=headers,
-                    json=payload,
-                    timeout=config.REQUEST_TIMEOUT
-                )
-            ),
-            timeout=config.REQUEST_TIMEOUT + 5
-        )
-
-        if response.status_code == 200:
-            data = response.json()
-            ai_response = data['choices'][0]['message']['content'].strip()
-
-            # ছোট করুন যদি প্রয়োজন হয়
-            if len(ai_response) > 500:
-                ai_response = ai_response[:497] + '...'
-
-            return ai_response
-        elif response.status_code == 429 and retry_count < MAX_RETRIES:
-            # Rate limited - retry করুন
-            logger.warning(f"Rate limited, retrying... (attempt {retry_count + 1})")
-            await asyncio.sleep(RETRY_DELAY * (retry_count + 1))
-            return await get_ai_response(user_query, user_info, retry_count + 1)
-        else:
-            logger.error(f"Groq API Error: {response.status_code} - {response.text[:200]}")
-            return "সার্ভারে একটু সমস্যা হয়েছে। পরে আবার চেষ্টা করুন।"
+    return {
+        "model": "mixtral-8x7b-32768",  # Groq এর দ্রুত মডেল
+        "messages": [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_query[:500]}  # 500 অক্ষর সীমা
+        ],
+        "temperature": 0.7,
+        "max_tokens": 256,  # আরো ছোট রেসপন্স
+        "top_p": 0.95
+    }
+
+def _headers() -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {config.GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
 
-    except asyncio.TimeoutError:
+ERROR_REPLY = "সার্ভারে একটু সমস্যা হয়েছে। পরে আবার চেষ্টা করুন।"
+# স্ট্রিম মাঝপথে ভাঙলে আংশিক উত্তরের শেষে (যাতে ইউজার কাটা উত্তরকে পূর্ণ না ভাবে)
+STREAM_CUT_SUFFIX = "\n\n⚠️ উত্তর মাঝপথে থেমে গেছে। আবার চেষ্টা করুন।"
+MAX_REPLY_CHARS = 500
+
+def _error_reply(e: BaseException) -> str:
+    """এক্সেপশন অনুযায়ী ইউজারকে দেখানো বার্তা"""
+    if isinstance(e, asyncio.TimeoutError):
         logger.error("Groq API Request Timeout")
         return "রিকোয়েস্ট সময়মতো রেসপন্স দেয়নি। পরে চেষ্টা করুন।"
-    except requests.exceptions.ConnectionError:
+    if isinstance(e, requests.exceptions.ConnectionError):
         logger.error("Network Connection Error")
         return "ইন্টারনেট সংযোগে সমস্যা। আপনার নেটওয়ার্ক চেক করুন।"
-    except requests.exceptions.Timeout:
+    if isinstance(e, requests.exceptions.Timeout):
         logger.error("Request Timeout")
         return "সময় শেষ হয়ে গেছে। পরে আবার চেষ্টা করুন।"
-    except (json.JSONDecodeError, KeyError):
+    if isinstance(e, (json.JSONDecodeError, KeyError)):
         logger.error("Invalid JSON Response from Groq API")
         return "API রেসপন্স ত্রুটিপূর্ণ। আবার চেষ্টা করুন।"
+    logger.error(f"Unexpected Error in AI Response: {e}", exc_info=e)
+    return "একটি অপ্রত্যাশিত ত্রুটি হয়েছে। অনুগ্রহ করে পরে চেষ্টা করুন।"
+
+async def _request(payload: Dict[str, Any], stream: bool = False) -> Tuple[Optional[requests.Response], Optional[str]]:
+    """ব্রেকার, AIMD সীমা ও backoff সহ Groq রিকোয়েস্ট; (200 রেসপন্স, None) অথবা (None, বিকল্প উত্তর)
+
+    stream=True হলে সফল রেসপন্সের concurrency স্লট ধরে রাখা হয়; বডি পড়া শেষে
+    কলারকে limiter.release() করতে হবে।
+    """
+    loop = asyncio.get_running_loop()
+    for attempt in range(config.AI_MAX_RETRIES + 1):
+        # ব্রেকার খোলা: নেটওয়ার্কে না গিয়ে সাথে সাথে বিকল্প উত্তর
+        if not breaker.allow():
+            return None, DEGRADED_REPLY
+        # half-open probe স্লট: ফলাফল রেকর্ড না হয়ে যেকোনোভাবে বের হলে (বাতিল, অপ্রত্যাশিত
+        # এক্সেপশন, limiter এর অপেক্ষা) finally ফেরত দেয়, না হলে ব্রেকার half-open এ আটকে থাকে
+        recorded = False
+        try:
+            if not await limiter.acquire(config.AI_QUEUE_WAIT):
+                return None, DEGRADED_REPLY
+            started = time.monotonic()
+            try:
+                response = await asyncio.wait_for(
+                    loop.run_in_executor(
+                        monitor.ai_pool,
+                        lambda: requests.post(config.GROQ_API_URL, headers=_headers(), json=payload,
+                                              timeout=config.REQUEST_TIMEOUT, stream=stream)
+                    ),
+                    timeout=config.REQUEST_TIMEOUT + 5
+                )
+            except (asyncio.TimeoutError, requests.exceptions.RequestException):
+                limiter.on_overload()
+                breaker.record_failure()
+                recorded = True
+                await limiter.release()
+                raise
+            except BaseException:
+                await limiter.release()
+                raise
+            latency = time.monotonic() - started
+
+            if response.status_code == 200:
+                limiter.on_success(latency)
+                breaker.record_success()
+                recorded = True
+                if not stream:
+                    await limiter.release()
+                return response, None
+            await limiter.release()
+
+            retryable = response.status_code == 429 or response.status_code >= 500
+            if response.status_code == 429:
+                limiter.on_overload()
+            if retryable:
+                breaker.record_failure()
+            else:
+                breaker.record_success()  # সার্ভার সাড়া দিয়েছে; রিকোয়েস্টের সমস্যা
+            recorded = True
+        finally:
+            if not recorded:
+                breaker.release_probe()
+        retry_after = resilience.parse_retry_after(response.headers.get('Retry-After'))
+        if not retryable or attempt == config.AI_MAX_RETRIES or breaker.state == resilience.OPEN or \
+                (retry_after or 0) > config.AI_MAX_RETRY_AFTER:
+            logger.error(f"Groq API Error: {response.status_code} - {response.text[:200]}")
+            return None, DEGRADED_REPLY if retryable else ERROR_REPLY
+        delay = resilience.backoff_delay(attempt, config.AI_BACKOFF_BASE, config.AI_BACKOFF_CAP, retry_after)
+        logger.warning(f"Groq {response.status_code}, retrying in {delay:.1f}s (attempt {attempt + 1})")
+        await asyncio.sleep(delay)
+    return None, DEGRADED_REPLY
+
+async def get_ai_response(user_query: str, user_info: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Groq API ব্যবহার করে AI রেসপন্সপান (উন্নত সংস্করণ)
+    """
+    try:
+        # 0. লোকাল FAQ ইন্ডেক্সে আত্মবিশ্বাসী মিল থাকলে সাথে সাথে উত্তর
+        local = await faq.answer(user_query)
+        if local:
+            return local
+
+        payload = await build_payload(user_query, user_info)
+        response, reply = await _request(payload)
+        if reply:
+            return reply
+        data = response.json()
+        ai_response = data['choices'][0]['message']['content'].strip()
+
+        # ছোট করুন যদি প্রয়োজন হয়
+        if len(ai_response) > MAX_REPLY_CHARS:
+            ai_response = ai_response[:MAX_REPLY_CHARS - 3] + '...'
+
+        return ai_response
+    except Exception as e:
+        return _error_reply(e)
+
+def _pump_sse(response: requests.Response, loop: asyncio.AbstractEventLoop, q: asyncio.Queue) -> None:
+    """(থ্রেডে) SSE লাইন পড়ে content delta গুলো queue তে পাঠানো; শেষে None বা এক্সেপশন"""
+    try:
+        for raw in response.iter_lines():
+            if not raw.startswith(b'data:'):
+                continue
+            data = raw[5:].strip()
+            if data == b'[DONE]':
+                break
+            delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+            if delta:
+                loop.call_soon_threadsafe(q.put_nowait, delta)
+        loop.call_soon_threadsafe(q.put_nowait, None)
     except Exception as e:
-        logger.error(f"Unexpected Error in AI Response: {e}", exc_info=True)
-        return "একটি অপ্রত্যাশিত ত্রুটি হয়েছে। অনুগ্রহ করে পরে চেষ্টা করুন।"
+        loop.call_soon_threadsafe(q.put_nowait, e)
 
+async def stream_ai_response(user_query: str, user_info: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+    """SSE স্ট্রিমিং উত্তর; টেক্সটের টুকরোগুলো আসার সাথে সাথে yield করে"""
+    sent = 0
+    try:
+        local = await faq.answer(user_query)
+        if local:
+            yield local
+            return
+
+        payload = await build_payload(user_query, user_info)
+        payload['stream'] = True
+        response, reply = await _request(payload, stream=True)
+        if reply:
+            yield reply
+            return
+        loop = asyncio.get_running_loop()
+        q: asyncio.Queue = asyncio.Queue()
+        pump = loop.run_in_executor(monitor.ai_pool, _pump_sse, response, loop, q)
+        try:
+            while True:
+                item = await asyncio.wait_for(q.get(), timeout=config.REQUEST_TIMEOUT)
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                if sent == 0:
+                    item = item.lstrip()
+                room = MAX_REPLY_CHARS - 3 - sent
+                if len(item) > room:
+                    yield item[:room] + '...'
+                    sent = MAX_REPLY_CHARS
+                    break
+                if item:
+                    sent += len(item)
+                    yield item
+        finally:
+            response.close()  # pump থ্রেডের iter_lines শেষ করে
+            await limiter.release()
+            await asyncio.gather(pump, return_exceptions=True)
+    except Exception as e:
+        reply = _error_reply(e)
+        yield STREAM_CUT_SUFFIX if sent else reply
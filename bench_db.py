@@ -0,0 +1,64 @@
+# bench_db.py - SQLite প্রোফাইল বেঞ্চমার্ক
+# ব্যবহার: python bench_db.py [--ops 5000] [--users 2000] [--profiles default,balanced,fast]
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+import config
+import db
+
+def _time_ops(func, args_list):
+    """প্রতিটি কল চালিয়ে ops/sec ও গড় লেটেন্সি ফেরত দেয়"""
+    start = time.perf_counter()
+    for args in args_list:
+        func(*args)
+    elapsed = time.perf_counter() - start
+    n = len(args_list)
+    return n / elapsed, elapsed / n * 1e6
+
+def bench_profile(name: str, workdir: Path, ops: int, users: int):
+    """একটি প্রোফাইলের জন্য নতুন ডাটাবেসে hot functions মাপা"""
+    db.close_conn()
+    config.DB_PROFILE = name
+    config.LOCAL_DB = str(workdir / f'bench_{name}.db')
+    db.init_db()
+
+    conn = db.get_conn()
+    conn.execute("BEGIN")
+    conn.executemany('INSERT OR IGNORE INTO users(user_id, ingame_name, is_registered, balance) VALUES(?,?,1,100)',
+                     [(uid, f'player{uid}') for uid in range(1, users + 1)])
+    conn.execute("COMMIT")
+
+    rnd = random.Random(42)
+    uids = [(rnd.randint(1, users),) for _ in range(ops)]
+    results = {
+        'get_user_sync': _time_ops(db.get_user_sync, uids),
+        'get_top_wins_sync': _time_ops(db.get_top_wins_sync, [(10,)] * ops),
+        'get_all_ids_sync': _time_ops(db.get_all_ids_sync, [()] * max(1, ops // 100)),
+        'adjust_balance_sync': _time_ops(db.adjust_balance_sync, [(u, 1.0, 'bench') for (u,) in uids]),
+        'add_queue_sync': _time_ops(db.add_queue_sync, [(u, 20.0, 0) for (u,) in uids]),
+    }
+    db.close_conn()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite performance profile benchmark')
+    parser.add_argument('--ops', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--profiles', default=','.join(config.DB_PROFILES))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = []
+        for name in args.profiles.split(','):
+            for func, (ops_s, us) in bench_profile(name, Path(tmp), args.ops, args.users).items():
+                rows.append((name, func, ops_s, us))
+
+    print(f"{'profile':<10} {'function':<22} {'ops/s':>10} {'us/op':>9}")
+    for name, func, ops_s, us in rows:
+        print(f"{name:<10} {func:<22} {ops_s:>10.0f} {us:>9.1f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+# bench_handlers.py - bot.py হ্যান্ডলারের বেঞ্চমার্ক (নেটওয়ার্ক ও ডিস্ক I/O ছাড়া)
+# নকল Bot অবজেক্ট সব API কল সাথে সাথে ফেরত দেয়, আর ডিফল্ট MemoryStorage ব্যাকএন্ড
+# ডিস্ক ছোঁয় না, তাই ফলাফলে শুধু হ্যান্ডলার ও স্টোরেজ লজিকের খরচ থাকে।
+# ব্যবহার: python bench_handlers.py [--backend memory|sqlite] [--ops 2000] [--users 500]
+import argparse
+import asyncio
+import datetime
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from telegram import CallbackQuery, Chat, Message, Update, User
+import config
+import db
+import storage
+
+class NullBot:
+    """Bot API কল গোনে এবং সাথে সাথে ফেরত দেয়"""
+    defaults = None
+    username = 'bench_bot'
+
+    def __init__(self):
+        self.calls = 0
+        self._ids = 0
+
+    async def _ok(self, *args, **kwargs):
+        self.calls += 1
+        return True
+
+    async def send_message(self, chat_id=None, text=None, *args, **kwargs):
+        self.calls += 1
+        self._ids += 1
+        msg = Message(self._ids, datetime.datetime.now(), Chat(chat_id or 0, 'private'), text=text)
+        msg.set_bot(self)
+        return msg
+
+    async def get_chat_member(self, *args, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(status='member')
+
+    def __getattr__(self, name):
+        # edit_message_text, answer_callback_query, send_chat_action ইত্যাদি
+        return self._ok
+
+def _message(bot: NullBot, uid: int, text: str) -> Update:
+    msg = Message(1, datetime.datetime.now(), Chat(uid, 'private'), from_user=User(uid, f'u{uid}', False), text=text)
+    msg.set_bot(bot)
+    return Update(1, message=msg)
+
+def _callback(bot: NullBot, uid: int, data: str) -> Update:
+    user = User(uid, f'u{uid}', False)
+    msg = Message(1, datetime.datetime.now(), Chat(uid, 'private'), from_user=user, text='menu')
+    msg.set_bot(bot)
+    q = CallbackQuery(str(uid), user, 'bench', message=msg, data=data)
+    q.set_bot(bot)
+    return Update(1, callback_query=q)
+
+def _setup(backend: str, workdir: Path, users: int) -> None:
+    if backend == 'sqlite':
+        db.close_conn()
+        config.LOCAL_DB = str(workdir / 'bench_handlers.db')
+        db.init_db()
+    b = storage.create(backend)
+    db.set_backend(b)
+    for uid in range(1, users + 1):
+        b.create_user(uid, f'player{uid}', None)
+        b.update_user_fields(uid, {'is_registered': 1, 'balance': 1000.0, 'elo_rating': 1000 + uid % 300})
+
+async def _bench(ops: int, users: int):
+    import bot  # লগিং সেটআপ ইমপোর্টে হয়, তারপর চুপ করানো
+    logging.getLogger().setLevel(logging.WARNING)
+    nb = NullBot()
+    ctx = SimpleNamespace(bot=nb, args=[], job_queue=None, application=None)
+    rnd = random.Random(42)
+    scenarios = {
+        'wallet': (bot.main_text_handler, lambda u: _message(nb, u, "💰 My Wallet")),
+        'profile': (bot.main_text_handler, lambda u: _message(nb, u, "📋 Profile")),
+        'leaderboard': (bot.main_text_handler, lambda u: _message(nb, u, "🏆 Leaderboard")),
+        'play_menu': (bot.main_text_handler, lambda u: _message(nb, u, "🎮 Play 1v1")),
+        'play_fee_20': (bot.cb_handler, lambda u: _callback(nb, u, 'play_fee_20')),
+        'cancel_queue': (bot.cb_handler, lambda u: _callback(nb, u, f'cancel_{u}')),
+    }
+    results = []
+    for name, (handler, make) in scenarios.items():
+        updates = [make(rnd.randint(1, users)) for _ in range(ops)]
+        calls_before = nb.calls
+        lat = []
+        start = time.perf_counter()
+        for upd in updates:
+            t = time.perf_counter()
+            await handler(upd, ctx)
+            lat.append(time.perf_counter() - t)
+        elapsed = time.perf_counter() - start
+        lat.sort()
+        results.append((name, ops / elapsed, lat[len(lat) // 2] * 1e6, lat[int(len(lat) * 0.99)] * 1e6,
+                        (nb.calls - calls_before) / ops))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='bot.py handler benchmark without network/disk I/O')
+    parser.add_argument('--backend', default='memory', choices=list(storage.BACKENDS))
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _setup(args.backend, Path(tmp), args.users)
+        rows = asyncio.run(_bench(args.ops, args.users))
+        db.close_conn()
+
+    print(f"backend: {args.backend}")
+    print(f"{'handler':<14} {'ops/s':>9} {'p50 us':>9} {'p99 us':>9} {'api/op':>7}")
+    for name, ops_s, p50, p99, api in rows:
+        print(f"{name:<14} {ops_s:>9.0f} {p50:>9.1f} {p99:>9.1f} {api:>7.1f}")
+
+if __name__ == '__main__':
+    main()
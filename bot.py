@@ -1,19 +1,41 @@
 # bot.py - Termux Compatible & Enhanced
+import time
+_BOOT_START = time.perf_counter()
 import logging
+import math
 import re
 import json
 import asyncio
 import signal
 import sys
-from datetime import datetime, timedelta
+from datetime import datetime
+_BOOT_MARKS = [('stdlib', time.perf_counter())]
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+from telegram.error import BadRequest, RetryAfter
 from telegram.ext import Application, CommandHandler, MessageHandler, filters, ContextTypes, CallbackQueryHandler
+_BOOT_MARKS.append(('telegram', time.perf_counter()))
 import db
 import config
-import ai_manager
+import admission
+import backup
+import deposits
+import export
+import faq
+import jobs
+import lobby
+import monitor
+import outbound
+import reaper
+import referrals
+import reviews
+import scheduling
+import tournament
+import utils
+_BOOT_MARKS.append(('db/config', time.perf_counter()))
+# ai_manager (এবং requests) প্রথম AI রিকোয়েস্টে লোড হয়, দেখুন _ai()
 
 # --- Logging Setup ---
-import os
+config.ensure_dirs()
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -22,6 +44,7 @@ logging.basicConfig(
         logging.StreamHandler()  # কনসোলেও প্রদর্শন
     ]
 )
+_BOOT_MARKS.append(('logging', time.perf_counter()))
 logger = logging.getLogger(__name__)
 
 # --- Keyboards ---
@@ -35,6 +58,20 @@ CANCEL_KEYBOARD = ReplyKeyboardMarkup([["❌ Cancel"]], resize_keyboard=True)
 # --- Global Application Reference ---
 app_instance = None
 
+def _ai():
+    """AI/HTTP স্ট্যাক প্রথম ব্যবহারে লোড করা (দ্রুত স্টার্টআপ)"""
+    import ai_manager
+    return ai_manager
+
+def print_startup_profile(marks):
+    """স্টার্টআপ সময়ের বিশ্লেষণ প্রিন্ট করা"""
+    prev = _BOOT_START
+    print("Startup profile:")
+    for label, t in marks:
+        print(f"  {label:<12} {(t - prev) * 1000:8.1f} ms")
+        prev = t
+    print(f"  {'total':<12} {(prev - _BOOT_START) * 1000:8.1f} ms")
+
 async def ensure_user(update: Update, referrer_id: int = None):
     """ইউজার তৈরি বা পান"""
     user_obj = update.effective_user
@@ -43,7 +80,7 @@ async def ensure_user(update: Update, referrer_id: int = None):
     if not await db.get_user(user_obj.id):
         await db.create_user_if_not_exists(user_obj.id, user_obj.username or user_obj.first_name, referrer_id)
     user = await db.get_user(user_obj.id)
-    if user and user.get('is_banned'):
+    if user and user.is_banned:
         return None
     return user
 
@@ -106,6 +143,7 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if txt == "❌ Cancel":
             await db.set_user_state(user['user_id'], None)
             await db.remove_from_queue(user['user_id'])
+            lobby.manager.touch()
             return await update.message.reply_text("বাতিল করা হয়েছে।", reply_markup=MAIN_KEYBOARD)
 
         # State Machine
@@ -119,6 +157,7 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             if not user.get('welcome_given'):
                 await db.adjust_balance(user['user_id'], 10.0, 'welcome_bonus')
                 await db.update_user_fields(user['user_id'], {'welcome_given': 1})
+            await referrals.on_registered(user['user_id'])
             await db.set_user_state(user['user_id'], None)
             return await update.message.reply_text('রেজিস্ট্রেশন সম্পন্ন!', reply_markup=MAIN_KEYBOARD)
 
@@ -128,8 +167,11 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             match = await db.get_match(match_id)
             if match:
                 await context.bot.send_message(user['user_id'], f"রুম কোড `{txt}` পাঠানো হয়েছে।", parse_mode='Markdown', reply_markup=MAIN_KEYBOARD)
-                await context.bot.send_message(match['player2_id'], f"⚔️ ম্যাচ শুরু!\nRoom Code: `{txt}`\nখেলা শেষে স্ক্রিনশট দিন।", parse_mode='Markdown')
-                context.job_queue.run_once(check_match_timeout, timedelta(minutes=15), data={'match_id': match_id})
+                await context.bot.send_message(match['player2_id'], f"⚔️ ম্যাচ শুরু!\nRoom Code: `{txt}`\nখেলা শেষে স্ক্রিনশট দিন।", parse_mode='Markdown',
+                                               rate_limit_args=outbound.MATCH)
+                # দুই খেলোয়াড়ই এখন স্ক্রিনশটের অপেক্ষায়
+                await db.set_user_state(match['player2_id'], 'awaiting_screenshot', match_id)
+                return await db.set_user_state(user['user_id'], 'awaiting_screenshot', match_id)
             return await db.set_user_state(user['user_id'], None)
 
         if state == 'awaiting_withdraw_amount':
@@ -150,7 +192,8 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("রিকোয়েস্ট সফল।", reply_markup=MAIN_KEYBOARD)
             for a in config.ADMINS:
                 try:
-                    await context.bot.send_message(a, f"New Withdraw: {req_id} | {data['amount']}TK | {txt}")
+                    await context.bot.send_message(a, f"New Withdraw: {req_id} | {data['amount']}TK | {txt}",
+                                                   rate_limit_args=outbound.ADMIN)
                 except Exception as e:
                     logger.warning(f"Failed to notify admin {a}: {e}")
             return await db.set_user_state(user['user_id'], None)
@@ -168,20 +211,28 @@ async def main_text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Deposit Regex
         m = re.match(r'^([A-Za-z0-9]+)\s+(\d+(?:\.\d{1,2})?)$', txt)
         if m:
-            await db.create_deposit_request(user['user_id'], m.group(1), float(m.group(2)))
+            status, req_id = await deposits.submit(user['user_id'], m.group(1), float(m.group(2)))
+            if status == deposits.DUPLICATE:
+                return await update.message.reply_text("❌ এই TrxID দিয়ে আগেই রিকোয়েস্ট করা হয়েছে।")
+            if status == deposits.VELOCITY:
+                return await update.message.reply_text("⏳ অনেকগুলো ডিপোজিট রিকোয়েস্ট হয়েছে, কিছুক্ষণ পরে চেষ্টা করুন।")
+            if status != deposits.OK:
+                return await update.message.reply_text("একটি ত্রুটি ঘটেছে। পরে চেষ্টা করুন।")
             await update.message.reply_text("ডিপোজিট রিকোয়েস্ট জমা হয়েছে।")
             for a in config.ADMINS:
                 try:
-                    await context.bot.send_message(a, f"New Deposit: {m.group(2)}TK")
+                    await context.bot.send_message(a, f"New Deposit: {req_id} | {m.group(2)}TK",
+                                                   rate_limit_args=outbound.ADMIN)
                 except Exception as e:
                     logger.warning(f"Failed to notify admin {a}: {e}")
             return
 
-        # AI Fallback
+        # AI Fallback (ওভারলোডে বাদ, না হলে low স্লটে; স্টেট জানার পরেই বোঝা যায় এটি AI প্রশ্ন)
         if not state:
-            await context.bot.send_chat_action(chat_id=user['user_id'], action="typing")
-            ai_reply = await ai_manager.get_ai_response(txt, user)
-            await update.message.reply_text(f"🤖 {ai_reply}")
+            if not admission.controller.admit(admission.AI):
+                return await update.message.reply_text(admission.BUSY_TEXT)
+            async with scheduling.low_priority():
+                await reply_ai(update, context, txt, user)
     except Exception as e:
         logger.error(f"Error in main_text_handler: {e}")
         await update.message.reply_text("একটি ত্রুটি ঘটেছে। পরে চেষ্টা করুন।")
@@ -192,12 +243,53 @@ async def ask_ai(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if not context.args:
             return await update.message.reply_text("ব্যবহার: /ask <আপনার প্রশ্ন>")
         user = await ensure_user(update)
-        res = await ai_manager.get_ai_response(" ".join(context.args), user)
-        await update.message.reply_text(f"🤖 {res}")
+        await reply_ai(update, context, " ".join(context.args), user)
     except Exception as e:
         logger.error(f"Error in ask_ai: {e}")
         await update.message.reply_text("AI রেসপন্স পেতে ব্যর্থ।")
 
+async def reply_ai(update, context, query: str, user):
+    """AI উত্তর পাঠানো; স্ট্রিমিং চালু থাকলে প্রথম টুকরো আসতেই মেসেজ, তারপর থ্রটল করা এডিট"""
+    await context.bot.send_chat_action(chat_id=update.effective_chat.id, action="typing")
+    if not config.AI_STREAMING:
+        res = await _ai().get_ai_response(query, user)
+        return await update.message.reply_text(f"🤖 {res}")
+
+    msg = None
+    text = shown = ''
+    last_edit = 0.0
+    async for piece in _ai().stream_ai_response(query, user):
+        text += piece
+        now = time.monotonic()
+        try:
+            if msg is None:
+                msg = await update.message.reply_text(f"🤖 {text}")
+                shown, last_edit = text, now
+            elif now - last_edit >= config.STREAM_EDIT_INTERVAL:
+                # মাঝের টুকরোগুলো জমে এক এডিটে যায়
+                await msg.edit_text(f"🤖 {text}")
+                shown, last_edit = text, now
+        except RetryAfter as e:
+            last_edit = now + e.retry_after
+        except BadRequest as e:
+            logger.debug(f"AI stream edit skipped: {e}")
+    if msg is None:
+        await update.message.reply_text(f"🤖 {_ai().ERROR_REPLY}")
+    elif text != shown:
+        # শেষ এডিট বাদ পড়লে ইউজার কাটা উত্তর দেখে, তাই flood control এ অপেক্ষা করে আবার চেষ্টা
+        for attempt in range(3):
+            try:
+                await msg.edit_text(f"🤖 {text}")
+                break
+            except RetryAfter as e:
+                if attempt == 2:
+                    logger.warning(f"AI stream final edit dropped after flood control: {e}")
+                    break
+                await asyncio.sleep(e.retry_after)
+            except BadRequest as e:
+                logger.debug(f"AI stream final edit skipped: {e}")
+                break
+
 # --- Helper Views ---
 async def play_menu(update, context):
     """খেলার মেনু"""
@@ -212,15 +304,50 @@ async def wallet_menu(update, context):
     kb = [[InlineKeyboardButton('➕ Deposit', callback_data='deposit'), InlineKeyboardButton('➖ Withdraw', callback_data='withdraw')]]
     await update.message.reply_text(f"ব্যালেন্স: {u.get('balance',0):.2f} TK", reply_markup=InlineKeyboardMarkup(kb))
 
+async def _profile_view(u, page: int):
+    """প্রোফাইল টেক্সট ও হিস্টোরি পেজের বাটন (একটি match_history রেঞ্জ রিড থেকে)"""
+    size = config.HISTORY_PAGE_SIZE
+    # প্রথম পেজে ফর্ম/ট্রেন্ডের জন্য আরও কিছু সারি একই কুয়েরিতে; +1 পরের পেজ আছে কিনা জানতে
+    want = max(size, config.HISTORY_TREND_MATCHES) if page == 0 else size
+    rows = await db.get_history(u.user_id, page * size, want + 1)
+    games = (u.wins or 0) + (u.losses or 0)
+    streak = u.current_streak or 0
+    lines = [f"👤 নাম: {u.ingame_name}",
+             f"🏆 জিতেছে: {u.wins} | হেরেছে: {u.losses} | উইন রেট: {(u.wins or 0) * 100 / games if games else 0:.0f}%",
+             f"🎖 ELO: {u.elo_rating}",
+             f"🔥 স্ট্রিক: {abs(streak)}{'W' if streak > 0 else 'L' if streak < 0 else ''} (সেরা {u.best_streak or 0}W)"]
+    if page == 0 and rows:
+        recent = rows[:config.HISTORY_TREND_MATCHES]
+        lines.append(f"📈 ফর্ম: {''.join('W' if r.won else 'L' for r in reversed(recent))}")
+        rated = [r for r in recent if r.elo_before is not None]
+        if rated:
+            lines.append(f"📊 শেষ {len(rated)} ম্যাচে ELO: {rated[0].elo_after - rated[-1].elo_before:+d}")
+    page_rows = rows[:size]
+    if page_rows:
+        lines.append(f"\n🕹 সাম্প্রতিক ম্যাচ (পেজ {page + 1}):")
+        for r in page_rows:
+            delta = f" ({r.elo_after - r.elo_before:+d})" if r.elo_before is not None else ''
+            when = datetime.fromtimestamp(r.played_at).strftime('%d/%m %H:%M')
+            lines.append(f"{'✅' if r.won else '❌'} vs {r.opponent_name or r.opponent_id} · {r.fee:g} TK{delta} · {when}")
+    elif page > 0:
+        lines.append("\nআর কোনো ম্যাচ নেই।")
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ নতুন", callback_data=f"hist_{page - 1}"))
+    if len(rows) > size:
+        nav.append(InlineKeyboardButton("পুরনো ➡️", callback_data=f"hist_{page + 1}"))
+    return "\n".join(lines), InlineKeyboardMarkup([nav]) if nav else None
+
 async def show_profile(update, context):
     """প্রোফাইল দেখান"""
     u = await ensure_user(update)
-    await update.message.reply_text(f"👤 নাম: {u['ingame_name']}\n🏆 জিতেছে: {u['wins']}\n🎖 ELO: {u['elo_rating']}")
+    text, markup = await _profile_view(u, 0)
+    await update.message.reply_text(text, reply_markup=markup)
 
 async def show_leaderboard(update, context):
     """লিডারবোর্ড দেখান"""
     rows = await db.get_top_wins(5)
-    txt = "\n".join([f"{i+1}. {r['ingame_name']} ({r['elo_rating']})" for i, r in enumerate(rows)])
+    txt = "\n".join([f"{i+1}. {r.ingame_name} ({r.elo_rating})" for i, r in enumerate(rows)])
     await update.message.reply_text(f"🏆 সেরা খেলোয়াড়:\n{txt}")
 
 # --- Match Logic ---
@@ -232,42 +359,136 @@ async def handle_play_callback(update, context):
         uid = q.from_user.id
         u = await db.get_user(uid)
 
-        if fee > 0 and u['balance'] < fee:
+        if fee > 0 and u.balance < fee:
             return await q.message.reply_text("❌ অপর্যাপ্ত ব্যালেন্স।")
 
-        async with db._lock:
-            opp = await db.find_opponent_in_queue(fee, uid)
-            if opp:
-                # Match Found
-                p2 = await db.get_user(opp['user_id'])
-                if p2:
-                    await db.remove_from_queue(p2['user_id'])
-                    mid = await db.create_match(uid, p2['user_id'], fee)
-                    try:
-                        await context.bot.delete_message(config.LOBBY_CHANNEL_ID, opp['lobby_message_id'])
-                    except:
-                        pass
-
-                    await context.bot.send_message(uid, f"✅ প্রতিপক্ষ: {p2['ingame_name']}! রুম কোড দিন।", reply_markup=CANCEL_KEYBOARD)
-                    await db.set_user_state(uid, 'awaiting_room_code', mid)
-                    await context.bot.send_message(p2['user_id'], "✅ প্রতিপক্ষ পাওয়া গেছে! রুম কোডের জন্য অপেক্ষা করুন।")
-                    await q.message.edit_text("ম্যাচ শুরু হচ্ছে...")
-            else:
-                # Add to Queue
-                txt = f"🔥 **New Match!**\nPlayer: {u['ingame_name']}\nFee: {fee} TK"
-                msg = await context.bot.send_message(config.LOBBY_CHANNEL_ID, txt, parse_mode='Markdown')
-                await db.add_to_queue(uid, fee, msg.message_id)
-                await q.message.edit_text("🔍 প্রতিপক্ষ খোঁজা হচ্ছে...", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancel", callback_data=f"cancel_{uid}")]]))
+        # ম্যাচ খোঁজা ও কিউতে যোগ একই DB ট্রানজ্যাকশনে (সব worker প্রসেসে নিরাপদ)
+        opp, mid, queued = await db.match_or_enqueue(uid, fee)
+        if mid or queued:
+            lobby.manager.touch()
+        if mid:
+            # Match Found
+            p2 = await db.get_user(opp.user_id)
+            if p2:
+                await context.bot.send_message(uid, f"✅ প্রতিপক্ষ: {p2.ingame_name}! রুম কোড দিন।", reply_markup=CANCEL_KEYBOARD)
+                await db.set_user_state(uid, 'awaiting_room_code', mid)
+                await context.bot.send_message(p2.user_id, "✅ প্রতিপক্ষ পাওয়া গেছে! রুম কোডের জন্য অপেক্ষা করুন।",
+                                               rate_limit_args=outbound.MATCH)
+                await q.message.edit_text("ম্যাচ শুরু হচ্ছে...")
+        elif queued:
+            # Added to Queue (লবি পোস্ট lobby.manager আপডেট করে)
+            await q.message.edit_text("🔍 প্রতিপক্ষ খোঁজা হচ্ছে...", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("❌ Cancel", callback_data=f"cancel_{uid}")]]))
     except Exception as e:
         logger.error(f"Error in handle_play_callback: {e}")
 
-async def check_match_timeout(context):
-    """ম্যাচ টাইমআউট চেক"""
+# --- Background Jobs (jobs.runtime এ রেজিস্টার; ত্রুটি রানটাইম লগ করে ও গোনে) ---
+def db_maintenance_job():
+    """পর্যায়ক্রমিক ডাটাবেস রক্ষণাবেক্ষণ (optimize + WAL checkpoint)"""
+    res = db.run_maintenance_sync()
+    if res is None:
+        raise RuntimeError("run_maintenance_sync failed")
+    logger.info(f"DB maintenance done: {res}")
+
+async def lobby_start_job(context):
+    """লবি পোস্ট লোড ও পুরনো প্রতি-প্লেয়ার পোস্ট পরিষ্কার (স্টার্টআপে একবার)"""
     try:
-        mid = context.job.data['match_id']
-        await db.cancel_match(mid)
+        await lobby.manager.start(context.bot)
     except Exception as e:
-        logger.error(f"Error in check_match_timeout: {e}")
+        logger.error(f"Error in lobby_start_job: {e}")
+
+async def lobby_job(context):
+    """অন্য প্রসেসের কিউ পরিবর্তন লবি পোস্টে আনা"""
+    lobby.manager.touch()
+
+async def referral_job(context):
+    """জমা থাকা রেফারেল বোনাস ব্যাচে পোস্ট করা"""
+    await referrals.pay_pending(context.bot)
+
+async def queue_reaper_job(context):
+    """মেয়াদোত্তীর্ণ ম্যাচ কিউ এন্ট্রি সরানো"""
+    await reaper.reap(context.bot)
+
+async def backup_ship_job(context):
+    """নতুন WAL ফ্রেম ব্যাকআপে পাঠানো (চেইন ভাঙলে নতুন বেস)"""
+    await backup.ship()
+
+async def backup_base_job(context):
+    """পর্যায়ক্রমিক পূর্ণ বেস স্ন্যাপশট (রিস্টোরে কম WAL চালাতে হয়)"""
+    if not await backup.base():
+        raise RuntimeError("base snapshot failed")
+
+async def deposit_digest_job(context):
+    """সন্দেহজনক ডিপোজিট ঘটনার ব্যাচ করা অ্যাডমিন ডাইজেস্ট"""
+    alerts, left = await jobs.offload(deposits.validator.drain_alerts)
+    if not alerts:
+        return
+    text = deposits.format_digest(alerts, left)
+    for a in config.ADMINS:
+        try:
+            await context.bot.send_message(a, text, rate_limit_args=outbound.ADMIN)
+        except Exception as e:
+            logger.warning(f"Failed to send deposit digest to {a}: {e}")
+
+async def match_timeout_job(context):
+    """MATCH_TIMEOUT পেরোনো, কোনো স্ক্রিনশট ছাড়া ম্যাচ বাতিল ও দুই খেলোয়াড়কে জানানো"""
+    expired = await jobs.offload(db.expire_matches_sync, int(time.time()) - config.MATCH_TIMEOUT)
+    for m in expired:
+        for uid in (m.player1_id, m.player2_id):
+            try:
+                await context.bot.send_message(uid, f"⌛ ম্যাচ {m.match_id} সময়মতো শেষ না হওয়ায় বাতিল করা হয়েছে।",
+                                               reply_markup=MAIN_KEYBOARD, rate_limit_args=outbound.MATCH)
+            except Exception as e:
+                logger.warning(f"Failed to notify {uid} of match timeout: {e}")
+    if expired:
+        logger.info(f"Match timeout cancelled {len(expired)} matches without screenshots")
+
+async def rate_limit_prune_job(context):
+    """RateLimiter থেকে নিষ্ক্রিয় ইউজার সরানো (প্রতি প্রসেসে)"""
+    removed = utils.rate_limiter.prune()
+    if removed:
+        logger.debug(f"Rate limiter pruned {removed} idle users")
+
+async def deposit_prune_job(context):
+    """নিষ্ক্রিয় ইউজারের ডিপোজিট ভেলোসিটি কাউন্টার সরানো (প্রতি প্রসেসে)"""
+    deposits.validator.prune()
+
+def deposit_alert_flush_job():
+    """এই প্রসেসে জমা সন্দেহজনক ডিপোজিট ঘটনা এক ব্যাচে DB তে লেখা (প্রতি প্রসেসে)"""
+    deposits.validator.flush_alerts()
+
+async def pending_reminder_job(context):
+    """PENDING_REMIND_AGE এর বেশি পুরনো pending ডিপোজিট/উত্তোলন অ্যাডমিনকে মনে করানো"""
+    stale = await jobs.offload(db.get_stale_pending_sync, int(time.time()) - config.PENDING_REMIND_AGE)
+    lines = [f"{kind}: {v['count']} ({v['amount']:.2f} TK), oldest {(time.time() - v['oldest']) / 3600:.1f}h"
+             for kind, v in stale.items() if v['count']]
+    if not lines:
+        return
+    text = "⏰ Pending requests waiting too long:\n" + "\n".join(lines)
+    for a in config.ADMINS:
+        try:
+            await context.bot.send_message(a, text, rate_limit_args=outbound.ADMIN)
+        except Exception as e:
+            logger.warning(f"Failed to send pending reminder to {a}: {e}")
+
+def _register_jobs() -> None:
+    """জব রেজিস্ট্রি (প্রতি প্রসেসে একবার; local জব সব প্রসেসে, বাকিগুলো শুধু জবের প্রসেসে)"""
+    rt = jobs.runtime
+    if rt.jobs:
+        return
+    rt.add('db_maintenance', db_maintenance_job, config.DB_MAINTENANCE_INTERVAL, first=60)
+    rt.add('lobby_refresh', lobby_job, config.LOBBY_POLL_INTERVAL)
+    rt.add('queue_reaper', queue_reaper_job, config.QUEUE_REAP_INTERVAL, first=30)
+    rt.add('referral_payout', referral_job, config.REFERRAL_BATCH_INTERVAL)
+    rt.add('deposit_digest', deposit_digest_job, config.DEPOSIT_DIGEST_INTERVAL)
+    rt.add('match_timeout', match_timeout_job, config.MATCH_TIMEOUT_INTERVAL, first=45)
+    rt.add('rate_limit_prune', rate_limit_prune_job, config.RATE_LIMIT_PRUNE_INTERVAL, local=True)
+    rt.add('deposit_prune', deposit_prune_job, config.DEPOSIT_PRUNE_INTERVAL, local=True)
+    rt.add('deposit_alert_flush', deposit_alert_flush_job, config.DEPOSIT_ALERT_FLUSH_INTERVAL, local=True)
+    rt.add('pending_reminder', pending_reminder_job, config.PENDING_REMIND_INTERVAL)
+    if config.BACKUP_ENABLED:
+        # শিপ বিরতিই RPO, তাই jitter ছোট রাখা
+        rt.add('backup_ship', backup_ship_job, config.BACKUP_SHIP_INTERVAL, first=5, jitter=1)
+        rt.add('backup_base', backup_base_job, config.BACKUP_BASE_INTERVAL)
 
 async def photo_handler(update, context):
     """ফটো হ্যান্ডলার"""
@@ -280,17 +501,9 @@ async def photo_handler(update, context):
             await update.message.reply_text("✅ স্ক্রিনশট জমা হয়েছে।", reply_markup=MAIN_KEYBOARD)
             await db.set_user_state(user['user_id'], None)
 
-            # Notify Admin
-            if match and match['p1_screenshot_id'] and match['p2_screenshot_id']:
-                for a in config.ADMINS:
-                    try:
-                        kb = [[InlineKeyboardButton("P1 Win", callback_data=f"admin_res_{mid}_{match['player1_id']}"),
-                               InlineKeyboardButton("P2 Win", callback_data=f"admin_res_{mid}_{match['player2_id']}")]]
-                        await context.bot.send_message(a, f"Match #{mid} Review:", reply_markup=InlineKeyboardMarkup(kb))
-                        await context.bot.send_photo(a, match['p1_screenshot_id'], caption="Player 1")
-                        await context.bot.send_photo(a, match['p2_screenshot_id'], caption="Player 2")
-                    except Exception as e:
-                        logger.warning(f"Failed to notify admin {a}: {e}")
+            # Notify Admin (একটি রিভিউ কার্ড, সব অ্যাডমিনকে একসাথে)
+            if match and match.p1_screenshot_id and match.p2_screenshot_id:
+                await reviews.board.notify_new(context.bot)
     except Exception as e:
         logger.error(f"Error in photo_handler: {e}")
 
@@ -315,15 +528,29 @@ async def cb_handler(update, context):
                 dat['method'] = d.split('_')[2]
                 await db.set_user_state(q.from_user.id, 'awaiting_withdraw_account', json.dumps(dat))
                 await q.message.edit_text("আপনার নম্বরটি দিন:")
+        elif d.startswith('hist_'):
+            u = await db.get_user(q.from_user.id)
+            if u:
+                text, markup = await _profile_view(u, max(int(d.split('_')[1]), 0))
+                await q.message.edit_text(text, reply_markup=markup)
         elif d.startswith('cancel_'):
             await db.remove_from_queue(int(d.split('_')[1]))
+            lobby.manager.touch()
             await q.message.edit_text("বাতিল করা হয়েছে।")
+        elif d.startswith('rv_show_'):
+            if q.from_user.id in config.ADMINS:
+                _, _, mid, side = d.split('_')
+                await reviews.board.show(context.bot, q.from_user.id, mid, int(side))
         elif d.startswith('admin_res_'):
             if q.from_user.id in config.ADMINS:
                 parts = d.split('_')
                 if await db.resolve_match(parts[2], int(parts[3])):
-                    await q.message.edit_caption(caption="✅ Match Resolved.")
-                    await context.bot.send_message(int(parts[3]), "অভিনন্দন! আপনি জিতেছেন।")
+                    if await reviews.board.card_message_id(q.from_user.id) != q.message.message_id:
+                        await q.message.edit_caption(caption="✅ Match Resolved.")
+                    await reviews.board.after_resolve(context.bot, parts[2])
+                    await context.bot.send_message(int(parts[3]), "অভিনন্দন! আপনি জিতেছেন।",
+                                                   rate_limit_args=outbound.MATCH)
+                    await tournament.deliver_events(context.bot)
     except Exception as e:
         logger.error(f"Error in cb_handler: {e}")
 
@@ -334,7 +561,34 @@ async def stats_cmd(update, context):
         if update.effective_user.id in config.ADMINS:
             u = await db.get_total_users()
             m = await db.get_total_matches()
-            await update.message.reply_text(f"Users: {u}\nMatches: {m}")
+            sched = context.application.update_processor.snapshot()
+            adm = admission.controller.snapshot()
+            dep = deposits.validator.stats
+            fq = faq.index.stats()
+            lb = lobby.manager.stats()
+            rs = referrals.stats
+            ages = await reaper.queue_ages()
+            ai = _ai().health()
+            out = context.bot.rate_limiter.snapshot()
+            out_line = ", ".join(f"{k} {v['requests']} (avg {v['avg_wait_ms']} ms, 429 {v['retry_after']})"
+                                 for k, v in out['classes'].items())
+            await update.message.reply_text(
+                f"Users: {u}\nMatches: {m}\n"
+                f"Updates: running {sched['running']}/{sched['limit']}, queued {sched['queued']}, "
+                f"deepest user queue {sched['deepest_user_queue']}, avg wait {sched['avg_wait_ms']} ms\n"
+                f"Admission: {'OVERLOADED' if adm['overloaded'] else 'ok'}, latency ewma {adm['latency_ewma_ms']} ms, "
+                f"{adm['episodes']} overloads, shed {sum(adm['shed'].values())} {adm['shed'] or ''}\n"
+                f"Deposits: {dep['accepted']} ok, {dep['dup_memory'] + dep['dup_db']} duplicate, "
+                f"{dep['velocity_blocked']} rate-limited, {dep['db_checks']} DB checks\n"
+                f"{reaper.format_ages(ages)}\n"
+                f"Queue reaper: {reaper.stats['expired']} expired in {reaper.stats['batches']} batches\n"
+                f"Lobby: {lb['posts']} posts, {lb['touches']} changes -> {lb['api_calls']} API calls\n"
+                f"Referrals: {rs['paid']} paid in {rs['batches']} batches, {rs['voided']} void, "
+                f"cache hits {rs['cache_hits']}/{rs['cache_hits'] + rs['cache_misses']}\n"
+                f"FAQ fast path: {fq['hits']}/{fq['queries']} ({fq['hit_rate']}%)\n"
+                f"AI: breaker {ai['state']}, limit {ai['limit']}, in flight {ai['inflight']}, "
+                f"fast-failed {ai['rejected'] + ai['shed']}\n"
+                f"Outbound: queued {out['queued_global']}, blocked {out['blocked_for']}s | {out_line}")
     except Exception as e:
         logger.error(f"Error in stats_cmd: {e}")
 
@@ -345,16 +599,132 @@ async def broadcast_cmd(update, context):
             users = await db.get_all_user_ids()
             msg = " ".join(context.args)
             sent = 0
-            for u in users:
-                try:
-                    await context.bot.send_message(u, msg)
-                    sent += 1
-                except:
-                    pass
+            # সবচেয়ে নিচু অগ্রাধিকার: outbound শিডিউলার গতি নিয়ন্ত্রণ করে, ইন্টারঅ্যাক্টিভ রিপ্লাই আগে যায়
+            for i in range(0, len(users), config.BROADCAST_CHUNK):
+                results = await asyncio.gather(
+                    *(context.bot.send_message(u, msg, rate_limit_args=outbound.BROADCAST)
+                      for u in users[i:i + config.BROADCAST_CHUNK]),
+                    return_exceptions=True)
+                sent += sum(1 for r in results if not isinstance(r, Exception))
             await update.message.reply_text(f"Broadcast sent to {sent} users.")
     except Exception as e:
         logger.error(f"Error in broadcast_cmd: {e}")
 
+async def reviews_cmd(update, context):
+    """পেন্ডিং ম্যাচ রিভিউ কার্ড খোলা"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            if not await reviews.board.open(context.bot, update.effective_user.id):
+                await update.message.reply_text("✅ কোনো রিভিউ বাকি নেই।")
+    except Exception as e:
+        logger.error(f"Error in reviews_cmd: {e}")
+
+async def export_cmd(update, context):
+    """অ্যানালিটিক্স এক্সপোর্ট: /export [full]"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            full = bool(context.args) and context.args[0] == 'full'
+            summary = await export.run_export(full=full)
+            if summary is None:
+                await update.message.reply_text("❌ এক্সপোর্ট ব্যর্থ অথবা আগে থেকেই চলছে।")
+                return
+            lines = [f"{t}: {s['rows']}" for t, s in summary.items()]
+            await update.message.reply_text(f"📦 Export ({'full' if full else 'incremental'}) -> {config.EXPORT_DIR}\n" + "\n".join(lines))
+    except Exception as e:
+        logger.error(f"Error in export_cmd: {e}")
+
+# --- Tournament Commands ---
+async def tcreate_cmd(update, context):
+    """টুর্নামেন্ট তৈরি: /tcreate <name> <single|swiss> [entry_fee] [rounds]"""
+    try:
+        if update.effective_user.id not in config.ADMINS:
+            return
+        args = context.args
+        if len(args) < 2 or args[1] not in tournament.FORMATS:
+            return await update.message.reply_text("ব্যবহার: /tcreate <name> <single|swiss> [entry_fee] [rounds]")
+        fee = float(args[2]) if len(args) > 2 else 0
+        rounds = int(args[3]) if len(args) > 3 else 0
+        if not math.isfinite(fee) or fee < 0 or rounds < 0:
+            return await update.message.reply_text("ব্যবহার: /tcreate <name> <single|swiss> [entry_fee] [rounds]")
+        tid = await tournament.create(args[0], args[1], fee, rounds)
+        await update.message.reply_text(f"✅ Tournament #{tid} তৈরি হয়েছে। যোগ দিতে: /tjoin {tid}")
+    except ValueError:
+        await update.message.reply_text("সঠিক সংখ্যা দিন।")
+    except Exception as e:
+        logger.error(f"Error in tcreate_cmd: {e}")
+
+async def tjoin_cmd(update, context):
+    """টুর্নামেন্টে রেজিস্ট্রেশন"""
+    try:
+        user = await ensure_user(update)
+        if not user or not user.get('is_registered'):
+            return await update.message.reply_text("আগে /start দিয়ে রেজিস্ট্রেশন করুন।")
+        if not context.args or not context.args[0].isdigit():
+            return await update.message.reply_text("ব্যবহার: /tjoin <id>")
+        ok, msg = await tournament.join(int(context.args[0]), user['user_id'])
+        await update.message.reply_text(msg)
+    except Exception as e:
+        logger.error(f"Error in tjoin_cmd: {e}")
+
+async def tstart_cmd(update, context):
+    """টুর্নামেন্ট শুরু (সিডিং + প্রথম রাউন্ড)"""
+    try:
+        if update.effective_user.id not in config.ADMINS:
+            return
+        if not context.args or not context.args[0].isdigit():
+            return await update.message.reply_text("ব্যবহার: /tstart <id>")
+        ok, msg = await tournament.start(int(context.args[0]))
+        await update.message.reply_text(msg)
+        if ok:
+            await tournament.deliver_events(context.bot)
+    except Exception as e:
+        logger.error(f"Error in tstart_cmd: {e}")
+
+async def tlist_cmd(update, context):
+    """চলমান/খোলা টুর্নামেন্ট"""
+    try:
+        rows = await tournament.list_open()
+        if not rows:
+            return await update.message.reply_text("কোনো টুর্নামেন্ট নেই।")
+        txt = "\n".join(f"#{r['id']} {r['name']} ({r['format']}) - {r['status']}, "
+                        f"{r['players']} players, fee {r['entry_fee']} TK" for r in rows)
+        await update.message.reply_text(f"🏆 টুর্নামেন্ট:\n{txt}")
+    except Exception as e:
+        logger.error(f"Error in tlist_cmd: {e}")
+
+async def tstatus_cmd(update, context):
+    """টুর্নামেন্ট স্ট্যান্ডিং"""
+    try:
+        if not context.args or not context.args[0].isdigit():
+            return await update.message.reply_text("ব্যবহার: /tstatus <id>")
+        t, rows = await tournament.standings(int(context.args[0]))
+        if not t:
+            return await update.message.reply_text("টুর্নামেন্ট পাওয়া যায়নি।")
+        lines = [f"{i+1}. {r['ingame_name']} - {r['score']:g} pts{' ❌' if r['eliminated'] else ''}"
+                 for i, r in enumerate(rows)]
+        await update.message.reply_text(
+            f"🏆 {t['name']} ({t['format']}) - {t['status']}\nRound {t['current_round']}/{t['total_rounds']}\n"
+            + "\n".join(lines))
+    except Exception as e:
+        logger.error(f"Error in tstatus_cmd: {e}")
+
+async def referral_command(update, context):
+    """রেফারেল লিংক ও লেভেল অনুযায়ী রেফারেল সংখ্যা"""
+    try:
+        u = await ensure_user(update)
+        if not u:
+            return
+        res = await referrals.summary(u['user_id'])
+        lines = [f"🤝 আপনার রেফারেল লিংক:\nhttps://t.me/{config.BOT_USERNAME}?start=ref_{u['user_id']}",
+                 f"প্রতি রেজিস্ট্রেশনে বোনাস: {config.REFERRAL_BONUS} TK"]
+        if res:
+            for lv in res['levels']:
+                lines.append(f"লেভেল {lv['depth']}: {lv['total']} জন ({lv['registered']} রেজিস্টার্ড)")
+            lines.append(f"মোট বোনাস: {res['earned']:.2f} TK ({res['rewards']} টি)")
+        await update.message.reply_text("\n".join(lines))
+    except Exception as e:
+        logger.error(f"Error in referral_command: {e}")
+
 async def rules_command(update, context):
     """রুলস কমান্ড"""
     try:
@@ -368,10 +738,138 @@ async def set_rules(update, context):
     try:
         if update.effective_user.id in config.ADMINS:
             await db.set_setting('rules_text', " ".join(context.args))
+            await faq.changed()
             await update.message.reply_text("Rules updated.")
     except Exception as e:
         logger.error(f"Error in set_rules: {e}")
 
+async def faqadd_cmd(update, context):
+    """FAQ যোগ: /faqadd <প্রশ্ন> | <উত্তর>"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            question, sep, answer = " ".join(context.args).partition('|')
+            if not sep or not question.strip() or not answer.strip():
+                return await update.message.reply_text("ব্যবহার: /faqadd <প্রশ্ন> | <উত্তর>")
+            fid = await db.add_faq(question.strip(), answer.strip())
+            await faq.changed()
+            await update.message.reply_text(f"FAQ #{fid} added." if fid else "❌ FAQ যোগ করা যায়নি।")
+    except Exception as e:
+        logger.error(f"Error in faqadd_cmd: {e}")
+
+async def faqdel_cmd(update, context):
+    """FAQ মুছা: /faqdel <id>"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            if not context.args or not context.args[0].isdigit():
+                return await update.message.reply_text("ব্যবহার: /faqdel <id>")
+            ok = await db.delete_faq(int(context.args[0]))
+            if ok:
+                await faq.changed()
+            await update.message.reply_text("FAQ deleted." if ok else "FAQ not found.")
+    except Exception as e:
+        logger.error(f"Error in faqdel_cmd: {e}")
+
+async def faqlist_cmd(update, context):
+    """FAQ তালিকা ও লোকাল ইন্ডেক্সের hit rate"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            await faq.refresh()
+            rows = await db.list_faq()
+            st = faq.index.stats()
+            lines = [f"#{r['id']} {r['question'][:60]}" for r in rows[:50]]
+            lines.append(f"\nIndex: {st['docs']} docs, {st['terms']} terms | "
+                         f"hits {st['hits']}/{st['queries']} ({st['hit_rate']}%)")
+            await update.message.reply_text("\n".join(lines))
+    except Exception as e:
+        logger.error(f"Error in faqlist_cmd: {e}")
+
+async def health_cmd(update, context):
+    """event loop ল্যাগ, executor স্যাচুরেশন ও in-flight কল"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            snap = monitor.monitor.snapshot()
+            lag = snap['loop_lag_ms']
+            pools = "\n".join(f"{name}: {p['active']}/{p['size']} active, {p['queued']} queued, "
+                              f"wait avg {p['avg_queue_wait_ms']} / max {p['max_queue_wait_ms']} ms, "
+                              f"{p['completed']} done"
+                              for name, p in (('DB pool', snap['db_pool']), ('AI pool', snap['ai_pool'])))
+            await update.message.reply_text(
+                f"[{snap['name']}] up {snap['uptime_s']}s\n"
+                f"Loop lag: last {lag['last']} ms, ewma {lag['ewma']} ms, max {lag['max']} ms "
+                f"({snap['lag_warnings']} warnings)\n{pools}\n"
+                f"In flight: DB {snap['inflight']['db']}, AI {snap['inflight']['ai']}")
+    except Exception as e:
+        logger.error(f"Error in health_cmd: {e}")
+
+async def backup_cmd(update, context):
+    """ব্যাকআপ অবস্থা; /backup now দিলে এখনই বেস স্ন্যাপশট"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            if not config.BACKUP_ENABLED:
+                return await update.message.reply_text("Backup disabled (BACKUP_ENABLED=0).")
+            if not jobs.runtime.installed('backup_ship'):
+                # webhook মোডে শিপার শুধু জব worker এ চলে; অন্য প্রসেস থেকে বেস নিলে চেইন গুলিয়ে যায়
+                return await update.message.reply_text("Backup runs in the jobs worker (webhook worker 0); "
+                                                       "/backup is not available from this worker.")
+            if context.args and context.args[0] == 'now':
+                meta = await backup.base()
+                if not meta:
+                    return await update.message.reply_text("❌ বেস স্ন্যাপশট ব্যর্থ, লগ দেখুন।")
+                await update.message.reply_text(f"Base {meta['file']}: {meta['bytes']} bytes in {meta['seconds']}s")
+            st = backup.shipper.status()
+            bases = backup.list_bases()
+            last = datetime.fromtimestamp(bases[-1]['created']).strftime('%Y-%m-%d %H:%M:%S') if bases else '-'
+            await update.message.reply_text(
+                f"Backup: {len(bases)} bases (latest {last}), generation {st['generation']}, "
+                f"frame {st['frames']}\nShipped {st['shipped_frames']} frames in {st['segments']} segments, "
+                f"{st['checkpoints']} checkpoints, {st['chain_breaks']} chain breaks"
+                + (f"\nLast error: {st['last_error']}" if st['last_error'] else ""))
+    except Exception as e:
+        logger.error(f"Error in backup_cmd: {e}")
+
+async def jobs_cmd(update, context):
+    """জবের তালিকা ও মেট্রিক; /jobs run|pause|resume <name>"""
+    try:
+        if update.effective_user.id in config.ADMINS:
+            rt = jobs.runtime
+            if len(context.args) == 2:
+                action, name = context.args[0].lower(), context.args[1]
+                if name not in rt.jobs or action not in jobs.ACTIONS:
+                    return await update.message.reply_text(
+                        f"Usage: /jobs [run|pause|resume <name>]\nJobs: {', '.join(rt.names())}")
+                if await rt.request(action, name):
+                    # local জব: শুধু এই worker এ প্রযোজ্য
+                    where = " (this worker)" if rt.jobs[name].local and not rt.owner else ""
+                    return await update.message.reply_text(f"{name}: {action} ✅{where}")
+                return await update.message.reply_text(
+                    f"{name}: {action} sent to the jobs worker (within {config.JOBS_CONTROL_INTERVAL}s)")
+            global_jobs, age = await rt.global_snapshot()
+            listing = {name: j for name, j in rt.snapshot().items() if name != '_pool' and j['local']}
+            listing.update(global_jobs)
+            lines = []
+            if age is None:
+                lines.append("⚠️ No metrics from the jobs worker yet.")
+            elif age > config.JOBS_SNAPSHOT_INTERVAL * 2:
+                lines.append(f"⚠️ Jobs worker metrics are {age}s old.")
+            for name, j in listing.items():
+                flags = ''.join(f for f, on in ((' ⏸', j['paused']), (' ▶️', j['running']), (' 🧱', j['heavy'])) if on)
+                last = datetime.fromtimestamp(j['last_started']).strftime('%H:%M:%S') if j['last_started'] else '-'
+                lines.append(f"{name}{flags} every {j['interval']}s: {j['runs']} runs, {j['failures']} failed, "
+                             f"{j['skipped']} skipped, last {last} {j['last_ms']} ms (max {j['max_ms']})"
+                             + (f"\n  ⚠️ {j['last_error']}" if j['last_error'] else ''))
+            await update.message.reply_text("\n".join(lines) or "No jobs registered.")
+    except Exception as e:
+        logger.error(f"Error in jobs_cmd: {e}")
+
+async def _post_init(app: Application) -> None:
+    monitor.monitor.start('main')
+
+async def _post_shutdown(app: Application) -> None:
+    # হ্যান্ডলার ও জব থেমে গেছে: জমা ডিপোজিট ঘটনা লেখা, তারপর শেষ ব্যাকআপ শিপ
+    await db.run_db(deposits.validator.flush_alerts)
+    if config.BACKUP_ENABLED:
+        await backup.shutdown()
+
 # --- Signal Handlers for Graceful Shutdown ---
 async def signal_handler(signum, frame):
     """গ্রেসফুল শাটডাউন হ্যান্ডলার (Termux Compatible)"""
@@ -384,25 +882,82 @@ async def signal_handler(signum, frame):
     finally:
         sys.exit(0)
 
+def build_application(polling: bool = True, run_jobs: bool = True) -> Application:
+    """Application তৈরি ও হ্যান্ডলার রেজিস্টার (polling ও webhook worker দুটোর জন্য)"""
+    # webhook মোডে প্রতিটি worker গ্লোবাল সীমার সমান ভাগ পায়
+    share = 1 if polling else max(1, config.WEBHOOK_WORKERS)
+    builder = (Application.builder().token(config.TOKEN).base_url(config.TELEGRAM_BASE_URL)
+               .concurrent_updates(scheduling.UserOrderedUpdateProcessor(config.UPDATE_CONCURRENCY))
+               .rate_limiter(outbound.PriorityRateLimiter(config.OUTBOUND_GLOBAL_RATE / share,
+                                                          max(1, config.OUTBOUND_GLOBAL_BURST / share))))
+    if polling:
+        builder = builder.post_init(_post_init).post_shutdown(_post_shutdown)
+    else:
+        builder = builder.updater(None)
+    app = builder.build()
+    monitor.monitor.register('updates', app.update_processor.snapshot)
+    monitor.monitor.register('outbound', app.bot.rate_limiter.snapshot)
+    monitor.monitor.register('admission', admission.controller.snapshot)
+
+    # Handlers
+    app.add_handler(CommandHandler('start', start_command))
+    app.add_handler(CommandHandler('ask', ask_ai))
+    app.add_handler(CommandHandler('rules', rules_command))
+    app.add_handler(CommandHandler('referral', referral_command))
+    app.add_handler(CommandHandler('stats', stats_cmd))
+    app.add_handler(CommandHandler('health', health_cmd))
+    app.add_handler(CommandHandler('backup', backup_cmd))
+    app.add_handler(CommandHandler('jobs', jobs_cmd))
+    app.add_handler(CommandHandler('broadcast', broadcast_cmd))
+    app.add_handler(CommandHandler('setrules', set_rules))
+    app.add_handler(CommandHandler('faqadd', faqadd_cmd))
+    app.add_handler(CommandHandler('faqdel', faqdel_cmd))
+    app.add_handler(CommandHandler('faqlist', faqlist_cmd))
+    app.add_handler(CommandHandler('reviews', reviews_cmd))
+    app.add_handler(CommandHandler('export', export_cmd))
+    app.add_handler(CommandHandler('tcreate', tcreate_cmd))
+    app.add_handler(CommandHandler('tjoin', tjoin_cmd))
+    app.add_handler(CommandHandler('tstart', tstart_cmd))
+    app.add_handler(CommandHandler('tlist', tlist_cmd))
+    app.add_handler(CommandHandler('tstatus', tstatus_cmd))
+
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, main_text_handler))
+    app.add_handler(MessageHandler(filters.PHOTO, photo_handler))
+    app.add_handler(CallbackQueryHandler(cb_handler))
+
+    # Background maintenance: global জব webhook মোডে শুধু একটি worker এ, local জব সবখানে
+    if run_jobs:
+        app.job_queue.run_once(lobby_start_job, when=1)
+    _register_jobs()
+    jobs.runtime.install(app.job_queue, run_global=run_jobs,
+                         shared=not polling and config.WEBHOOK_WORKERS > 1)
+    monitor.monitor.register('jobs', jobs.runtime.snapshot)
+    return app
+
 def main():
     """মেইন ফাংশন"""
     global app_instance
     try:
+        if config.STORAGE_BACKEND != 'sqlite':
+            # রিভিউ, টুর্নামেন্ট, ডিপোজিট, রেফারেল ও জবগুলো সরাসরি SQLite পড়ে; memory ব্যাকএন্ডে
+            # পেইড ম্যাচ রিভিউ পর্যন্ত পৌঁছায় না। এটি শুধু bench_handlers/conformance এর জন্য।
+            raise RuntimeError(f"STORAGE_BACKEND={config.STORAGE_BACKEND} is only for bench_handlers.py and "
+                               f"conformance.py; the bot needs sqlite")
+        profile = config.STARTUP_PROFILE or '--startup-profile' in sys.argv
+        marks = list(_BOOT_MARKS)
         db.init_db()
-        app = Application.builder().token(config.TOKEN).build()
+        marks.append(('init_db', time.perf_counter()))
+
+        if config.RUN_MODE == 'webhook' and not profile:
+            import webhook
+            return webhook.run()
+
+        app = build_application()
         app_instance = app
+        marks.append(('app_build', time.perf_counter()))
 
-        # Handlers
-        app.add_handler(CommandHandler('start', start_command))
-        app.add_handler(CommandHandler('ask', ask_ai))
-        app.add_handler(CommandHandler('rules', rules_command))
-        app.add_handler(CommandHandler('stats', stats_cmd))
-        app.add_handler(CommandHandler('broadcast', broadcast_cmd))
-        app.add_handler(CommandHandler('setrules', set_rules))
-
-        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, main_text_handler))
-        app.add_handler(MessageHandler(filters.PHOTO, photo_handler))
-        app.add_handler(CallbackQueryHandler(cb_handler))
+        if profile:
+            return print_startup_profile(marks)
 
         # Signal handling for graceful shutdown
         try:
@@ -16,22 +16,175 @@ BOT_USERNAME = 'esfootball_tournament_bot'
 MINIMUM_DEPOSIT = 50.0
 MINIMUM_WITHDRAWAL = 100.0
 REFERRAL_BONUS = 5.0
+REFERRAL_DEPTH = 3  # রেফারেল ট্রির কত লেভেল পর্যন্ত গোনা হয়
+REFERRAL_CACHE_TTL = 300  # রেফারেল কাউন্ট ক্যাশ (সেকেন্ড)
+REFERRAL_BATCH_SIZE = 500  # প্রতি কমিটে কতগুলো রিওয়ার্ড পোস্ট হয়
+REFERRAL_BATCH_INTERVAL = 60  # রিওয়ার্ড জবের বিরতি (সেকেন্ড)
 BKASH_NUMBER = '01914573762'
 NAGAD_NUMBER = '01914573762'
 
 # --- AI Settings (GROQ API) ---
 GROQ_API_KEY = os.getenv('GROQ_API_KEY', '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')
+GROQ_API_URL = os.getenv('GROQ_API_URL', 'https://api.groq.com/openai/v1/chat/completions')  # fake_groq.py দিয়ে টেস্ট করা যায়
+AI_STREAMING = os.getenv('AI_STREAMING', '1') == '1'  # টোকেন আসার সাথে সাথে মেসেজ এডিট
+STREAM_EDIT_INTERVAL = 1.0  # সেকেন্ড; একই মেসেজে এর চেয়ে ঘন ঘন এডিট নয় (Telegram সীমা)
+AI_BREAKER_FAILURES = 5  # পরপর এতগুলো ব্যর্থতায় ব্রেকার খোলে
+AI_BREAKER_COOLDOWN = 30  # সেকেন্ড; ব্যর্থ probe এ দ্বিগুণ হয়
+AI_BREAKER_MAX_COOLDOWN = 300
+AI_CONCURRENCY_INITIAL = 4  # একসাথে Groq রিকোয়েস্ট (AIMD দিয়ে বাড়ে/কমে)
+AI_CONCURRENCY_MIN = 1
+AI_CONCURRENCY_MAX = 16
+AI_LATENCY_TARGET = 6.0  # সেকেন্ড; এর বেশি লাগলে সীমা কমে
+AI_QUEUE_WAIT = 2.0  # স্লটের জন্য সর্বোচ্চ অপেক্ষা, এরপর বিকল্প উত্তর
+AI_MAX_RETRIES = 2
+AI_BACKOFF_BASE = 0.5
+AI_BACKOFF_CAP = 4.0
+AI_MAX_RETRY_AFTER = 10  # এর চেয়ে লম্বা Retry-After হলে অপেক্ষা না করে বিকল্প উত্তর
+
+# --- FAQ Fast Path ---
+# স্থানীয় BM25 ইন্ডেক্সে আত্মবিশ্বাসী মিল পেলে Groq কল ছাড়াই উত্তর
+FAQ_MIN_SCORE = 1.0  # সেরা ডকুমেন্টের ন্যূনতম BM25 স্কোর
+FAQ_MIN_COVERAGE = 0.6  # প্রশ্নের মোট IDF ওজনের কত অংশ সেরা ডকুমেন্টে মিলতে হবে
+FAQ_REFRESH_INTERVAL = 60  # অন্য প্রসেসের পরিবর্তন দেখতে faq_version কত সেকেন্ড পরপর চেক হয়
+
+# --- Rating Settings ---
+ELO_INITIAL = 1000
+ELO_K_SCHEDULE = os.getenv('ELO_K_SCHEDULE', '0:32')  # "খেলা_ম্যাচ:K" জোড়া, যেমন '0:40,30:32,100:24'
+
+# --- Tournament Settings ---
+TOURNAMENT_PRIZE_SHARE = 0.9  # মোট এন্ট্রি ফির যে অংশ বিজয়ী পায়
+TOURNAMENT_FANOUT_CHUNK = 25  # রাউন্ড নোটিফিকেশন একসাথে কতগুলো পাঠানো হয়
 
 # --- Database Settings ---
 # Termux সামঞ্জস্যপূর্ণ পথ
 BASE_DIR = Path.home() / '.eFootball_bot'
-BASE_DIR.mkdir(exist_ok=True)
 LOCAL_DB = str(BASE_DIR / 'local_data.db')
 LOGS_DIR = BASE_DIR / 'logs'
-LOGS_DIR.mkdir(exist_ok=True)
 LOG_FILE = str(LOGS_DIR / 'bot.log')
+_dirs_ready = False
+
+def ensure_dirs():
+    """ডিরেক্টরি তৈরি (import এ নয়, প্রথম ব্যবহারে)"""
+    global _dirs_ready
+    if not _dirs_ready:
+        LOGS_DIR.mkdir(parents=True, exist_ok=True)
+        _dirs_ready = True
 
 # --- System Settings ---
-MAX_WORKERS = 4
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', '4'))  # DB executor থ্রেড (loop এর default executor)
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', '32'))  # একসাথে প্রসেস হওয়া আপডেট (ইউজারদের মধ্যে)
 DB_TIMEOUT = 30
 REQUEST_TIMEOUT = 30
+
+# --- Admission Control (ওভারলোডে নিচু অগ্রাধিকারের কাজ বাদ) ---
+ADMISSION_MAX_INFLIGHT = int(os.getenv('ADMISSION_MAX_INFLIGHT', str(UPDATE_CONCURRENCY * 2)))  # এর বেশি in-flight আপডেটে ওভারলোড
+ADMISSION_LATENCY = float(os.getenv('ADMISSION_LATENCY', '1.0'))  # স্লটের অপেক্ষার EWMA এর বেশি হলে ওভারলোড (সেকেন্ড)
+ADMISSION_RECOVER = 0.75  # দুটো মাপই সীমার এই অনুপাতের নিচে নামলে স্বাভাবিক (ফ্ল্যাপিং এড়াতে)
+ADMISSION_EWMA_ALPHA = 0.2
+ADMISSION_LOW_CONCURRENCY = int(os.getenv('ADMISSION_LOW_CONCURRENCY', '8'))  # একসাথে চলা নিচু অগ্রাধিকারের আপডেট
+
+# ইউজার/কিউ/ম্যাচ/লেজার/সেটিংসের ব্যাকএন্ড; বট শুধু 'sqlite' এ চলে ('memory' কেবল বেঞ্চমার্ক/conformance এর জন্য)
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'sqlite')
+
+# --- SQLite Performance Profiles ---
+# 'default' = আগের আচরণ; ফোন-ক্লাস ডিভাইসে 'balanced' নিরাপদ, বেশি RAM থাকলে 'fast'
+# cache_size ঋণাত্মক হলে KiB, mmap_size বাইটে
+DB_PROFILE = os.getenv('DB_PROFILE', 'balanced')
+DB_PROFILES = {
+    'default': {'synchronous': 'NORMAL', 'cache_size': -2000, 'mmap_size': 0,
+                'temp_store': 'DEFAULT', 'cached_statements': 128},
+    'balanced': {'synchronous': 'NORMAL', 'cache_size': -8000, 'mmap_size': 64 * 1024 * 1024,
+                 'temp_store': 'MEMORY', 'cached_statements': 256},
+    'fast': {'synchronous': 'NORMAL', 'cache_size': -32000, 'mmap_size': 256 * 1024 * 1024,
+             'temp_store': 'MEMORY', 'cached_statements': 512},
+}
+DB_MAINTENANCE_INTERVAL = 3600  # সেকেন্ড (PRAGMA optimize + WAL checkpoint)
+
+# --- Outbound Telegram Rate Limits ---
+# Telegram: প্রতি চ্যাটে ~১ মেসেজ/সেকেন্ড, গ্রুপ/চ্যানেলে ~২০/মিনিট, মোট ~৩০/সেকেন্ড
+OUTBOUND_GLOBAL_RATE = 25  # মেসেজ/সেকেন্ড (webhook মোডে worker দের মধ্যে ভাগ হয়)
+OUTBOUND_GLOBAL_BURST = 25
+OUTBOUND_PRIVATE_RATE = 1.0
+OUTBOUND_PRIVATE_BURST = 3
+OUTBOUND_GROUP_RATE = 20 / 60
+OUTBOUND_GROUP_BURST = 3
+OUTBOUND_MAX_RETRIES = 3  # RetryAfter এর পর কতবার আবার চেষ্টা
+BROADCAST_CHUNK = 50  # ব্রডকাস্টে একসাথে কতগুলো কল কিউতে দেওয়া হয়
+
+# --- Lobby Channel ---
+LOBBY_EDIT_INTERVAL = 15  # প্রতি টিয়ার পোস্ট সর্বোচ্চ এতো সেকেন্ডে একবার এডিট (চ্যানেলে ~২০/মিনিট সীমা)
+LOBBY_POLL_INTERVAL = 30  # অন্য worker প্রসেসের কিউ পরিবর্তন ধরতে পর্যায়ক্রমিক রিফ্রেশ
+LOBBY_MAX_NAMES = 10  # প্রতি পোস্টে সর্বোচ্চ কতজনের নাম
+
+# --- Matchmaking Queue ---
+QUEUE_TTL = 900  # এর বেশি সময় কিউতে থাকলে এন্ট্রি মেয়াদোত্তীর্ণ (সেকেন্ড)
+QUEUE_REAP_INTERVAL = 60  # কিউ রিপার জবের বিরতি (সেকেন্ড)
+QUEUE_REAP_BATCH = 200  # প্রতি ট্রানজ্যাকশনে সর্বোচ্চ কতগুলো এন্ট্রি মুছা হয়
+
+# --- Match History / Profile ---
+HISTORY_PAGE_SIZE = 5  # প্রোফাইলের প্রতি পেজে কতগুলো ম্যাচ
+HISTORY_TREND_MATCHES = 10  # ফর্ম ও ELO ট্রেন্ড কত ম্যাচের
+
+# --- Deposit Validation ---
+DEPOSIT_BLOOM_CAPACITY = 200000  # ইন-মেমরি txid ফিল্টারের প্রত্যাশিত আকার
+DEPOSIT_BLOOM_ERROR = 0.001  # false positive হার (এগুলো ইন্ডেক্সড DB লুকআপে যাচাই হয়)
+DEPOSIT_RECENT_TXIDS = 50000  # সাম্প্রতিক txid এর exact সেট (DB ছাড়াই ডুপ্লিকেট বাতিল)
+DEPOSIT_VELOCITY_WINDOW = 3600  # সেকেন্ড
+DEPOSIT_VELOCITY_MAX = 5  # উইন্ডোতে একজন ইউজারের সর্বোচ্চ ডিপোজিট রিকোয়েস্ট
+DEPOSIT_SUSPICIOUS_AMOUNT = 10000  # এর বেশি হলে ডাইজেস্টে দেখানো হয়
+DEPOSIT_DIGEST_INTERVAL = 600  # সন্দেহজনক ঘটনার অ্যাডমিন ডাইজেস্ট (সেকেন্ড)
+DEPOSIT_DIGEST_MAX = 500  # একটি ডাইজেস্টে সর্বোচ্চ কতগুলো ঘটনা (বাকিগুলো পরের বার)
+DEPOSIT_ALERT_FLUSH_INTERVAL = 30  # প্রসেসে জমা ঘটনা deposit_alerts এ লেখার বিরতি (সেকেন্ড)
+DEPOSIT_ALERT_BUFFER = 5000  # লেখার অপেক্ষায় সর্বোচ্চ ঘটনা (বেশি হলে নতুনগুলো বাদ, গোনা হয়)
+
+# --- Analytics Export ---
+EXPORT_DIR = BASE_DIR / 'exports'
+EXPORT_CHUNK_ROWS = 5000  # প্রতি fetchmany তে কত সারি পড়া হয়
+
+# --- Runtime Monitor ---
+MONITOR_PROBE_INTERVAL = 0.5  # event loop ল্যাগ probe (সেকেন্ড)
+MONITOR_LAG_WARN = 0.2  # এর বেশি ল্যাগে ওয়ার্নিং (সেকেন্ড)
+MONITOR_QUEUE_WARN = 8  # executor কিউতে এর বেশি অপেক্ষমাণ কাজে ওয়ার্নিং
+MONITOR_WARN_EVERY = 30  # একই ওয়ার্নিং আবার লগ করার আগে বিরতি (সেকেন্ড)
+MONITOR_SNAPSHOT_INTERVAL = 30  # monitor-<name>.json লেখার বিরতি (সেকেন্ড)
+
+# --- Backups ---
+BACKUP_ENABLED = os.getenv('BACKUP_ENABLED', '1') == '1'
+BACKUP_DIR = BASE_DIR / 'backups'
+BACKUP_SHIP_INTERVAL = 5  # WAL ফ্রেম শিপিং বিরতি = RPO (সেকেন্ড)
+BACKUP_BASE_INTERVAL = 6 * 3600  # নতুন বেস স্ন্যাপশটের বিরতি (সেকেন্ড)
+BACKUP_STEP_PAGES = 256  # backup() এর প্রতি ধাপে কত পেজ
+BACKUP_STEP_SLEEP = 0.005  # ধাপগুলোর মাঝে বিরতি (ফোনের স্টোরেজ I/O কম রাখতে)
+BACKUP_CHECKPOINT_FRAMES = 1000  # WAL এ এত ফ্রেম হলে শিপিংয়ের পর checkpoint (SQLite এর ডিফল্ট autocheckpoint এর সমান)
+BACKUP_KEEP_BASES = 3  # কতগুলো বেস স্ন্যাপশট (ও তাদের WAL) রাখা হয়
+
+# --- Background Jobs ---
+JOBS_WORKERS = 2  # ভারী জবের নিজস্ব থ্রেড (DB pool ও event loop এ হ্যান্ডলারের সাথে ভিড় করে না)
+JOBS_JITTER = 0.1  # বিরতির এই অনুপাত পর্যন্ত এলোমেলো দেরি, যাতে সব জব একসাথে না জাগে
+JOBS_CONTROL_INTERVAL = 5  # জবের প্রসেস অন্য worker এর /jobs কমান্ড পড়ে (সেকেন্ড; একাধিক worker হলেই)
+JOBS_SNAPSHOT_INTERVAL = 60  # global জবের মেট্রিক settings এ লেখার বিরতি (কমান্ড চালালে সাথে সাথে)
+JOBS_COMMAND_TTL = 300  # এর চেয়ে পুরনো না-চালানো কমান্ড বাদ (জবের প্রসেস বন্ধ ছিল)
+DEPOSIT_PRUNE_INTERVAL = 600  # ডিপোজিট ভেলোসিটি কাউন্টার পরিষ্কারের বিরতি (প্রতি প্রসেসে, সেকেন্ড)
+MATCH_TIMEOUT = 20 * 60  # তৈরি হওয়ার এতক্ষণ পরেও কোনো স্ক্রিনশট না এলে ম্যাচ বাতিল (সেকেন্ড)
+MATCH_TIMEOUT_INTERVAL = 60  # টাইমআউট জবের বিরতি (সেকেন্ড)
+RATE_LIMIT_PRUNE_INTERVAL = 300  # RateLimiter এর নিষ্ক্রিয় ইউজার মুছার বিরতি (সেকেন্ড)
+PENDING_REMIND_AGE = 3600  # এর চেয়ে পুরনো pending ডিপোজিট/উত্তোলন অ্যাডমিনকে মনে করানো হয় (সেকেন্ড)
+PENDING_REMIND_INTERVAL = 3600  # রিমাইন্ডার জবের বিরতি (সেকেন্ড)
+
+# --- Deployment Mode ---
+# 'polling' = এক প্রসেস; 'webhook' = লোকাল HTTP ফ্রন্ট + user_id অনুযায়ী N worker প্রসেস
+RUN_MODE = os.getenv('RUN_MODE', 'polling')
+TELEGRAM_BASE_URL = os.getenv('TELEGRAM_BASE_URL', 'https://api.telegram.org/bot')  # fake_telegram.py দিয়ে টেস্ট করা যায়
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # পাবলিক URL (reverse proxy/tunnel); খালি হলে setWebhook হয় না
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')  # খালি হলে WEBHOOK_URL থাকলে র‍্যান্ডম তৈরি হয়, না থাকলে স্টার্ট হয় না
+WEBHOOK_MAX_BODY = 1024 * 1024  # এর চেয়ে বড় রিকোয়েস্ট বডি 413 (বাইট)
+WEBHOOK_INBOX_SIZE = 1000  # প্রতি worker এর অপেক্ষমাণ আপডেট সীমা; ভরলে 503 (Telegram পরে আবার পাঠায়)
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', str(os.cpu_count() or 2)))
+
+# --- Startup Profiling ---
+# BOT_STARTUP_PROFILE=1 (অথবা `python bot.py --startup-profile`) দিলে
+# import এবং init সময়ের হিসাব প্রিন্ট করে বট পোলিং শুরু না করেই বের হয়ে যায়
+STARTUP_PROFILE = os.getenv('BOT_STARTUP_PROFILE', '0') == '1'
@@ -0,0 +1,228 @@
+# conformance.py - স্টোরেজ ব্যাকএন্ডের আচরণ যাচাই (storage.py)
+# প্রতিটি ব্যাকএন্ডকে একই চেকগুলো পাস করতে হবে, যাতে MemoryStorage এ চালানো বেঞ্চমার্ক/ডেভ বট
+# আসল SQLite আচরণের সাথে মেলে। প্রতিটি চেক নতুন খালি স্টোরেজ পায়।
+# ব্যবহার: python conformance.py [--backends sqlite,memory]
+import argparse
+import itertools
+import sys
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+import config
+import db
+import storage
+from records import HistoryRow, LeaderRow, MatchRow, QueueRow, UserRow
+
+CHECKS: List[Callable[[storage.Storage], None]] = []
+
+def check(func: Callable[[storage.Storage], None]) -> Callable[[storage.Storage], None]:
+    CHECKS.append(func)
+    return func
+
+def _registered(s: storage.Storage, uid: int, name: str, balance: float = 0.0) -> None:
+    s.create_user(uid, name, None)
+    s.update_user_fields(uid, {'is_registered': 1, 'balance': balance})
+
+@check
+def users_create_and_get(s):
+    assert s.get_user(1) is None
+    s.create_user(1, 'alice', None)
+    u = s.get_user(1)
+    assert isinstance(u, UserRow)
+    assert (u.user_id, u.ingame_name, u.balance, u.wins, u.elo_rating, u.is_registered) == (1, 'alice', 0, 0, 1000, 0)
+    assert u['ingame_name'] == 'alice' and u.get('missing', 7) == 7
+    s.create_user(1, 'renamed', None)  # বিদ্যমান ইউজার বদলায় না
+    assert s.get_user(1).ingame_name == 'alice'
+
+@check
+def users_referrer_rules(s):
+    s.create_user(1, 'root', None)
+    s.create_user(2, 'child', 1)
+    s.create_user(3, 'self', 3)
+    s.create_user(4, 'ghost', 99)
+    s.create_user(1, 'root', 2)  # পুরনো ইউজারের রেফারার বদলায় না
+    assert [s.get_user(u).referrer_id for u in (1, 2, 3, 4)] == [None, 1, None, None]
+
+@check
+def users_update_fields(s):
+    s.create_user(1, 'a', None)
+    s.update_user_fields(1, {'state': 'awaiting_phone', 'state_data': 'x', 'phone_number': '017'})
+    u = s.get_user(1)
+    assert (u.state, u.state_data) == ('awaiting_phone', 'x')
+    s.update_user_fields(1, {'no_such_column': 1})  # ত্রুটি লগ হয়, কিছু বদলায় না
+    assert s.get_user(1).state == 'awaiting_phone'
+    s.update_user_fields(42, {'state': 'x'})  # নেই এমন ইউজার: কিছুই হয় না
+    assert s.get_user(42) is None
+
+@check
+def users_registered_views(s):
+    for uid, elo in ((1, 1100), (2, 900), (3, 1200)):
+        _registered(s, uid, f'p{uid}')
+        s.update_user_fields(uid, {'elo_rating': elo})
+    s.create_user(4, 'unregistered', None)
+    assert sorted(s.get_all_ids()) == [1, 2, 3]
+    assert s.total_users() == 3
+    top = s.get_top_wins(2)
+    assert all(isinstance(r, LeaderRow) for r in top)
+    assert [(r.ingame_name, r.elo_rating) for r in top] == [('p3', 1200), ('p1', 1100)]
+
+@check
+def ledger_adjust_balance(s):
+    _registered(s, 1, 'a', 10.0)
+    s.adjust_balance(1, 5.5, 'deposit', 'tx1')
+    s.adjust_balance(1, -3.0, 'withdrawal_request')
+    assert abs(s.get_user(1).balance - 12.5) < 1e-9
+    rows = s.get_ledger(1, 10)
+    assert [(r['amount'], r['type'], r['note']) for r in rows] == [(-3.0, 'withdrawal_request', ''), (5.5, 'deposit', 'tx1')]
+    assert len(s.get_ledger(1, 1)) == 1
+    s.adjust_balance(99, 1.0, 'orphan')  # ইউজার না থাকলেও লেজার সারি থাকে
+    assert [r['type'] for r in s.get_ledger(99, 10)] == ['orphan']
+
+@check
+def queue_match_or_enqueue(s):
+    for uid in (1, 2, 3):
+        _registered(s, uid, f'p{uid}', 100.0)
+    assert s.match_or_enqueue(1, 20.0) == (None, None, True)
+    assert s.match_or_enqueue(1, 20.0) == (None, None, True)  # নিজের সাথে ম্যাচ নয়
+    assert s.match_or_enqueue(2, 50.0) == (None, None, True)  # ভিন্ন ফি
+    opp, mid, queued = s.match_or_enqueue(3, 20.0)
+    assert isinstance(opp, QueueRow) and (opp.user_id, opp.fee) == (1, 20.0) and mid and not queued
+    m = s.get_match(mid)
+    assert (m.player1_id, m.player2_id, m.fee, m.status) == (3, 1, 20.0, 'waiting_for_code')
+    assert s.find_opponent(20.0, 0) is None  # দুজনই কিউ থেকে সরেছে
+    assert s.find_opponent(50.0, 0).user_id == 2
+    assert s.match_or_enqueue(2, 20.0) == (None, None, True)  # আগের 50 TK এন্ট্রি বদলে যায়
+    assert s.find_opponent(50.0, 0) is None
+
+@check
+def queue_oldest_first_and_remove(s):
+    s.add_to_queue(1, 20.0, 11)
+    time.sleep(1.05)
+    s.add_to_queue(2, 20.0, 12)
+    opp = s.find_opponent(20.0, 3)
+    assert isinstance(opp, QueueRow) and (opp.user_id, opp.lobby_message_id) == (1, 11)
+    assert s.find_opponent(20.0, 1).user_id == 2
+    s.remove_from_queue(1)
+    assert s.find_opponent(20.0, 3).user_id == 2
+    s.remove_from_queue(1)  # আবার মুছা নিরাপদ
+
+@check
+def queue_ttl(s):
+    s.add_to_queue(1, 20.0, 0)
+    ttl = config.QUEUE_TTL
+    config.QUEUE_TTL = -5  # সব এন্ট্রি মেয়াদোত্তীর্ণ
+    try:
+        assert s.find_opponent(20.0, 2) is None
+        assert s.match_or_enqueue(2, 20.0) == (None, None, True)
+    finally:
+        config.QUEUE_TTL = ttl
+    assert {s.find_opponent(20.0, 3).user_id, s.find_opponent(20.0, 1).user_id} == {1, 2}
+
+@check
+def match_lifecycle(s):
+    _registered(s, 1, 'a', 100.0)
+    _registered(s, 2, 'b', 100.0)
+    mid = s.create_match(1, 2, 20.0)
+    assert s.get_match('nope') is None
+    s.set_room_code(mid, 'R1')
+    m = s.get_match(mid)
+    assert isinstance(m, MatchRow) and (m.room_code, m.status) == ('R1', 'in_progress')
+    s.submit_screenshot(mid, 1, 'f1')
+    m = s.submit_screenshot(mid, 2, 'f2')
+    assert (m.p1_screenshot_id, m.p2_screenshot_id) == ('f1', 'f2')
+    assert s.submit_screenshot('nope', 1, 'x') is None
+    assert s.resolve_match(mid, 2)
+    assert not s.resolve_match(mid, 1)  # দ্বিতীয়বার নয়
+    m, w, l = s.get_match(mid), s.get_user(2), s.get_user(1)
+    assert (m.status, m.winner_id) == ('completed', 2)
+    assert (w.wins, w.losses, l.wins, l.losses) == (1, 0, 0, 1)
+    assert w.elo_rating > 1000 > l.elo_rating
+    assert abs(w.balance - (100.0 + 20.0 * 2 * 0.9)) < 1e-9 and l.balance == 100.0
+    assert s.get_ledger(2, 1)[0]['type'] == 'match_win'
+    assert s.total_matches() == 1
+
+@check
+def match_free_and_cancel(s):
+    _registered(s, 1, 'a')
+    _registered(s, 2, 'b')
+    mid = s.create_match(1, 2, 0.0)
+    s.cancel_match(mid)
+    assert s.get_match(mid).status == 'cancelled'
+    assert s.total_matches() == 0
+    assert s.resolve_match(mid, 1)  # SQLite আচরণ: শুধু completed ম্যাচ আবার resolve হয় না
+    assert s.get_ledger(1, 5) == []  # ফ্রি ম্যাচে পেআউট নেই
+    assert not s.resolve_match(s.create_match(1, 99, 0.0), 1)  # প্রতিপক্ষ নেই
+
+@check
+def match_history_and_streaks(s):
+    for uid in (1, 2):
+        _registered(s, uid, f'p{uid}', 100.0)
+    assert s.get_history(1, 0, 5) == []
+    winners = [1, 1, 2, 1, 1, 1]
+    mids = []
+    for wid in winners:
+        mid = s.create_match(1, 2, 10.0)
+        assert s.resolve_match(mid, wid)
+        mids.append(mid)
+    p1, p2 = s.get_user(1), s.get_user(2)
+    assert (p1.current_streak, p1.best_streak, p2.current_streak, p2.best_streak) == (3, 3, -3, 1)
+    rows = s.get_history(1, 0, 10)
+    assert all(isinstance(r, HistoryRow) for r in rows) and len(rows) == 6
+    assert {r.match_id for r in rows} == set(mids)
+    assert [r.played_at for r in rows] == sorted((r.played_at for r in rows), reverse=True)  # নতুনটা আগে
+    assert sum(r.won for r in rows) == 5
+    assert all((r.opponent_id, r.opponent_name, r.fee) == (2, 'p2', 10.0) for r in rows)
+    assert all(r.elo_after - r.elo_before > 0 for r in rows if r.won)
+    assert [r.match_id for r in s.get_history(1, 2, 3)] == [r.match_id for r in rows[2:5]]
+    assert s.get_history(1, 6, 5) == [] and s.get_history(1, 10, 5) == []
+    assert sum(r.won for r in s.get_history(2, 0, 10)) == 1
+
+@check
+def settings_roundtrip(s):
+    assert s.get_setting('k') is None
+    s.set_setting('k', 'v1')
+    s.set_setting('k', 'v2')
+    assert s.get_setting('k') == 'v2'
+
+def run(factory: Callable[[], storage.Storage]) -> List[Tuple[str, Optional[str]]]:
+    """প্রতিটি চেক নতুন স্টোরেজে; (নাম, ত্রুটি বা None)"""
+    results = []
+    for func in CHECKS:
+        try:
+            func(factory())
+            results.append((func.__name__, None))
+        except Exception as e:
+            frame = traceback.extract_tb(e.__traceback__)[-1]
+            results.append((func.__name__, f"{type(e).__name__} {e} (line {frame.lineno}: {frame.line})"))
+    return results
+
+def sqlite_factory(workdir: Path) -> Callable[[], storage.Storage]:
+    """প্রতিবার নতুন ফাইলের SQLiteStorage (bench_db.py এর মতো config.LOCAL_DB বদলে)"""
+    counter = itertools.count()
+    def make() -> storage.Storage:
+        db.close_conn()
+        config.LOCAL_DB = str(workdir / f'conformance_{next(counter)}.db')
+        db.init_db()
+        return storage.SQLiteStorage()
+    return make
+
+def main():
+    parser = argparse.ArgumentParser(description='Storage backend conformance checks')
+    parser.add_argument('--backends', default=','.join(storage.BACKENDS))
+    args = parser.parse_args()
+
+    failed = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        factories = {'sqlite': sqlite_factory(Path(tmp)), 'memory': storage.MemoryStorage}
+        for name in args.backends.split(','):
+            for check_name, error in run(factories[name]):
+                failed += error is not None
+                print(f"{name:<8} {check_name:<32} {'ok' if error is None else 'FAIL: ' + error}")
+        db.close_conn()
+    print(f"{len(CHECKS) * len(args.backends.split(',')) - failed} passed, {failed} failed")
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -2,17 +2,37 @@
 import sqlite3
 import time
 import asyncio
+import json
 import logging
 from datetime import datetime
 import uuid
 import config
+import rating
+from records import UserRow, MatchRow, QueueRow, LeaderRow, HistoryRow
 import threading
-from typing import Optional, Dict, List, Any
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Any, Tuple, Callable
 
 logger = logging.getLogger(__name__)
 _conn = None
 _thread_lock = threading.Lock()
 _async_lock = None
+# সব লেখা একটি connection এ হয়, তাই ট্রানজ্যাকশন চলাকালীন অন্য থ্রেড যেন
+# সেই connection এ লিখতে না পারে
+_write_lock = threading.RLock()
+_tx_local = threading.local()
+# প্রতি থ্রেডে আলাদা read-only connection (প্রতিটি প্রসেসের নিজস্ব read pool)
+_read_local = threading.local()
+_read_conns = []
+_read_gen = 0
+
+def get_db_profile(name: Optional[str] = None) -> Dict[str, Any]:
+    """কনফিগ থেকে SQLite পারফরমেন্স প্রোফাইল"""
+    name = name or config.DB_PROFILE
+    if name not in config.DB_PROFILES:
+        logger.warning(f"Unknown DB profile '{name}', using 'default'")
+        name = 'default'
+    return config.DB_PROFILES[name]
 
 def get_conn():
     """Termux সামঞ্জস্যপূর্ণ ডাটাবেস সংযোগ (উন্নত)"""
@@ -20,87 +40,325 @@ def get_conn():
     if _conn is None:
         with _thread_lock:
             if _conn is None:
+                config.ensure_dirs()
+                profile = get_db_profile()
                 try:
                     _conn = sqlite3.connect(
                         config.LOCAL_DB,
                         check_same_thread=False,
                         timeout=config.DB_TIMEOUT,
-                        isolation_level=None  # Autocommit mode
+                        isolation_level=None,  # Autocommit mode
+                        cached_statements=profile['cached_statements']
                     )
                     _conn.row_factory = sqlite3.Row
                     # WAL mode for better concurrency
                     try:
                         _conn.execute("PRAGMA journal_mode=WAL")
-                        _conn.execute("PRAGMA synchronous=NORMAL")
+                        _conn.execute(f"PRAGMA synchronous={profile['synchronous']}")
                         _conn.execute(f"PRAGMA busy_timeout={int(config.DB_TIMEOUT * 1000)}")
+                        if config.BACKUP_ENABLED:
+                            # checkpoint শুধু backup.py করে, সব WAL ফ্রেম শিপ হওয়ার পরে
+                            _conn.execute("PRAGMA wal_autocheckpoint=0")
                     except:
                         pass  # Some Termux devices may not support WAL
-                    logger.info(f"Database connected: {config.LOCAL_DB}")
+                    # mmap কিছু ফাইলসিস্টেমে কাজ নাও করতে পারে, তাই আলাদা চেষ্টা
+                    for pragma in ('cache_size', 'mmap_size', 'temp_store'):
+                        try:
+                            _conn.execute(f"PRAGMA {pragma}={profile[pragma]}")
+                        except sqlite3.Error as e:
+                            logger.warning(f"PRAGMA {pragma} not applied: {e}")
+                    logger.info(f"Database connected: {config.LOCAL_DB} (profile={config.DB_PROFILE})")
                 except Exception as e:
                     logger.error(f"Database connection failed: {e}")
                     raise
     return _conn
 
-def init_db():
-    """ডাটাবেস টেবিল সৃষ্টি"""
-    try:
+def get_read_conn():
+    """বর্তমান থ্রেডের read-only সংযোগ (WAL এ লেখকদের ব্লক করে না)"""
+    conn = getattr(_read_local, 'conn', None)
+    if conn is None or getattr(_read_local, 'gen', None) != _read_gen:
+        get_conn()  # ডাটাবেস ফাইল ও WAL আগে তৈরি নিশ্চিত করা
+        profile = get_db_profile()
+        conn = sqlite3.connect(
+            f"file:{config.LOCAL_DB}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            timeout=config.DB_TIMEOUT,
+            isolation_level=None,
+            cached_statements=profile['cached_statements']
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in ('cache_size', 'mmap_size', 'temp_store'):
+            try:
+                conn.execute(f"PRAGMA {pragma}={profile[pragma]}")
+            except sqlite3.Error:
+                pass
+        _read_local.conn = conn
+        _read_local.gen = _read_gen
+        with _thread_lock:
+            _read_conns.append(conn)
+    return conn
+
+def _reader():
+    """ট্রানজ্যাকশনের ভেতরে থাকলে লেখার connection, না হলে read pool"""
+    if getattr(_tx_local, 'depth', 0):
+        return get_conn()
+    return get_read_conn()
+
+@contextmanager
+def transaction():
+    """BEGIN IMMEDIATE ট্রানজ্যাকশন (নেস্টেড হলে বাইরেরটাই কমিট করে)
+
+    IMMEDIATE লক ডাটাবেস ফাইলের উপর, তাই একাধিক worker প্রসেসের
+    ওয়ালেট ও ম্যাচমেকিং লেখাও সিরিয়ালাইজ হয়।
+    """
+    with _write_lock:
         conn = get_conn()
-        c = conn.cursor()
-
-        # টেবিল তৈরি
-        c.execute('''CREATE TABLE IF NOT EXISTS users
-                     (user_id INTEGER PRIMARY KEY, ingame_name TEXT, phone_number TEXT,
-                      is_registered INTEGER DEFAULT 0, balance REAL DEFAULT 0,
-                      welcome_given INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
-                      losses INTEGER DEFAULT 0, created_at TIMESTAMP, state TEXT,
-                      state_data TEXT, referrer_id INTEGER, elo_rating INTEGER DEFAULT 1000,
-                      is_banned INTEGER DEFAULT 0)''')
-
-        c.execute('''CREATE TABLE IF NOT EXISTS deposit_requests
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, txid TEXT,
-                      amount REAL, status TEXT DEFAULT "pending", created_at INTEGER)''')
-
-        c.execute('''CREATE TABLE IF NOT EXISTS withdrawal_requests
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount REAL,
-                      method TEXT, account_number TEXT, status TEXT DEFAULT "pending",
-                      created_at INTEGER)''')
-
-        c.execute('''CREATE TABLE IF NOT EXISTS transactions
-                     (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount REAL,
-                      type TEXT, note TEXT, created_at INTEGER)''')
-
-        c.execute('''CREATE TABLE IF NOT EXISTS matchmaking_queue
-                     (user_id INTEGER PRIMARY KEY, fee REAL, joined_at INTEGER,
-                      lobby_message_id INTEGER)''')
-
-        c.execute('''CREATE TABLE IF NOT EXISTS active_matches
-                     (match_id TEXT PRIMARY KEY, player1_id INTEGER, player2_id INTEGER,
-                      fee REAL, status TEXT, room_code TEXT, created_at INTEGER,
-                      p1_screenshot_id TEXT, p2_screenshot_id TEXT, winner_id INTEGER)''')
-
-        c.execute('''CREATE TABLE IF NOT EXISTS settings
-                     (key TEXT PRIMARY KEY, value TEXT)''')
-
-        # নতুন কলাম যোগ করা (নিরাপদ)
+        depth = getattr(_tx_local, 'depth', 0)
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+            _tx_local.after = []
+        _tx_local.depth = depth + 1
         try:
-            c.execute("ALTER TABLE users ADD COLUMN is_banned INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass
+            yield conn.cursor()
+        except BaseException:
+            _tx_local.depth = depth
+            if depth == 0:
+                _tx_local.after = []
+                conn.execute("ROLLBACK")
+            raise
+        _tx_local.depth = depth
+        if depth == 0:
+            conn.execute("COMMIT")
+            callbacks, _tx_local.after = _tx_local.after, []
+            for cb in callbacks:
+                try:
+                    cb()
+                except Exception as e:
+                    logger.error(f"after_commit callback error: {e}")
+
+def after_commit(cb: Callable[[], None]) -> None:
+    """বাইরের ট্রানজ্যাকশন কমিট হলে cb চালানো (রোলব্যাকে বাদ; ট্রানজ্যাকশনের বাইরে হলে এখনই)"""
+    if getattr(_tx_local, 'depth', 0):
+        _tx_local.after.append(cb)
+    else:
+        cb()
+
+def close_conn() -> None:
+    """সংযোগ বন্ধ করা (বেঞ্চমার্ক/শাটডাউনের জন্য)"""
+    global _conn, _read_gen
+    with _thread_lock:
+        for rc in _read_conns:
+            rc.close()
+        _read_conns.clear()
+        _read_gen += 1
+        if _conn is not None:
+            try:
+                _conn.execute("PRAGMA optimize")
+            except sqlite3.Error:
+                pass
+            _conn.close()
+            _conn = None
+
+def run_maintenance_sync() -> Optional[Dict[str, int]]:
+    """PRAGMA optimize এবং WAL checkpoint(TRUNCATE); ব্যাকআপ চালু থাকলে checkpoint backup.py করে"""
+    try:
+        conn = get_conn()
+        with _write_lock:
+            conn.execute("PRAGMA optimize")
+            if config.BACKUP_ENABLED:
+                return {'optimized': 1}
+            busy, wal_pages, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        return {'busy': busy, 'wal_pages': wal_pages, 'checkpointed': checkpointed}
+    except Exception as e:
+        logger.error(f"run_maintenance_sync error: {e}")
+        return None
 
-        try:
-            c.execute("ALTER TABLE users ADD COLUMN elo_rating INTEGER DEFAULT 1000")
-        except sqlite3.OperationalError:
-            pass
+# --- Schema Migrations ---
+# প্রতিটি মাইগ্রেশন একবারই চলে; সর্বশেষ প্রয়োগকৃত ভার্সন PRAGMA user_version এ থাকে,
+# তাই আপ-টু-ডেট ডাটাবেসে বুটের সময় কোনো DDL চলে না।
+def _migrate_v1(c):
+    """বেসলাইন স্কিমা (পুরনো ডাটাবেসেও নিরাপদ)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (user_id INTEGER PRIMARY KEY, ingame_name TEXT, phone_number TEXT,
+                  is_registered INTEGER DEFAULT 0, balance REAL DEFAULT 0,
+                  welcome_given INTEGER DEFAULT 0, wins INTEGER DEFAULT 0,
+                  losses INTEGER DEFAULT 0, created_at TIMESTAMP, state TEXT,
+                  state_data TEXT, referrer_id INTEGER, elo_rating INTEGER DEFAULT 1000,
+                  is_banned INTEGER DEFAULT 0)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS deposit_requests
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, txid TEXT,
+                  amount REAL, status TEXT DEFAULT "pending", created_at INTEGER)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS withdrawal_requests
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount REAL,
+                  method TEXT, account_number TEXT, status TEXT DEFAULT "pending",
+                  created_at INTEGER)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS transactions
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER, amount REAL,
+                  type TEXT, note TEXT, created_at INTEGER)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS matchmaking_queue
+                 (user_id INTEGER PRIMARY KEY, fee REAL, joined_at INTEGER,
+                  lobby_message_id INTEGER)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS active_matches
+                 (match_id TEXT PRIMARY KEY, player1_id INTEGER, player2_id INTEGER,
+                  fee REAL, status TEXT, room_code TEXT, created_at INTEGER,
+                  p1_screenshot_id TEXT, p2_screenshot_id TEXT, winner_id INTEGER)''')
+
+    c.execute('''CREATE TABLE IF NOT EXISTS settings
+                 (key TEXT PRIMARY KEY, value TEXT)''')
+
+    # পুরনো ডাটাবেসে যে কলামগুলো নেই সেগুলো যোগ করা
+    cols = {r['name'] for r in c.execute("PRAGMA table_info(users)")}
+    if 'is_banned' not in cols:
+        c.execute("ALTER TABLE users ADD COLUMN is_banned INTEGER DEFAULT 0")
+    if 'elo_rating' not in cols:
+        c.execute("ALTER TABLE users ADD COLUMN elo_rating INTEGER DEFAULT 1000")
+
+    # ইন্ডেক্স তৈরি (পারফরমেন্স বৃদ্ধি)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_user_registered ON users(is_registered)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_match_status ON active_matches(status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_queue_fee ON matchmaking_queue(fee)")
+
+def _migrate_v2(c):
+    """টুর্নামেন্ট টেবিল"""
+    c.execute('''CREATE TABLE IF NOT EXISTS tournaments
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT, format TEXT,
+                  status TEXT DEFAULT 'registration', entry_fee REAL DEFAULT 0,
+                  total_rounds INTEGER DEFAULT 0, current_round INTEGER DEFAULT 0,
+                  winner_id INTEGER, created_at INTEGER)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS tournament_players
+                 (tournament_id INTEGER, user_id INTEGER, seed INTEGER,
+                  score REAL DEFAULT 0, eliminated INTEGER DEFAULT 0, had_bye INTEGER DEFAULT 0,
+                  joined_at INTEGER, PRIMARY KEY (tournament_id, user_id)) WITHOUT ROWID''')
+    # player2_id NULL মানে bye; match_id দিয়ে resolve_match থেকে খোঁজা হয়
+    c.execute('''CREATE TABLE IF NOT EXISTS tournament_matches
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, tournament_id INTEGER, round INTEGER,
+                  slot INTEGER, match_id TEXT, player1_id INTEGER, player2_id INTEGER,
+                  winner_id INTEGER)''')
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_tmatch_match ON tournament_matches(match_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_tmatch_round ON tournament_matches(tournament_id, round, winner_id)")
+
+def _migrate_v3(c):
+    """ডিপোজিট txid এর normalized ইউনিক ইন্ডেক্স"""
+    cols = {r['name'] for r in c.execute("PRAGMA table_info(deposit_requests)")}
+    if 'txid_norm' not in cols:
+        c.execute("ALTER TABLE deposit_requests ADD COLUMN txid_norm TEXT")
+    # পুরনো ডুপ্লিকেটের মধ্যে শুধু প্রথমটি normalized txid পায়, বাকিগুলো NULL থাকে
+    c.execute("""UPDATE deposit_requests SET txid_norm=UPPER(TRIM(txid))
+                 WHERE id IN (SELECT MIN(id) FROM deposit_requests
+                              WHERE txid IS NOT NULL GROUP BY UPPER(TRIM(txid)))""")
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dep_txid_norm ON deposit_requests(txid_norm)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dep_user_time ON deposit_requests(user_id, created_at)")
+
+def _migrate_v4(c):
+    """অ্যাডমিন-নির্ধারিত FAQ টেবিল"""
+    c.execute('''CREATE TABLE IF NOT EXISTS faq
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, question TEXT, answer TEXT,
+                  created_at INTEGER)''')
+
+def _migrate_v5(c):
+    """রেফারেল গ্রাফ ইন্ডেক্স ও রেফারেল রিওয়ার্ড কিউ"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_user_referrer ON users(referrer_id)")
+    # প্রতি referee ও ট্রিগারে একটিই রিওয়ার্ড (PRIMARY KEY), তাই বারবার কিউ করা নিরাপদ
+    c.execute('''CREATE TABLE IF NOT EXISTS referral_rewards
+                 (referee_id INTEGER, trigger TEXT, referrer_id INTEGER, amount REAL,
+                  status TEXT DEFAULT 'pending', created_at INTEGER, paid_at INTEGER,
+                  PRIMARY KEY (referee_id, trigger)) WITHOUT ROWID''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_refrew_pending ON referral_rewards(created_at) WHERE status='pending'")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_refrew_referrer ON referral_rewards(referrer_id, status)")
+
+def _migrate_v6(c):
+    """কিউ বয়স অনুযায়ী খোঁজা/মেয়াদোত্তীর্ণ করার জন্য (fee, joined_at) ইন্ডেক্স"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_queue_fee_joined ON matchmaking_queue(fee, joined_at)")
+    c.execute("DROP INDEX IF EXISTS idx_queue_fee")  # নতুন ইন্ডেক্সের prefix, আর দরকার নেই
+
+def _migrate_v7(c):
+    """প্রতি খেলোয়াড়ের ম্যাচ হিস্টোরি ও স্ট্রিক
+
+    (user_id, played_at) ক্রমে সাজানো WITHOUT ROWID টেবিল, তাই একজনের সাম্প্রতিক ম্যাচ
+    active_matches স্ক্যান ছাড়া একটি রেঞ্জ রিড। resolve_match_sync এটি ভরে।
+    """
+    c.execute('''CREATE TABLE IF NOT EXISTS match_history
+                 (user_id INTEGER, played_at INTEGER, match_id TEXT, opponent_id INTEGER, fee REAL,
+                  won INTEGER, elo_before INTEGER, elo_after INTEGER,
+                  PRIMARY KEY (user_id, played_at, match_id)) WITHOUT ROWID''')
+    cols = {r['name'] for r in c.execute("PRAGMA table_info(users)")}
+    if 'current_streak' not in cols:
+        c.execute("ALTER TABLE users ADD COLUMN current_streak INTEGER DEFAULT 0")  # +জয়, -হার
+    if 'best_streak' not in cols:
+        c.execute("ALTER TABLE users ADD COLUMN best_streak INTEGER DEFAULT 0")
+    # পুরনো সম্পন্ন ম্যাচ থেকে হিস্টোরি (resolve এর সময় জানা নেই, তাই created_at; ELO অজানা)
+    c.execute("""INSERT OR IGNORE INTO match_history(user_id, played_at, match_id, opponent_id, fee, won)
+                 SELECT player1_id, created_at, match_id, player2_id, fee, winner_id = player1_id
+                 FROM active_matches WHERE status = 'completed' AND winner_id IS NOT NULL
+                 UNION ALL
+                 SELECT player2_id, created_at, match_id, player1_id, fee, winner_id = player2_id
+                 FROM active_matches WHERE status = 'completed' AND winner_id IS NOT NULL""")
+    streaks: Dict[int, List[int]] = {}
+    for uid, won in c.execute("SELECT user_id, won FROM match_history ORDER BY user_id, played_at, match_id").fetchall():
+        cur, best = streaks.setdefault(uid, [0, 0])
+        cur = max(cur, 0) + 1 if won else min(cur, 0) - 1
+        streaks[uid] = [cur, max(best, cur)]
+    c.executemany("UPDATE users SET current_streak=?, best_streak=? WHERE user_id=?",
+                  [(cur, best, uid) for uid, (cur, best) in streaks.items()])
+
+def _migrate_v8(c):
+    """pending রিমাইন্ডার জবের জন্য partial ইন্ডেক্স (খোলা ম্যাচ idx_match_status দিয়েই খোঁজা হয়)"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_dep_pending ON deposit_requests(created_at) WHERE status='pending'")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_wd_pending ON withdrawal_requests(created_at) WHERE status='pending'")
+
+def _migrate_v9(c):
+    """সন্দেহজনক ডিপোজিট ঘটনা (সব worker লেখে, জব worker এর ডাইজেস্ট খালি করে)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS deposit_alerts
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, created_at INTEGER, data TEXT)''')
+
+def _migrate_v10(c):
+    """অন্য worker থেকে আসা /jobs কমান্ড (জবের প্রসেস চালায় ও মুছে দেয়)"""
+    c.execute('''CREATE TABLE IF NOT EXISTS job_commands
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT, action TEXT, name TEXT, created_at INTEGER)''')
+
+MIGRATIONS = [
+    (1, _migrate_v1),
+    (2, _migrate_v2),
+    (3, _migrate_v3),
+    (4, _migrate_v4),
+    (5, _migrate_v5),
+    (6, _migrate_v6),
+    (7, _migrate_v7),
+    (8, _migrate_v8),
+    (9, _migrate_v9),
+    (10, _migrate_v10),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version() -> int:
+    return get_conn().execute("PRAGMA user_version").fetchone()[0]
 
-        # ইন্ডেক্স তৈরি (পারফরমেন্স বৃদ্ধি)
-        try:
-            c.execute("CREATE INDEX IF NOT EXISTS idx_user_registered ON users(is_registered)")
-            c.execute("CREATE INDEX IF NOT EXISTS idx_match_status ON active_matches(status)")
-            c.execute("CREATE INDEX IF NOT EXISTS idx_queue_fee ON matchmaking_queue(fee)")
-        except sqlite3.OperationalError:
-            pass
+def init_db():
+    """ডাটাবেস স্কিমা মাইগ্রেশন (শুধু প্রয়োজনীয় ধাপগুলো চলে)"""
+    try:
+        current = get_schema_version()
+        if current >= SCHEMA_VERSION:
+            logger.info(f"Database schema up to date (v{current})")
+            return
+
+        for version, migrate in MIGRATIONS:
+            if version <= current:
+                continue
+            with transaction() as c:
+                # write lock নেওয়ার পরে আবার পড়া: একসাথে চালু হওয়া অন্য worker হয়তো এটি আগেই চালিয়েছে
+                current = c.execute("PRAGMA user_version").fetchone()[0]
+                if version <= current:
+                    continue
+                migrate(c)
+                c.execute(f"PRAGMA user_version={version}")
+            logger.info(f"Applied schema migration v{version}")
 
-        conn.commit()
         logger.info("Database initialized successfully")
     except Exception as e:
         logger.error(f"Database initialization error: {e}")
@@ -112,10 +370,64 @@ async def run_db(func, *args):
     loop = asyncio.get_event_loop()
     return await loop.run_in_executor(None, lambda: func(*args))
 
+# --- Storage Backend ---
+# ইউজার/কিউ/ম্যাচ/লেজার/সেটিংসের async API storage.Storage ব্যাকএন্ডের মাধ্যমে চলে (storage.py)
+_backend = None
+
+def backend():
+    """সক্রিয় স্টোরেজ ব্যাকএন্ড (প্রথম ব্যবহারে config.STORAGE_BACKEND থেকে)"""
+    global _backend
+    if _backend is None:
+        import storage
+        _backend = storage.create(config.STORAGE_BACKEND)
+        if not isinstance(_backend, storage.SQLiteStorage):
+            logger.warning(f"Using {_backend.name} storage: core data is not persisted or shared between processes")
+    return _backend
+
+def set_backend(b) -> None:
+    """ব্যাকএন্ড বদলানো (টেস্ট/বেঞ্চমার্ক); None দিলে আবার config থেকে"""
+    global _backend
+    _backend = b
+
+async def _call(method: str, *args):
+    b = backend()
+    if b.inline:
+        return getattr(b, method)(*args)
+    return await run_db(getattr(b, method), *args)
+
+async def run_maintenance() -> Optional[Dict[str, int]]:
+    return await run_db(run_maintenance_sync)
+
+# --- Job Commands ---
+def add_job_command_sync(action: str, name: str) -> None:
+    try:
+        with transaction() as c:
+            c.execute("INSERT INTO job_commands(action, name, created_at) VALUES(?,?,?)",
+                      (action, name, int(time.time())))
+    except Exception as e:
+        logger.error(f"add_job_command_sync error: {e}")
+
+def take_job_commands_sync(max_age: int) -> List[Tuple[str, str]]:
+    """সব কমান্ড তুলে মুছে ফেলা; max_age এর চেয়ে পুরনোগুলো বাদ"""
+    try:
+        # প্রায় সবসময় খালি: write lock নেওয়ার আগে reader দিয়ে দেখা
+        if _reader().execute("SELECT 1 FROM job_commands LIMIT 1").fetchone() is None:
+            return []
+        with transaction() as c:
+            c.execute("SELECT action, name, created_at FROM job_commands ORDER BY id")
+            rows = c.fetchall()
+            if rows:
+                c.execute("DELETE FROM job_commands")
+        cutoff = int(time.time()) - max_age
+        return [(r[0], r[1]) for r in rows if r[2] >= cutoff]
+    except Exception as e:
+        logger.error(f"take_job_commands_sync error: {e}")
+        return []
+
 # --- Settings ---
 def get_setting_sync(key: str) -> Optional[str]:
     try:
-        c = get_conn().cursor()
+        c = _reader().cursor()
         c.execute("SELECT value FROM settings WHERE key=?", (key,))
         r = c.fetchone()
         return r['value'] if r else None
@@ -124,226 +436,448 @@ def get_setting_sync(key: str) -> Optional[str]:
         return None
 
 async def get_setting(key: str) -> Optional[str]:
-    return await run_db(get_setting_sync, key)
+    return await _call('get_setting', key)
 
 def set_setting_sync(key: str, value: str) -> None:
     try:
-        c = get_conn().cursor()
-        c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)", (key, value))
     except Exception as e:
         logger.error(f"set_setting_sync error: {e}")
 
 async def set_setting(key: str, v: str) -> None:
-    await run_db(set_setting_sync, key, v)
+    await _call('set_setting', key, v)
+
+# --- FAQ Ops ---
+def add_faq_sync(question: str, answer: str) -> Optional[int]:
+    try:
+        with transaction() as c:
+            c.execute("INSERT INTO faq(question, answer, created_at) VALUES(?,?,?)",
+                      (question, answer, int(time.time())))
+        return c.lastrowid
+    except Exception as e:
+        logger.error(f"add_faq_sync error: {e}")
+        return None
+
+async def add_faq(q: str, a: str) -> Optional[int]:
+    return await run_db(add_faq_sync, q, a)
+
+def delete_faq_sync(fid: int) -> bool:
+    try:
+        with transaction() as c:
+            c.execute("DELETE FROM faq WHERE id=?", (fid,))
+            return c.rowcount > 0
+    except Exception as e:
+        logger.error(f"delete_faq_sync error: {e}")
+        return False
+
+async def delete_faq(f: int) -> bool:
+    return await run_db(delete_faq_sync, f)
+
+def list_faq_sync() -> List[Dict[str, Any]]:
+    try:
+        c = _reader().cursor()
+        c.execute("SELECT id, question, answer FROM faq ORDER BY id")
+        return [dict(r) for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"list_faq_sync error: {e}")
+        return []
+
+async def list_faq() -> List[Dict[str, Any]]:
+    return await run_db(list_faq_sync)
 
 # --- User Functions ---
-def get_user_sync(uid: int) -> Optional[Dict[str, Any]]:
+def get_user_sync(uid: int) -> Optional[UserRow]:
     try:
-        c = get_conn().cursor()
-        c.execute('SELECT * FROM users WHERE user_id=?', (uid,))
-        r = c.fetchone()
-        return dict(r) if r else None
+        c = _reader().cursor()
+        c.row_factory = UserRow.factory
+        c.execute(f'SELECT {UserRow.columns()} FROM users WHERE user_id=?', (uid,))
+        return c.fetchone()
     except Exception as e:
         logger.error(f"get_user_sync error: {e}")
         return None
 
-async def get_user(uid: int) -> Optional[Dict[str, Any]]:
-    return await run_db(get_user_sync, uid)
+async def get_user(uid: int) -> Optional[UserRow]:
+    return await _call('get_user', uid)
 
 def create_user_sync(uid: int, name: str, ref: Optional[int]) -> None:
     try:
-        c = get_conn().cursor()
-        c.execute('INSERT OR IGNORE INTO users(user_id, ingame_name, created_at) VALUES(?,?,?)',
-                 (uid, name, datetime.now()))
-        if ref:
-            c.execute("UPDATE users SET referrer_id = ? WHERE user_id = ?", (ref, uid))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute('INSERT OR IGNORE INTO users(user_id, ingame_name, created_at) VALUES(?,?,?)',
+                     (uid, name, datetime.now()))
+            # রেফারার শুধু নতুন ইউজারে এবং বিদ্যমান অন্য ইউজার হলে (তাই গ্রাফে চক্র তৈরি হয় না)
+            if ref and ref != uid and c.rowcount == 1:
+                c.execute("UPDATE users SET referrer_id = ? WHERE user_id = ? AND EXISTS "
+                          "(SELECT 1 FROM users WHERE user_id = ?)", (ref, uid, ref))
     except Exception as e:
         logger.error(f"create_user_sync error: {e}")
 
 async def create_user_if_not_exists(u: int, n: str, r: Optional[int]) -> None:
-    await run_db(create_user_sync, u, n, r)
+    await _call('create_user', u, n, r)
 
 def update_user_fields_sync(uid: int, data: Dict[str, Any]) -> None:
     try:
-        c = get_conn().cursor()
-        sets = ','.join([f"{k}=?" for k in data.keys()])
-        params = list(data.values()) + [uid]
-        c.execute(f'UPDATE users SET {sets} WHERE user_id=?', params)
-        get_conn().commit()
+        with transaction() as c:
+            sets = ','.join([f"{k}=?" for k in data.keys()])
+            params = list(data.values()) + [uid]
+            c.execute(f'UPDATE users SET {sets} WHERE user_id=?', params)
     except Exception as e:
         logger.error(f"update_user_fields_sync error: {e}")
 
 async def update_user_fields(uid: int, data: Dict[str, Any]) -> None:
-    await run_db(update_user_fields_sync, uid, data)
+    await _call('update_user_fields', uid, data)
 
 async def set_user_state(uid: int, s: Optional[str], d: Optional[str] = None) -> None:
     await update_user_fields(uid, {'state': s, 'state_data': d})
 
 def adjust_balance_sync(uid: int, amt: float, type: str, note: str = '') -> None:
     try:
-        c = get_conn().cursor()
-        c.execute('UPDATE users SET balance=balance+? WHERE user_id=?', (amt, uid))
-        c.execute('INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)',
-                 (uid, amt, type, note, int(time.time())))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute('UPDATE users SET balance=balance+? WHERE user_id=?', (amt, uid))
+            c.execute('INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)',
+                     (uid, amt, type, note, int(time.time())))
     except Exception as e:
         logger.error(f"adjust_balance_sync error: {e}")
 
 async def adjust_balance(uid: int, amt: float, type: str, note: str = '') -> None:
-    await run_db(adjust_balance_sync, uid, amt, type, note)
+    await _call('adjust_balance', uid, amt, type, note)
+
+def get_ledger_sync(uid: int, limit: int = 20) -> List[Dict[str, Any]]:
+    """ইউজারের সাম্প্রতিক লেনদেন (নতুনটা আগে)"""
+    try:
+        c = _reader().cursor()
+        c.execute('SELECT id, user_id, amount, type, note, created_at FROM transactions WHERE user_id=? '
+                  'ORDER BY id DESC LIMIT ?', (uid, limit))
+        return [dict(r) for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"get_ledger_sync error: {e}")
+        return []
+
+async def get_ledger(uid: int, limit: int = 20) -> List[Dict[str, Any]]:
+    return await _call('get_ledger', uid, limit)
 
 # --- Matchmaking ---
-def find_opp_sync(fee: float, exc_uid: int) -> Optional[Dict[str, Any]]:
+def find_opp_sync(fee: float, exc_uid: int) -> Optional[QueueRow]:
     try:
-        c = get_conn().cursor()
-        c.execute('SELECT * FROM matchmaking_queue WHERE fee = ? AND user_id != ? LIMIT 1',
-                 (fee, exc_uid))
-        r = c.fetchone()
-        return dict(r) if r else None
+        c = _reader().cursor()
+        c.row_factory = QueueRow.factory
+        c.execute(f'SELECT {QueueRow.columns()} FROM matchmaking_queue WHERE fee = ? AND joined_at >= ? '
+                  'AND user_id != ? LIMIT 1', (fee, int(time.time()) - config.QUEUE_TTL, exc_uid))
+        return c.fetchone()
     except Exception as e:
         logger.error(f"find_opp_sync error: {e}")
         return None
 
-async def find_opponent_in_queue(f: float, e: int) -> Optional[Dict[str, Any]]:
-    return await run_db(find_opp_sync, f, e)
+async def find_opponent_in_queue(f: float, e: int) -> Optional[QueueRow]:
+    return await _call('find_opponent', f, e)
 
 def add_queue_sync(uid: int, fee: float, mid: int) -> None:
     try:
-        c = get_conn().cursor()
-        c.execute('INSERT OR REPLACE INTO matchmaking_queue(user_id,fee,joined_at,lobby_message_id) VALUES(?,?,?,?)',
-                 (uid, fee, int(time.time()), mid))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute('INSERT OR REPLACE INTO matchmaking_queue(user_id,fee,joined_at,lobby_message_id) VALUES(?,?,?,?)',
+                     (uid, fee, int(time.time()), mid))
     except Exception as e:
         logger.error(f"add_queue_sync error: {e}")
 
 async def add_to_queue(u: int, f: float, m: int) -> None:
-    await run_db(add_queue_sync, u, f, m)
+    await _call('add_to_queue', u, f, m)
+
+def match_or_enqueue_sync(uid: int, fee: float) -> Tuple[Optional[QueueRow], Optional[str], bool]:
+    """প্রতিপক্ষ থাকলে কিউ থেকে তুলে ম্যাচ তৈরি, না থাকলে নিজেকে কিউতে রাখা
+
+    পুরো কাজটি একটি IMMEDIATE ট্রানজ্যাকশনে হয়, তাই একই প্রতিপক্ষকে দুইজন
+    (ভিন্ন প্রসেস থেকেও) দাবি করতে পারে না। রিটার্ন: (opponent, match_id, queued)
+    """
+    try:
+        with transaction() as c:
+            # TTL পেরোনো (রিপারের অপেক্ষায় থাকা) এন্ট্রি বাদ, যাতে অফলাইন প্লেয়ারের সাথে ম্যাচ না হয়
+            c.row_factory = QueueRow.factory
+            c.execute(f'SELECT {QueueRow.columns()} FROM matchmaking_queue WHERE fee = ? AND joined_at >= ? '
+                      'AND user_id != ? ORDER BY joined_at LIMIT 1', (fee, int(time.time()) - config.QUEUE_TTL, uid))
+            opp = c.fetchone()
+            if opp:
+                c.execute('DELETE FROM matchmaking_queue WHERE user_id IN (?, ?)', (opp.user_id, uid))
+                mid = create_match_sync(uid, opp.user_id, fee)
+                if not mid:
+                    raise sqlite3.DatabaseError("match creation failed")
+                return opp, mid, False
+            c.execute('INSERT OR REPLACE INTO matchmaking_queue(user_id,fee,joined_at,lobby_message_id) VALUES(?,?,?,NULL)',
+                     (uid, fee, int(time.time())))
+            return None, None, True
+    except Exception as e:
+        logger.error(f"match_or_enqueue_sync error: {e}")
+        return None, None, False
+
+async def match_or_enqueue(u: int, f: float) -> Tuple[Optional[QueueRow], Optional[str], bool]:
+    return await _call('match_or_enqueue', u, f)
 
 def rem_queue_sync(uid: int) -> None:
     try:
-        c = get_conn().cursor()
-        c.execute('DELETE FROM matchmaking_queue WHERE user_id=?', (uid,))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute('DELETE FROM matchmaking_queue WHERE user_id=?', (uid,))
     except Exception as e:
         logger.error(f"rem_queue_sync error: {e}")
 
 async def remove_from_queue(uid: int) -> None:
-    await run_db(rem_queue_sync, uid)
+    await _call('remove_from_queue', uid)
+
+def queue_summary_sync(per_fee: int) -> Optional[List[Dict[str, Any]]]:
+    """প্রতি ফি টিয়ারে মোট অপেক্ষমাণ ও প্রথম per_fee জন (নাম সহ), joined_at ক্রমে"""
+    try:
+        c = _reader().cursor()
+        c.execute('''SELECT fee, user_id, joined_at, ingame_name, total FROM (
+                         SELECT q.fee, q.user_id, q.joined_at, u.ingame_name,
+                                ROW_NUMBER() OVER (PARTITION BY q.fee ORDER BY q.joined_at) AS pos,
+                                COUNT(*) OVER (PARTITION BY q.fee) AS total
+                         FROM matchmaking_queue q LEFT JOIN users u ON u.user_id = q.user_id)
+                     WHERE pos <= ? ORDER BY fee, pos''', (per_fee,))
+        return [dict(r) for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"queue_summary_sync error: {e}")
+        return None
+
+async def queue_summary(per_fee: int) -> Optional[List[Dict[str, Any]]]:
+    return await run_db(queue_summary_sync, per_fee)
+
+def take_queue_lobby_msgs_sync() -> List[int]:
+    """পুরনো প্রতি-প্লেয়ার লবি পোস্টের id তুলে নেওয়া (কলাম NULL করে)"""
+    try:
+        with transaction() as c:
+            c.execute('SELECT lobby_message_id FROM matchmaking_queue WHERE lobby_message_id IS NOT NULL')
+            ids = [r[0] for r in c.fetchall()]
+            if ids:
+                c.execute('UPDATE matchmaking_queue SET lobby_message_id=NULL WHERE lobby_message_id IS NOT NULL')
+            return ids
+    except Exception as e:
+        logger.error(f"take_queue_lobby_msgs_sync error: {e}")
+        return []
+
+async def take_queue_lobby_messages() -> List[int]:
+    return await run_db(take_queue_lobby_msgs_sync)
+
+def expire_queue_sync(cutoff: int, limit: int) -> Optional[List[QueueRow]]:
+    """joined_at < cutoff এমন সর্বোচ্চ limit টি এন্ট্রি এক ট্রানজ্যাকশনে মুছা (প্রতি fee তে ইন্ডেক্স রেঞ্জ)"""
+    try:
+        with transaction() as c:
+            c.execute('SELECT DISTINCT fee FROM matchmaking_queue')
+            fees = [r[0] for r in c.fetchall()]
+            rows: List[QueueRow] = []
+            c.row_factory = QueueRow.factory
+            for fee in fees:
+                c.execute(f'SELECT {QueueRow.columns()} FROM matchmaking_queue '
+                          'WHERE fee = ? AND joined_at < ? ORDER BY joined_at LIMIT ?',
+                          (fee, cutoff, limit - len(rows)))
+                rows.extend(c.fetchall())
+                if len(rows) >= limit:
+                    break
+            if rows:
+                c.executemany('DELETE FROM matchmaking_queue WHERE user_id = ? AND joined_at = ?',
+                              [(r.user_id, r.joined_at) for r in rows])
+            return rows
+    except Exception as e:
+        logger.error(f"expire_queue_sync error: {e}")
+        return None
+
+async def expire_queue(cutoff: int, limit: int) -> Optional[List[QueueRow]]:
+    return await run_db(expire_queue_sync, cutoff, limit)
+
+def queue_joined_sync() -> Dict[float, List[int]]:
+    """প্রতি fee টিয়ারের joined_at তালিকা (ইন্ডেক্স ক্রমে, টেবিল না ছুঁয়ে)"""
+    try:
+        c = _reader().cursor()
+        c.execute('SELECT fee, joined_at FROM matchmaking_queue ORDER BY fee, joined_at')
+        tiers: Dict[float, List[int]] = {}
+        for fee, joined in c.fetchall():
+            tiers.setdefault(fee, []).append(joined)
+        return tiers
+    except Exception as e:
+        logger.error(f"queue_joined_sync error: {e}")
+        return {}
+
+async def queue_joined() -> Dict[float, List[int]]:
+    return await run_db(queue_joined_sync)
 
 def create_match_sync(p1: int, p2: int, fee: float) -> Optional[str]:
     try:
-        c = get_conn().cursor()
-        mid = str(uuid.uuid4())[:8]
-        c.execute('INSERT INTO active_matches(match_id, player1_id, player2_id, fee, status, created_at) VALUES(?,?,?,?,?,?)',
-                 (mid, p1, p2, fee, 'waiting_for_code', int(time.time())))
-        get_conn().commit()
+        with transaction() as c:
+            mid = str(uuid.uuid4())[:8]
+            c.execute('INSERT INTO active_matches(match_id, player1_id, player2_id, fee, status, created_at) VALUES(?,?,?,?,?,?)',
+                     (mid, p1, p2, fee, 'waiting_for_code', int(time.time())))
         return mid
     except Exception as e:
         logger.error(f"create_match_sync error: {e}")
         return None
 
 async def create_match(p1: int, p2: int, f: float) -> Optional[str]:
-    return await run_db(create_match_sync, p1, p2, f)
+    return await _call('create_match', p1, p2, f)
 
 def set_room_code_sync(mid: str, code: str) -> None:
     try:
-        c = get_conn().cursor()
-        c.execute("UPDATE active_matches SET room_code=?, status='in_progress' WHERE match_id=?",
-                 (code, mid))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute("UPDATE active_matches SET room_code=?, status='in_progress' WHERE match_id=?",
+                     (code, mid))
     except Exception as e:
         logger.error(f"set_room_code_sync error: {e}")
 
 async def set_room_code(m: str, c: str) -> None:
-    await run_db(set_room_code_sync, m, c)
+    await _call('set_room_code', m, c)
 
-def get_match_sync(mid: str) -> Optional[Dict[str, Any]]:
+def get_match_sync(mid: str) -> Optional[MatchRow]:
     try:
-        c = get_conn().cursor()
-        c.execute('SELECT * FROM active_matches WHERE match_id=?', (mid,))
-        r = c.fetchone()
-        return dict(r) if r else None
+        c = _reader().cursor()
+        c.row_factory = MatchRow.factory
+        c.execute(f'SELECT {MatchRow.columns()} FROM active_matches WHERE match_id=?', (mid,))
+        return c.fetchone()
     except Exception as e:
         logger.error(f"get_match_sync error: {e}")
         return None
 
-async def get_match(m: str) -> Optional[Dict[str, Any]]:
-    return await run_db(get_match_sync, m)
+async def get_match(m: str) -> Optional[MatchRow]:
+    return await _call('get_match', m)
 
-def submit_ss_sync(mid: str, uid: int, fid: str) -> Optional[Dict[str, Any]]:
+def submit_ss_sync(mid: str, uid: int, fid: str) -> Optional[MatchRow]:
     try:
-        c = get_conn().cursor()
-        match = get_match_sync(mid)
-        if not match:
-            return None
-        field = 'p1_screenshot_id' if uid == match['player1_id'] else 'p2_screenshot_id'
-        c.execute(f"UPDATE active_matches SET {field}=? WHERE match_id=?", (fid, mid))
-        get_conn().commit()
+        with transaction() as c:
+            match = get_match_sync(mid)
+            if not match:
+                return None
+            field = 'p1_screenshot_id' if uid == match.player1_id else 'p2_screenshot_id'
+            c.execute(f"UPDATE active_matches SET {field}=? WHERE match_id=?", (fid, mid))
         return get_match_sync(mid)
     except Exception as e:
         logger.error(f"submit_ss_sync error: {e}")
         return None
 
-async def submit_screenshot(m: str, u: int, f: str) -> Optional[Dict[str, Any]]:
-    return await run_db(submit_ss_sync, m, u, f)
-
-def calculate_elo(player_rating: int, opponent_rating: int, score: int, k_factor: int = 32) -> int:
-    """ELO রেটিং গণনা"""
-    expected_score = 1 / (1 + 10**((opponent_rating - player_rating) / 400))
-    return int(round(player_rating + k_factor * (score - expected_score)))
+async def submit_screenshot(m: str, u: int, f: str) -> Optional[MatchRow]:
+    return await _call('submit_screenshot', m, u, f)
 
-def resolve_match_sync(mid: str, wid: int) -> bool:
+def get_pending_reviews_sync() -> List[Dict[str, Any]]:
+    """দুই স্ক্রিনশটই জমা পড়েছে কিন্তু রেজাল্ট হয়নি এমন ম্যাচ (পুরনোটা আগে)"""
     try:
-        c = get_conn().cursor()
-        m = get_match_sync(mid)
-        if not m or m['status'] == 'completed':
-            return False
-        p1, p2, fee = m['player1_id'], m['player2_id'], m['fee']
-        lid = p2 if wid == p1 else p1
+        c = _reader().cursor()
+        c.execute("""SELECT match_id, player1_id, player2_id, fee, p1_screenshot_id, p2_screenshot_id
+                     FROM active_matches
+                     WHERE status NOT IN ('completed', 'cancelled')
+                       AND p1_screenshot_id IS NOT NULL AND p2_screenshot_id IS NOT NULL
+                     ORDER BY created_at""")
+        return [dict(r) for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"get_pending_reviews_sync error: {e}")
+        return []
+
+async def get_pending_reviews() -> List[Dict[str, Any]]:
+    return await run_db(get_pending_reviews_sync)
 
-        u1, u2 = get_user_sync(wid), get_user_sync(lid)
-        if not u1 or not u2:
-            return False
+# ELO এর একমাত্র ইমপ্লিমেন্টেশন rating.py তে
+calculate_elo = rating.calculate_elo
 
-        nr1 = calculate_elo(u1.get('elo_rating', 1000), u2.get('elo_rating', 1000), 1)
-        nr2 = calculate_elo(u2.get('elo_rating', 1000), u1.get('elo_rating', 1000), 0)
+# resolve_match_sync এর একই ট্রানজ্যাকশনে চলা হুক (যেমন টুর্নামেন্ট রাউন্ড এগোনো)
+_resolve_hooks: List[Callable[[str, int], None]] = []
 
-        c.execute('UPDATE users SET elo_rating=?, wins=wins+1 WHERE user_id=?', (nr1, wid))
-        c.execute('UPDATE users SET elo_rating=?, losses=losses+1 WHERE user_id=?', (nr2, lid))
+def add_resolve_hook(hook: Callable[[str, int], None]) -> None:
+    if hook not in _resolve_hooks:
+        _resolve_hooks.append(hook)
 
-        if fee > 0:
-            adjust_balance_sync(wid, fee * 2 * 0.9, 'match_win')
-        c.execute("UPDATE active_matches SET status='completed', winner_id=? WHERE match_id=?",
-                 (wid, mid))
-        get_conn().commit()
+def resolve_match_sync(mid: str, wid: int) -> bool:
+    try:
+        with transaction() as c:
+            m = get_match_sync(mid)
+            if not m or m.status == 'completed':
+                return False
+            p1, p2, fee = m.player1_id, m.player2_id, m.fee
+            lid = p2 if wid == p1 else p1
+
+            u1, u2 = get_user_sync(wid), get_user_sync(lid)
+            if not u1 or not u2:
+                return False
+
+            ks = rating.live_schedule()
+            r1, r2 = u1.elo_rating, u2.elo_rating
+            nr1 = calculate_elo(r1, r2, 1, ks.k_for((u1.wins or 0) + (u1.losses or 0)))
+            nr2 = calculate_elo(r2, r1, 0, ks.k_for((u2.wins or 0) + (u2.losses or 0)))
+
+            # SET এর সব এক্সপ্রেশন পুরনো মান দেখে, তাই best_streak নতুন current_streak এর সাথে তুলনা হয়
+            c.execute('UPDATE users SET elo_rating=?, wins=wins+1, current_streak=MAX(current_streak, 0)+1, '
+                      'best_streak=MAX(best_streak, MAX(current_streak, 0)+1) WHERE user_id=?', (nr1, wid))
+            c.execute('UPDATE users SET elo_rating=?, losses=losses+1, current_streak=MIN(current_streak, 0)-1 '
+                      'WHERE user_id=?', (nr2, lid))
+            now = int(time.time())
+            c.executemany('INSERT OR REPLACE INTO match_history(user_id, played_at, match_id, opponent_id, fee, '
+                          'won, elo_before, elo_after) VALUES(?,?,?,?,?,?,?,?)',
+                          [(wid, now, mid, lid, fee, 1, r1, nr1), (lid, now, mid, wid, fee, 0, r2, nr2)])
+
+            if fee > 0:
+                adjust_balance_sync(wid, fee * 2 * 0.9, 'match_win')
+            c.execute("UPDATE active_matches SET status='completed', winner_id=? WHERE match_id=?",
+                     (wid, mid))
+            for hook in _resolve_hooks:
+                hook(mid, wid)
         return True
     except Exception as e:
         logger.error(f"resolve_match_sync error: {e}")
         return False
 
 async def resolve_match(m: str, w: int) -> bool:
-    return await run_db(resolve_match_sync, m, w)
+    return await _call('resolve_match', m, w)
 
 def cancel_match_sync(mid: str) -> None:
     try:
-        c = get_conn().cursor()
-        c.execute("UPDATE active_matches SET status='cancelled' WHERE match_id=?", (mid,))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute("UPDATE active_matches SET status='cancelled' WHERE match_id=?", (mid,))
     except Exception as e:
         logger.error(f"cancel_match_sync error: {e}")
 
 async def cancel_match(m: str) -> None:
-    await run_db(cancel_match_sync, m)
+    await _call('cancel_match', m)
+
+def expire_matches_sync(cutoff: int, limit: int = 100) -> List[MatchRow]:
+    """cutoff এর আগে তৈরি, কোনো স্ক্রিনশট ছাড়া খোলা ম্যাচ বাতিল করা; বাতিল হওয়া ম্যাচগুলো ফেরত দেয়
+
+    একজনও স্ক্রিনশট দিলে ম্যাচ অ্যাডমিন রিভিউয়ের জন্য থাকে; টুর্নামেন্ট ম্যাচ টুর্নামেন্ট নিজে চালায়।
+    খেলোয়াড়দের যে স্টেট এই ম্যাচের দিকে দেখায় তা মুছে দেওয়া হয়।
+    """
+    try:
+        with transaction() as c:
+            c.row_factory = MatchRow.factory
+            c.execute(f"""SELECT {MatchRow.columns('m')} FROM active_matches m
+                          WHERE m.status IN ('waiting_for_code', 'in_progress') AND m.created_at < ?
+                            AND m.p1_screenshot_id IS NULL AND m.p2_screenshot_id IS NULL
+                            AND NOT EXISTS (SELECT 1 FROM tournament_matches t WHERE t.match_id = m.match_id)
+                          LIMIT ?""", (cutoff, limit))
+            rows = c.fetchall()
+            c.executemany("UPDATE active_matches SET status='cancelled' WHERE match_id=?", [(m.match_id,) for m in rows])
+            c.executemany("UPDATE users SET state=NULL, state_data=NULL WHERE user_id=? AND state_data=? "
+                          "AND state IN ('awaiting_room_code', 'awaiting_screenshot')",
+                          [(uid, m.match_id) for m in rows for uid in (m.player1_id, m.player2_id)])
+        return rows
+    except Exception as e:
+        logger.error(f"expire_matches_sync error: {e}")
+        return []
+
+def get_history_sync(uid: int, offset: int, limit: int) -> List[HistoryRow]:
+    """ইউজারের সাম্প্রতিক ম্যাচ (নতুনটা আগে), primary key রেঞ্জ থেকে"""
+    try:
+        c = _reader().cursor()
+        c.row_factory = HistoryRow.factory
+        c.execute("""SELECT h.match_id, h.played_at, h.opponent_id, u.ingame_name, h.fee, h.won,
+                            h.elo_before, h.elo_after
+                     FROM match_history h LEFT JOIN users u ON u.user_id = h.opponent_id
+                     WHERE h.user_id = ? ORDER BY h.played_at DESC, h.match_id DESC LIMIT ? OFFSET ?""",
+                  (uid, limit, offset))
+        return c.fetchall()
+    except Exception as e:
+        logger.error(f"get_history_sync error: {e}")
+        return []
+
+async def get_history(uid: int, offset: int = 0, limit: int = 10) -> List[HistoryRow]:
+    return await _call('get_history', uid, offset, limit)
 
 # --- Financial ---
 def create_wd_sync(uid: int, amt: float, met: str, num: str) -> Optional[int]:
     try:
-        c = get_conn().cursor()
-        c.execute('INSERT INTO withdrawal_requests(user_id, amount, method, account_number, created_at) VALUES(?,?,?,?,?)',
-                 (uid, amt, met, num, int(time.time())))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute('INSERT INTO withdrawal_requests(user_id, amount, method, account_number, created_at) VALUES(?,?,?,?,?)',
+                     (uid, amt, met, num, int(time.time())))
         return c.lastrowid
     except Exception as e:
         logger.error(f"create_wd_sync error: {e}")
@@ -353,12 +887,15 @@ async def create_withdrawal_request(u: int, a: float, m: str, n: str) -> Optiona
     return await run_db(create_wd_sync, u, a, m, n)
 
 def create_dep_sync(uid: int, tx: str, amt: float) -> Optional[int]:
+    """ডিপোজিট রিকোয়েস্ট; একই normalized txid আগে থাকলে None"""
     try:
-        c = get_conn().cursor()
-        c.execute('INSERT INTO deposit_requests(user_id,txid,amount,created_at) VALUES(?,?,?,?)',
-                 (uid, tx, amt, int(time.time())))
-        get_conn().commit()
+        with transaction() as c:
+            c.execute('INSERT INTO deposit_requests(user_id,txid,txid_norm,amount,created_at) VALUES(?,?,?,?,?)',
+                     (uid, tx, tx.strip().upper(), amt, int(time.time())))
         return c.lastrowid
+    except sqlite3.IntegrityError:
+        logger.warning(f"Duplicate deposit txid from {uid}: {tx}")
+        return None
     except Exception as e:
         logger.error(f"create_dep_sync error: {e}")
         return None
@@ -366,10 +903,58 @@ def create_dep_sync(uid: int, tx: str, amt: float) -> Optional[int]:
 async def create_deposit_request(u: int, t: str, a: float) -> Optional[int]:
     return await run_db(create_dep_sync, u, t, a)
 
+def find_dep_by_txid_sync(txid_norm: str) -> Optional[Dict[str, Any]]:
+    """normalized txid দিয়ে ডিপোজিট খোঁজা (ইউনিক ইন্ডেক্স)"""
+    try:
+        c = _reader().cursor()
+        c.execute("SELECT id, user_id, amount, status, created_at FROM deposit_requests WHERE txid_norm=?",
+                  (txid_norm,))
+        r = c.fetchone()
+        return dict(r) if r else None
+    except Exception as e:
+        logger.error(f"find_dep_by_txid_sync error: {e}")
+        return None
+
+def add_deposit_alerts_sync(alerts: List[Dict[str, Any]]) -> bool:
+    """একটি ট্রানজ্যাকশনে এক ব্যাচ ঘটনা লেখা"""
+    try:
+        with transaction() as c:
+            c.executemany("INSERT INTO deposit_alerts(created_at, data) VALUES(?,?)",
+                          [(a.get('at', int(time.time())), json.dumps(a)) for a in alerts])
+        return True
+    except Exception as e:
+        logger.error(f"add_deposit_alerts_sync error: {e}")
+        return False
+
+def drain_deposit_alerts_sync(limit: int) -> Tuple[List[Dict[str, Any]], int]:
+    """সবচেয়ে পুরনো limit টি ঘটনা তুলে মুছে ফেলা; (ঘটনা, বাকি থাকা সংখ্যা)"""
+    try:
+        with transaction() as c:
+            c.execute("SELECT id, data FROM deposit_alerts ORDER BY id LIMIT ?", (limit,))
+            rows = c.fetchall()
+            if rows:
+                c.execute("DELETE FROM deposit_alerts WHERE id <= ?", (rows[-1][0],))
+            c.execute("SELECT COUNT(*) FROM deposit_alerts")
+            left = c.fetchone()[0]
+        return [json.loads(r[1]) for r in rows], left
+    except Exception as e:
+        logger.error(f"drain_deposit_alerts_sync error: {e}")
+        return [], 0
+
+def iter_dep_txids_sync() -> List[str]:
+    """সব normalized txid (ইন-মেমরি ফিল্টার লোড করার জন্য)"""
+    try:
+        c = _reader().cursor()
+        c.execute("SELECT txid_norm FROM deposit_requests WHERE txid_norm IS NOT NULL")
+        return [r[0] for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"iter_dep_txids_sync error: {e}")
+        return []
+
 # --- Stats Ops ---
 def get_total_users_sync() -> int:
     try:
-        c = get_conn().cursor()
+        c = _reader().cursor()
         c.execute("SELECT COUNT(*) as c FROM users WHERE is_registered=1")
         return c.fetchone()['c']
     except Exception as e:
@@ -377,11 +962,11 @@ def get_total_users_sync() -> int:
         return 0
 
 async def get_total_users() -> int:
-    return await run_db(get_total_users_sync)
+    return await _call('total_users')
 
 def get_total_matches_sync() -> int:
     try:
-        c = get_conn().cursor()
+        c = _reader().cursor()
         c.execute("SELECT COUNT(*) as c FROM active_matches WHERE status='completed'")
         return c.fetchone()['c']
     except Exception as e:
@@ -389,11 +974,11 @@ def get_total_matches_sync() -> int:
         return 0
 
 async def get_total_matches() -> int:
-    return await run_db(get_total_matches_sync)
+    return await _call('total_matches')
 
 def get_pending_deps_sync() -> int:
     try:
-        c = get_conn().cursor()
+        c = _reader().cursor()
         c.execute("SELECT COUNT(*) as c FROM deposit_requests WHERE status='pending'")
         return c.fetchone()['c']
     except Exception as e:
@@ -405,7 +990,7 @@ async def get_pending_deposits_count() -> int:
 
 def get_pending_wds_sync() -> int:
     try:
-        c = get_conn().cursor()
+        c = _reader().cursor()
         c.execute("SELECT COUNT(*) as c FROM withdrawal_requests WHERE status='pending'")
         return c.fetchone()['c']
     except Exception as e:
@@ -415,30 +1000,47 @@ def get_pending_wds_sync() -> int:
 async def get_pending_withdrawals_count() -> int:
     return await run_db(get_pending_wds_sync)
 
+def get_stale_pending_sync(cutoff: int) -> Dict[str, Dict[str, Any]]:
+    """cutoff এর আগের pending ডিপোজিট ও উত্তোলন: সংখ্যা, মোট টাকা ও সবচেয়ে পুরনোটির সময়"""
+    try:
+        c = _reader().cursor()
+        out = {}
+        for kind, table in (('deposits', 'deposit_requests'), ('withdrawals', 'withdrawal_requests')):
+            c.execute(f"SELECT COUNT(*), COALESCE(SUM(amount), 0), MIN(created_at) FROM {table} "
+                      "WHERE status='pending' AND created_at < ?", (cutoff,))
+            count, amount, oldest = c.fetchone()
+            out[kind] = {'count': count, 'amount': amount, 'oldest': oldest}
+        return out
+    except Exception as e:
+        logger.error(f"get_stale_pending_sync error: {e}")
+        return {}
+
 def get_all_ids_sync() -> List[int]:
     try:
-        c = get_conn().cursor()
+        c = _reader().cursor()
+        c.row_factory = None  # শুধু int দরকার; প্রতি সারিতে Row অবজেক্ট নয়
         c.execute("SELECT user_id FROM users WHERE is_registered=1")
-        return [r['user_id'] for r in c.fetchall()]
+        return [r[0] for r in c.fetchall()]
     except Exception as e:
         logger.error(f"get_all_ids_sync error: {e}")
         return []
 
 async def get_all_user_ids() -> List[int]:
-    return await run_db(get_all_ids_sync)
+    return await _call('get_all_ids')
 
-def get_top_wins_sync(limit: int = 10) -> List[Dict[str, Any]]:
+def get_top_wins_sync(limit: int = 10) -> List[LeaderRow]:
     try:
-        c = get_conn().cursor()
-        c.execute('SELECT ingame_name, wins, elo_rating FROM users WHERE is_registered=1 ORDER BY elo_rating DESC LIMIT ?',
+        c = _reader().cursor()
+        c.row_factory = LeaderRow.factory
+        c.execute(f'SELECT {LeaderRow.columns()} FROM users WHERE is_registered=1 ORDER BY elo_rating DESC LIMIT ?',
                  (limit,))
-        return [dict(r) for r in c.fetchall()]
+        return c.fetchall()
     except Exception as e:
         logger.error(f"get_top_wins_sync error: {e}")
         return []
 
-async def get_top_wins(l: int = 10) -> List[Dict[str, Any]]:
-    return await run_db(get_top_wins_sync, l)
+async def get_top_wins(l: int = 10) -> List[LeaderRow]:
+    return await _call('get_top_wins', l)
 
 # --- Lock for thread safety ---
 _lock = asyncio.Lock()
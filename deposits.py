@@ -0,0 +1,197 @@
+# deposits.py - ডিপোজিট রিকোয়েস্ট যাচাই: ডুপ্লিকেট TxID, ভেলোসিটি ও সন্দেহজনক প্যাটার্ন
+# নতুন txid প্রথমে ইন-মেমরি Bloom ফিল্টারে দেখা হয়। ফিল্টারে না থাকলে নিশ্চিতভাবে নতুন,
+# তাই সরাসরি INSERT (ইউনিক ইন্ডেক্স শেষ পাহারাদার)। ফিল্টারে থাকলে সাম্প্রতিক txid এর
+# exact সেট দেখা হয়, সেখানে মিললে DB ছাড়াই বাতিল; না মিললে ইন্ডেক্সড লুকআপে যাচাই।
+# সন্দেহজনক ঘটনা deposit_alerts টেবিলে যায়, কারণ webhook মোডে যেকোনো worker এ ঘটতে পারে
+# কিন্তু ডাইজেস্ট জব শুধু একটিতে চলে। বাতিলের পথে DB লেখা এড়াতে ঘটনাগুলো প্রথমে প্রসেসের
+# বাফারে জমে, আর প্রতি প্রসেসের জব (flush_alerts) লক ছাড়া অবস্থায় এক ব্যাচে লেখে।
+# ভেলোসিটি স্লট শুধু গৃহীত রিকোয়েস্টে খরচ হয় (একই ইউজারের আপডেট ক্রমিক, তাই আগে দেখে পরে লেখা যায়)।
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+DUPLICATE = 'duplicate'
+VELOCITY = 'velocity'
+ERROR = 'error'
+
+def normalize_txid(txid: str) -> str:
+    """তুলনার জন্য txid (db.create_dep_sync ও মাইগ্রেশনের সাথে একই নিয়ম)"""
+    return txid.strip().upper()
+
+class BloomFilter:
+    """bytearray ভিত্তিক Bloom ফিল্টার (blake2b double hashing)"""
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+class DepositValidator:
+    """ডুপ্লিকেট ও ভেলোসিটি চেক, এবং অ্যাডমিন ডাইজেস্টের জন্য সন্দেহজনক ঘটনা জমা রাখা"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom: Optional[BloomFilter] = None
+        self._recent: 'OrderedDict[str, int]' = OrderedDict()  # txid_norm -> user_id
+        self._velocity: Dict[int, Deque[float]] = {}
+        self._alerts: List[Dict[str, Any]] = []  # deposit_alerts এ লেখার অপেক্ষায়
+        self.stats = {'checked': 0, 'accepted': 0, 'dup_memory': 0, 'dup_db': 0,
+                      'bloom_false_positive': 0, 'velocity_blocked': 0, 'db_checks': 0, 'alerts_dropped': 0}
+
+    def _ensure_loaded(self) -> None:
+        # প্রথম ব্যবহারে একবার সব txid ফিল্টারে তোলা (স্টার্টআপ ধীর না করতে)
+        if self._bloom is not None:
+            return
+        txids = db.iter_dep_txids_sync()
+        bloom = BloomFilter(max(config.DEPOSIT_BLOOM_CAPACITY, len(txids) * 2), config.DEPOSIT_BLOOM_ERROR)
+        for t in txids:
+            bloom.add(t)
+        self._bloom = bloom
+        logger.info(f"Deposit filter loaded: {len(txids)} txids, {len(bloom.bits) // 1024} KiB, k={bloom.hashes}")
+
+    def _remember(self, txid_norm: str, uid: int) -> None:
+        self._bloom.add(txid_norm)
+        self._recent[txid_norm] = uid
+        self._recent.move_to_end(txid_norm)
+        while len(self._recent) > config.DEPOSIT_RECENT_TXIDS:
+            self._recent.popitem(last=False)
+
+    def _alert(self, kind: str, uid: int, **info) -> None:
+        # লক ধরে ডাকা হয়: শুধু বাফারে, DB তে লেখে flush_alerts
+        if len(self._alerts) >= config.DEPOSIT_ALERT_BUFFER:
+            self.stats['alerts_dropped'] += 1
+            return
+        self._alerts.append({'kind': kind, 'user_id': uid, 'at': int(time.time()), **info})
+
+    def _velocity_ok(self, uid: int, now: float) -> bool:
+        """উইন্ডোতে আরেকটি রিকোয়েস্টের জায়গা আছে কিনা (স্লট খরচ করে না)"""
+        q = self._velocity.get(uid)
+        if q is None:
+            return True
+        while q and now - q[0] > config.DEPOSIT_VELOCITY_WINDOW:
+            q.popleft()
+        return len(q) < config.DEPOSIT_VELOCITY_MAX
+
+    def submit_sync(self, uid: int, txid: str, amount: float) -> Tuple[str, Optional[int]]:
+        """যাচাই করে ডিপোজিট রিকোয়েস্ট তৈরি; (স্ট্যাটাস, রিকোয়েস্ট আইডি)"""
+        norm = normalize_txid(txid)
+        with self._lock:
+            self._ensure_loaded()
+            self.stats['checked'] += 1
+            owner = self._recent.get(norm)
+            if owner is not None:
+                self.stats['dup_memory'] += 1
+                self._alert(DUPLICATE, uid, txid=norm, owner=owner, amount=amount)
+                return DUPLICATE, None
+            maybe_seen = norm in self._bloom
+            now = time.time()
+            if not self._velocity_ok(uid, now):
+                self.stats['velocity_blocked'] += 1
+                self._alert(VELOCITY, uid, txid=norm, amount=amount)
+                return VELOCITY, None
+
+        if maybe_seen:
+            existing = db.find_dep_by_txid_sync(norm)
+            with self._lock:
+                self.stats['db_checks'] += 1
+                if existing:
+                    self.stats['dup_db'] += 1
+                    self._remember(norm, existing['user_id'])
+                    self._alert(DUPLICATE, uid, txid=norm, owner=existing['user_id'], amount=amount)
+                    return DUPLICATE, None
+                self.stats['bloom_false_positive'] += 1
+
+        req_id = db.create_dep_sync(uid, txid, amount)
+        with self._lock:
+            if req_id is None:
+                # অন্য worker প্রসেস একই txid আগে লিখে থাকতে পারে (ইউনিক ইন্ডেক্স)
+                existing = db.find_dep_by_txid_sync(norm)
+                if existing:
+                    self.stats['dup_db'] += 1
+                    self._remember(norm, existing['user_id'])
+                    self._alert(DUPLICATE, uid, txid=norm, owner=existing['user_id'], amount=amount)
+                    return DUPLICATE, None
+                return ERROR, None
+            self._remember(norm, uid)
+            self._velocity.setdefault(uid, deque()).append(now)
+            self.stats['accepted'] += 1
+            if amount >= config.DEPOSIT_SUSPICIOUS_AMOUNT:
+                self._alert('large_amount', uid, txid=norm, amount=amount, request_id=req_id)
+        return OK, req_id
+
+    def flush_alerts(self) -> int:
+        """বাফারের ঘটনা এক ট্রানজ্যাকশনে deposit_alerts এ লেখা (লকের বাইরে); লেখা সংখ্যা"""
+        with self._lock:
+            batch, self._alerts = self._alerts, []
+        if not batch:
+            return 0
+        if db.add_deposit_alerts_sync(batch):
+            return len(batch)
+        with self._lock:
+            # ব্যর্থ হলে পরের বার আবার (বাফারের সীমা মেনে)
+            keep = max(0, config.DEPOSIT_ALERT_BUFFER - len(self._alerts))
+            self.stats['alerts_dropped'] += len(batch) - min(keep, len(batch))
+            self._alerts[:0] = batch[:keep]
+        return 0
+
+    def drain_alerts(self) -> Tuple[List[Dict[str, Any]], int]:
+        """সব worker এর জমা ঘটনা (সর্বোচ্চ DEPOSIT_DIGEST_MAX টি) ও বাকি থাকা সংখ্যা"""
+        self.flush_alerts()
+        return db.drain_deposit_alerts_sync(config.DEPOSIT_DIGEST_MAX)
+
+    def prune(self) -> None:
+        """নিষ্ক্রিয় ইউজারের ভেলোসিটি কাউন্টার সরানো"""
+        now = time.time()
+        with self._lock:
+            for uid in [u for u, q in self._velocity.items()
+                        if not q or now - q[-1] > config.DEPOSIT_VELOCITY_WINDOW]:
+                del self._velocity[uid]
+
+def format_digest(alerts: List[Dict[str, Any]], left: int = 0) -> str:
+    """সন্দেহজনক ঘটনাগুলো ইউজার অনুযায়ী গুছিয়ে একটি মেসেজ (left = পরের ডাইজেস্টে যাবে)"""
+    by_user: Dict[int, List[Dict[str, Any]]] = {}
+    for a in alerts:
+        by_user.setdefault(a['user_id'], []).append(a)
+    lines = [f"⚠️ Deposit digest: {len(alerts)} events, {len(by_user)} users"]
+    for uid, items in sorted(by_user.items(), key=lambda kv: -len(kv[1]))[:30]:
+        kinds: Dict[str, int] = {}
+        for a in items:
+            kinds[a['kind']] = kinds.get(a['kind'], 0) + 1
+        detail = ', '.join(f"{k}×{n}" for k, n in kinds.items())
+        others = {a['owner'] for a in items if a.get('owner') not in (None, uid)}
+        extra = f" (txid of {', '.join(map(str, sorted(others)))})" if others else ''
+        lines.append(f"• {uid}: {detail}{extra}")
+    if len(by_user) > 30:
+        lines.append(f"... +{len(by_user) - 30} users")
+    if left:
+        lines.append(f"... {left} more events in the next digest")
+    return "\n".join(lines)
+
+validator = DepositValidator()
+
+async def submit(uid: int, txid: str, amount: float) -> Tuple[str, Optional[int]]:
+    return await db.run_db(validator.submit_sync, uid, txid, amount)
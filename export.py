@@ -0,0 +1,158 @@
+# export.py - অ্যানালিটিক্সের জন্য টেবিল এক্সপোর্ট (gzip CSV, ইনক্রিমেন্টাল)
+# ব্যবহার:
+#   python export.py                 # transactions এর শেষ watermark এর পরের নতুন সারি, বাকি টেবিল পুরোটা
+#   python export.py --full          # সব সারি (বর্তমান balance/status সহ)
+#   python export.py --tables users transactions --chunk 10000
+#
+# আলাদা read-only connection এ একটি WAL read snapshot থেকে পড়া হয়, তাই সব টেবিল
+# একই মুহূর্তের অবস্থা দেখায় এবং বটের লেখা কখনো ব্লক হয় না। watermark হলো প্রতি
+# টেবিলের শেষ এক্সপোর্ট করা rowid; ফাইলগুলো সম্পূর্ণ লেখা হলেই কেবল সেটি সরে।
+# watermark শুধু append-only টেবিলে (transactions) চলে। বাকিগুলো প্রতিবার পুরোটা এক্সপোর্ট হয়:
+# users এর rowid হলো Telegram user_id (ঢোকার ক্রম নয়), তাই ছোট আইডির নতুন ইউজার watermark এর
+# নিচে পড়ে হারিয়ে যেত; আর ম্যাচ/ডিপোজিট/উত্তোলনের status, winner, amount পরে বদলায়, যা
+# rowid watermark কখনো আবার এক্সপোর্ট করত না।
+import argparse
+import csv
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+TABLES = ['users', 'active_matches', 'transactions', 'deposit_requests', 'withdrawal_requests']
+# সারি পরে বদলায় বা rowid ঢোকার ক্রমে বাড়ে না, তাই সবসময় পূর্ণ এক্সপোর্ট (watermark নেই)
+FULL_TABLES = {'users', 'active_matches', 'deposit_requests', 'withdrawal_requests'}
+# একসাথে দুটি এক্সপোর্ট যেন একই watermark না পড়ে
+_export_lock = threading.Lock()
+
+def _watermark_path() -> Path:
+    return Path(config.EXPORT_DIR) / 'watermarks.json'
+
+def load_watermarks() -> Dict[str, int]:
+    """প্রতি টেবিলের শেষ এক্সপোর্ট করা rowid"""
+    try:
+        with open(_watermark_path()) as f:
+            return {k: int(v) for k, v in json.load(f).items()}
+    except FileNotFoundError:
+        return {}
+    except (ValueError, OSError) as e:
+        logger.warning(f"Watermarks unreadable, starting from 0: {e}")
+        return {}
+
+def save_watermarks(marks: Dict[str, int]) -> None:
+    path = _watermark_path()
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(marks, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def open_snapshot() -> sqlite3.Connection:
+    """এক্সপোর্টের জন্য আলাদা read-only connection, একটি read ট্রানজ্যাকশন খোলা অবস্থায়"""
+    db.get_conn()  # ডাটাবেস ও WAL ফাইল আগে তৈরি নিশ্চিত করা
+    conn = sqlite3.connect(f"file:{config.LOCAL_DB}?mode=ro", uri=True,
+                           timeout=config.DB_TIMEOUT, isolation_level=None)
+    conn.execute("BEGIN")
+    # প্রথম SELECT এ snapshot স্থির হয়; এরপর সব টেবিল একই অবস্থা থেকে পড়া হয়
+    conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+    return conn
+
+def export_table(conn: sqlite3.Connection, table: str, after_rowid: int, out_dir: Path,
+                 stamp: str, chunk: int) -> Tuple[int, int, Optional[Path]]:
+    """after_rowid এর পরের সারিগুলো chunk করে gzip CSV তে লেখা; (সারি, শেষ rowid, ফাইল)"""
+    cur = conn.execute(f"SELECT rowid AS _rowid, * FROM {table} WHERE rowid > ? ORDER BY rowid",
+                       (after_rowid,))
+    columns = [d[0] for d in cur.description]
+    table_dir = out_dir / table
+    table_dir.mkdir(parents=True, exist_ok=True)
+    tmp = table_dir / f".{table}-{stamp}.csv.gz.tmp"
+    rows = 0
+    last = after_rowid
+    with gzip.open(tmp, 'wt', newline='', encoding='utf-8', compresslevel=6) as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        while True:
+            batch = cur.fetchmany(chunk)
+            if not batch:
+                break
+            writer.writerows(batch)
+            rows += len(batch)
+            last = batch[-1][0]
+    if not rows:
+        tmp.unlink()
+        return 0, after_rowid, None
+    path = table_dir / f"{table}-{stamp}-{after_rowid + 1}-{last}.csv.gz"
+    os.replace(tmp, path)
+    return rows, last, path
+
+def run_export_sync(full: bool = False, tables: Optional[List[str]] = None,
+                    chunk: Optional[int] = None) -> Optional[Dict[str, Dict[str, object]]]:
+    """এক্সপোর্ট চালানো; টেবিল অনুযায়ী সারাংশ ফেরত দেয়"""
+    if not _export_lock.acquire(blocking=False):
+        logger.warning("Export already running")
+        return None
+    try:
+        out_dir = Path(config.EXPORT_DIR)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        tables = tables or TABLES
+        chunk = chunk or config.EXPORT_CHUNK_ROWS
+        marks = load_watermarks()
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S') + ('-full' if full else '')
+        summary = {}
+        start = time.perf_counter()
+        conn = open_snapshot()
+        try:
+            for table in tables:
+                if table not in TABLES:
+                    raise ValueError(f"Unknown export table: {table}")
+                if table in FULL_TABLES:
+                    rows, last, path = export_table(conn, table, 0, out_dir, stamp, chunk)
+                    marks.pop(table, None)
+                    summary[table] = {'rows': rows, 'last_rowid': last, 'file': str(path) if path else None}
+                    continue
+                after = 0 if full else marks.get(table, 0)
+                rows, last, path = export_table(conn, table, after, out_dir, stamp, chunk)
+                # পূর্ণ এক্সপোর্টও watermark এগিয়ে দেয়, যাতে পরের ইনক্রিমেন্টাল ডুপ্লিকেট না করে
+                marks[table] = max(marks.get(table, 0), last)
+                summary[table] = {'rows': rows, 'last_rowid': last, 'file': str(path) if path else None}
+        finally:
+            conn.execute("ROLLBACK")
+            conn.close()
+        save_watermarks(marks)
+        total = sum(s['rows'] for s in summary.values())
+        logger.info(f"Export done: {total} rows in {time.perf_counter() - start:.2f}s (full={full})")
+        return summary
+    except Exception as e:
+        logger.error(f"run_export_sync error: {e}")
+        return None
+    finally:
+        _export_lock.release()
+
+async def run_export(full: bool = False, tables: Optional[List[str]] = None) -> Optional[Dict[str, Dict[str, object]]]:
+    return await db.run_db(run_export_sync, full, tables)
+
+def main():
+    parser = argparse.ArgumentParser(description='Export tables to gzip CSV for analytics')
+    parser.add_argument('--full', action='store_true', help='export all rows, ignoring watermarks')
+    parser.add_argument('--tables', nargs='+', choices=TABLES)
+    parser.add_argument('--chunk', type=int, default=config.EXPORT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    db.init_db()
+    summary = run_export_sync(args.full, args.tables, args.chunk)
+    if summary is None:
+        raise SystemExit(1)
+    for table, s in summary.items():
+        print(f"{table:22} {s['rows']:>8} rows  -> {s['file'] or '(nothing new)'}")
+
+if __name__ == '__main__':
+    main()
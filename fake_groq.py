@@ -0,0 +1,99 @@
+# fake_groq.py - লোকাল টেস্টের জন্য নকল Groq chat completions (SSE স্ট্রিমিং সহ)
+# ব্যবহার:
+#   python fake_groq.py --port 8090 --tokens 60 --delay 0.05
+#       GROQ_API_URL=http://127.0.0.1:8090/openai/v1/chat/completions python bot.py
+#   python fake_groq.py --status 429 --retry-after 2   # ব্রেকার/backoff টেস্ট
+import argparse
+import json
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator
+
+DEFAULT_TEXT = ("আপনার প্রশ্নের জন্য ধন্যবাদ! ম্যাচ শেষে দুইজনকেই স্ক্রিনশট পাঠাতে হবে, "
+                "তারপর অ্যাডমিন ফলাফল নিশ্চিত করবেন। কোনো সমস্যা হলে অ্যাডমিনের সাথে যোগাযোগ করুন।")
+
+def chunks(text: str, tokens: int) -> Iterator[str]:
+    """টেক্সটকে প্রায় সমান tokens টি টুকরোতে ভাগ করা"""
+    size = max(1, -(-len(text) // max(1, tokens)))
+    for i in range(0, len(text), size):
+        yield text[i:i + size]
+
+def make_server(host: str = '127.0.0.1', port: int = 8090, text: str = DEFAULT_TEXT, tokens: int = 40,
+                delay: float = 0.05, first_delay: float = 0.2, status: int = 200,
+                retry_after: str = '') -> ThreadingHTTPServer:
+    """OpenAI-সামঞ্জস্যপূর্ণ /chat/completions; stream=true হলে text/event-stream"""
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0) or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if status != 200:
+                payload = json.dumps({'error': {'message': 'fake error'}}).encode()
+                self.send_response(status)
+                if retry_after:
+                    self.send_header('Retry-After', retry_after)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            time.sleep(first_delay)
+            if not body.get('stream'):
+                payload = json.dumps({'choices': [{'index': 0, 'finish_reason': 'stop',
+                                                   'message': {'role': 'assistant', 'content': text}}]}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            try:
+                for piece in chunks(text, tokens):
+                    event = {'choices': [{'index': 0, 'delta': {'content': piece}, 'finish_reason': None}]}
+                    self._chunk(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+                    time.sleep(delay)
+                self._chunk(b"data: [DONE]\n\n")
+                self._chunk(b"")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def handle(self):
+            try:
+                super().handle()
+            except ConnectionResetError:
+                pass  # স্ট্রিম শেষে ক্লায়েন্ট keep-alive সংযোগ বন্ধ করে
+
+        def _chunk(self, data: bytes) -> None:
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake Groq chat completions API (SSE)')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--delay', type=float, default=0.05, help='seconds between streamed chunks')
+    parser.add_argument('--first-delay', type=float, default=0.2, help='seconds before the first byte')
+    parser.add_argument('--status', type=int, default=200)
+    parser.add_argument('--retry-after', default='')
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, tokens=args.tokens, delay=args.delay,
+                         first_delay=args.first_delay, status=args.status, retry_after=args.retry_after)
+    print(f"Fake Groq on http://{args.host}:{args.port}/openai/v1/chat/completions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
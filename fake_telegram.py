@@ -0,0 +1,158 @@
+# fake_telegram.py - লোকাল টেস্টের জন্য নকল Telegram Bot API
+# ব্যবহার:
+#   python fake_telegram.py serve --port 8081
+#       TELEGRAM_BASE_URL=http://127.0.0.1:8081/bot RUN_MODE=webhook python bot.py
+#   python fake_telegram.py send --url http://127.0.0.1:8443/telegram --updates 1000 --users 200
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlparse
+
+import config
+
+class FakeTelegramAPI:
+    """Bot API মেথডের জন্য নকল রেসপন্স তৈরি এবং কল রেকর্ড করা"""
+    def __init__(self, flood_every: int = 0, retry_after: int = 1):
+        self.calls: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._next_message_id = 1
+        # flood_every > 0 হলে প্রতি N-তম কল 429 (retry_after) দেয়
+        self.flood_every = flood_every
+        self.retry_after = retry_after
+        self.floods = 0
+
+    def flood_check(self) -> Optional[Dict[str, Any]]:
+        """429 রেসপন্স বডি, অথবা None"""
+        if not self.flood_every:
+            return None
+        with self._lock:
+            if len(self.calls) % self.flood_every:
+                return None
+            self.floods += 1
+        return {'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                'parameters': {'retry_after': self.retry_after}}
+
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            mid = self._next_message_id
+            self._next_message_id += 1
+        chat_id = int(params.get('chat_id', 0) or 0)
+        msg = {'message_id': mid, 'date': int(time.time()),
+               'chat': {'id': chat_id, 'type': 'private' if chat_id > 0 else 'channel'}}
+        if 'text' in params:
+            msg['text'] = params['text']
+        if 'photo' in params:
+            msg['photo'] = [{'file_id': params['photo'], 'file_unique_id': params['photo'],
+                             'width': 1, 'height': 1}]
+        return msg
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Any:
+        with self._lock:
+            self.calls.append({'method': method, 'params': params, 'at': time.time()})
+        m = method.lower()
+        if m == 'getme':
+            return {'id': 1, 'is_bot': True, 'first_name': 'FakeBot', 'username': config.BOT_USERNAME,
+                    'can_join_groups': True, 'can_read_all_group_messages': False,
+                    'supports_inline_queries': False}
+        if m == 'getchatmember':
+            return {'status': 'member', 'user': {'id': int(params.get('user_id', 0)), 'is_bot': False,
+                                                 'first_name': 'user'}}
+        if m in ('sendmessage', 'sendphoto', 'editmessagetext', 'editmessagecaption', 'editmessagemedia'):
+            return self._message(params)
+        if m == 'sendmediagroup':
+            return [self._message(params)]
+        if m == 'getupdates':
+            return []
+        return True
+
+    def count(self, method: str) -> int:
+        return sum(1 for c in self.calls if c['method'].lower() == method.lower())
+
+def _parse_body(handler: BaseHTTPRequestHandler) -> Dict[str, Any]:
+    length = int(handler.headers.get('Content-Length', 0) or 0)
+    raw = handler.rfile.read(length) if length else b''
+    ctype = handler.headers.get('Content-Type', '')
+    if 'json' in ctype:
+        return json.loads(raw or b'{}')
+    if 'x-www-form-urlencoded' in ctype:
+        return dict(parse_qsl(raw.decode()))
+    return {}
+
+def make_server(api: FakeTelegramAPI, host: str = '127.0.0.1', port: int = 8081) -> ThreadingHTTPServer:
+    """/bot<token>/<method> পাথে Bot API এর মত উত্তর দেয় এমন HTTP সার্ভার"""
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            method = urlparse(self.path).path.rstrip('/').rsplit('/', 1)[-1]
+            result = api.handle(method, _parse_body(self))
+            flood = api.flood_check()
+            body = json.dumps(flood or {'ok': True, 'result': result}).encode()
+            self.send_response(429 if flood else 200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST
+
+        def log_message(self, *args):
+            pass
+
+    return ThreadingHTTPServer((host, port), Handler)
+
+# --- Update Generator ---
+def fake_update(update_id: int, user_id: int, text: str) -> Dict[str, Any]:
+    return {'update_id': update_id,
+            'message': {'message_id': update_id, 'date': int(time.time()), 'text': text,
+                        'chat': {'id': user_id, 'type': 'private'},
+                        'from': {'id': user_id, 'is_bot': False, 'first_name': f'u{user_id}'}}}
+
+def send_updates(url: str, updates: int, users: int, secret: str = config.WEBHOOK_SECRET) -> float:
+    """webhook ফ্রন্টে নকল আপডেট পোস্ট করে; প্রতি সেকেন্ডে আপডেট সংখ্যা ফেরত দেয়"""
+    rnd = random.Random(7)
+    texts = ['📋 Profile', '🏆 Leaderboard', '💰 My Wallet', '📜 Rules']
+    headers = {'Content-Type': 'application/json'}
+    if secret:
+        headers['X-Telegram-Bot-Api-Secret-Token'] = secret
+    start = time.perf_counter()
+    for i in range(1, updates + 1):
+        body = json.dumps(fake_update(i, rnd.randint(1, users), rnd.choice(texts))).encode()
+        urllib.request.urlopen(urllib.request.Request(url, data=body, headers=headers), timeout=10).read()
+    return updates / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description='Local fake Telegram Bot API')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_serve = sub.add_parser('serve')
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=8081)
+    p_serve.add_argument('--flood-every', type=int, default=0, help='answer every Nth call with 429')
+    p_send = sub.add_parser('send')
+    p_send.add_argument('--url', default=f'http://{config.WEBHOOK_LISTEN}:{config.WEBHOOK_PORT}/{config.WEBHOOK_PATH}')
+    p_send.add_argument('--updates', type=int, default=100)
+    p_send.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+
+    if args.cmd == 'serve':
+        api = FakeTelegramAPI(args.flood_every)
+        server = make_server(api, args.host, args.port)
+        print(f"Fake Telegram API on http://{args.host}:{args.port}/bot<token>/<method>")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            methods = {}
+            for c in api.calls:
+                methods[c['method']] = methods.get(c['method'], 0) + 1
+            print(f"Calls: {methods}")
+    else:
+        rate = send_updates(args.url, args.updates, args.users)
+        print(f"Posted {args.updates} updates ({rate:.0f}/s)")
+
+if __name__ == '__main__':
+    main()
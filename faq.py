@@ -0,0 +1,183 @@
+# faq.py - rules_text ও অ্যাডমিন FAQ এর উপর লোকাল BM25 ইনভার্টেড ইন্ডেক্স
+# আত্মবিশ্বাসী মিল পেলে AI প্রশ্নের উত্তর সাথে সাথে (অফলাইনে) দেওয়া হয়; স্কোর
+# থ্রেশহোল্ডের নিচে হলে ai_manager আগের মত Groq এ পাঠায়।
+# ইন্ডেক্স ইনক্রিমেন্টাল: rules এর প্রতিটি বাক্য ও প্রতিটি FAQ কনটেন্ট-হ্যাশ দিয়ে চেনা হয়,
+# তাই set_rules বা FAQ বদলালে শুধু পরিবর্তিত ডকুমেন্ট সরানো/যোগ করা হয়। একাধিক worker
+# প্রসেস settings এর faq_version দেখে নিজের ইন্ডেক্স সিঙ্ক করে।
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+import config
+import db
+
+logger = logging.getLogger(__name__)
+
+K1 = 1.5
+B = 0.75
+
+# বাংলা ব্লকে (U+0980-U+09FF) কার/চিহ্ন সহ পুরো শব্দ একসাথে থাকে; \w এগুলো ভেঙে ফেলে
+_TOKEN_RE = re.compile(r'[ঀ-৿]+|[a-z0-9]+')
+_SENTENCE_RE = re.compile(r'(?<=[।!?\n])\s*|(?<=\.)\s+')
+# লম্বাগুলো আগে, যাতে 'গুলোর' এর আগে 'র' না কাটে
+_BN_SUFFIXES = ('গুলোর', 'গুলো', 'গুলি', 'দের', 'টির', 'টার', 'য়ের', 'েরা', 'ের', 'কে', 'তে', 'টি', 'টা', 'বে', 'বো', 'য়', 'র')
+STOPWORDS = frozenset('''
+আমি আমার আমাকে আপনি আপনার তুমি তোমার সে তার এটা এটি ওটা কি কী কেন কিভাবে কীভাবে কোথায় কখন
+কত কতো এবং ও বা না নয় হয় হবে হলে করে করতে করব করবো আছে ছিল যে যদি তাহলে জন্য থেকে দিয়ে
+এই সেই একটা একটি কোন কোনো আর তো কিন্তু কে কাকে কার নাকি
+a an the is are was be to of in on for and or how what when where why can i my me you your do does it
+'''.split())
+
+def _stem(tok: str) -> str:
+    if tok[0] >= 'ঀ':
+        for suf in _BN_SUFFIXES:
+            if tok.endswith(suf) and len(tok) - len(suf) >= 2:
+                return tok[:-len(suf)]
+        return tok
+    if len(tok) > 3 and tok.endswith('s') and not tok.endswith('ss'):
+        return tok[:-1]
+    return tok
+
+def tokenize(text: str) -> List[str]:
+    """বাংলা/ইংরেজি টোকেন (stopword বাদ, হালকা suffix stripping)"""
+    return [_stem(t) for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+def split_rules(text: str) -> List[str]:
+    """rules_text কে বাক্যে ভাগ করা (প্রতিটি বাক্য আলাদা ডকুমেন্ট)"""
+    return [s.strip() for s in _SENTENCE_RE.split(text or '') if len(tokenize(s)) >= 2]
+
+def _digest(*parts: str) -> str:
+    return hashlib.blake2b('\x00'.join(parts).encode(), digest_size=8).hexdigest()
+
+class FaqIndex:
+    """ইনক্রিমেন্টাল BM25 ইনভার্টেড ইন্ডেক্স"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.docs: Dict[str, Tuple[str, int]] = {}  # key -> (answer, length)
+        self._texts: Dict[str, str] = {}  # key -> ইন্ডেক্স করা টেক্সট (সরানোর সময় লাগে)
+        self.postings: Dict[str, Dict[str, int]] = {}  # term -> {key: tf}
+        self.total_len = 0
+        self.version: Optional[str] = None
+        self.loaded = False
+        self.checked_at = 0.0
+        self.queries = 0
+        self.hits = 0
+
+    def _add(self, key: str, text: str, answer: str) -> None:
+        tokens = tokenize(text)
+        tf: Dict[str, int] = {}
+        for t in tokens:
+            tf[t] = tf.get(t, 0) + 1
+        for t, n in tf.items():
+            self.postings.setdefault(t, {})[key] = n
+        self.docs[key] = (answer, len(tokens))
+        self.total_len += len(tokens)
+
+    def _remove(self, key: str, text: str) -> None:
+        for t in set(tokenize(text)):
+            plist = self.postings.get(t)
+            if plist is not None:
+                plist.pop(key, None)
+                if not plist:
+                    del self.postings[t]
+        self.total_len -= self.docs.pop(key)[1]
+
+    def sync(self, rules_text: Optional[str], faqs: Iterable[Dict[str, str]]) -> Tuple[int, int]:
+        """কাঙ্ক্ষিত ডকুমেন্ট সেটের সাথে পার্থক্যটুকু প্রয়োগ; (যোগ, বাদ)"""
+        wanted: Dict[str, Tuple[str, str]] = {}
+        for sentence in split_rules(rules_text or ''):
+            wanted[f"r:{_digest(sentence)}"] = (sentence, sentence)
+        for f in faqs:
+            wanted[f"f:{f['id']}:{_digest(f['question'], f['answer'])}"] = (f"{f['question']} {f['answer']}", f['answer'])
+        with self._lock:
+            stale = [k for k in self.docs if k not in wanted]
+            for k in stale:
+                self._remove(k, self._texts.pop(k))
+            added = 0
+            for k, (text, answer) in wanted.items():
+                if k not in self.docs:
+                    self._add(k, text, answer)
+                    self._texts[k] = text
+                    added += 1
+            self.loaded = True
+        return added, len(stale)
+
+    def search(self, query: str) -> Optional[Tuple[str, float, float]]:
+        """সেরা ডকুমেন্ট; (উত্তর, BM25 স্কোর, IDF coverage)"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n = len(self.docs)
+            if not terms or not n:
+                return None
+            avgdl = self.total_len / n
+            idf = {t: math.log(1 + (n - len(self.postings.get(t, ())) + 0.5) /
+                               (len(self.postings.get(t, ())) + 0.5)) for t in terms}
+            scores: Dict[str, float] = {}
+            for t in terms:
+                for key, tf in self.postings.get(t, {}).items():
+                    dl = self.docs[key][1]
+                    scores[key] = scores.get(key, 0.0) + idf[t] * tf * (K1 + 1) / (tf + K1 * (1 - B + B * dl / avgdl))
+            if not scores:
+                return None
+            best = max(scores, key=scores.get)
+            matched = sum(idf[t] for t in terms if best in self.postings.get(t, ()))
+            return self.docs[best][0], scores[best], matched / sum(idf.values())
+
+    def stats(self) -> Dict[str, float]:
+        return {'docs': len(self.docs), 'terms': len(self.postings), 'queries': self.queries,
+                'hits': self.hits, 'hit_rate': round(self.hits / self.queries * 100, 1) if self.queries else 0.0}
+
+index = FaqIndex()
+
+def _sync_sync() -> Optional[Tuple[int, int]]:
+    """ইন্ডেক্স সিঙ্ক; ব্যর্থ হলে None
+
+    db.get_setting_sync/list_faq_sync ত্রুটিতে খালি মান দেয়, যা "সব ডকুমেন্ট মুছে গেছে" হিসেবে
+    সিঙ্ক হয়ে যেত; তাই এখানে সরাসরি পড়া, যাতে ত্রুটি ব্যর্থতা হিসেবেই ধরা পড়ে।
+    """
+    try:
+        c = db.get_read_conn().cursor()
+        c.execute("SELECT value FROM settings WHERE key='rules_text'")
+        r = c.fetchone()
+        c.execute("SELECT id, question, answer FROM faq ORDER BY id")
+        faqs = [dict(f) for f in c.fetchall()]
+        return index.sync(r[0] if r else None, faqs)
+    except Exception as e:
+        logger.error(f"FAQ index sync error: {e}")
+        return None
+
+async def refresh(force: bool = False) -> None:
+    """faq_version বদলালে (অথবা প্রথমবার) ইন্ডেক্স সিঙ্ক করা"""
+    now = time.monotonic()
+    if not force and index.loaded and now - index.checked_at < config.FAQ_REFRESH_INTERVAL:
+        return
+    index.checked_at = now
+    version = await db.get_setting('faq_version')
+    if force or not index.loaded or version != index.version:
+        res = await db.run_db(_sync_sync)
+        if res is None:
+            return  # version অপরিবর্তিত, পরের চেকে আবার চেষ্টা
+        index.version = version
+        logger.info(f"FAQ index synced: +{res[0]} -{res[1]} docs ({len(index.docs)} total)")
+
+async def changed() -> None:
+    """rules বা FAQ বদলের পর ডাকা হয়: অন্য প্রসেসকে জানিয়ে নিজের ইন্ডেক্স আপডেট"""
+    await db.set_setting('faq_version', str(time.time_ns()))
+    await refresh(force=True)
+
+async def answer(query: str) -> Optional[str]:
+    """আত্মবিশ্বাসী মিল থাকলে লোকাল উত্তর, না হলে None (তখন Groq)"""
+    await refresh()
+    index.queries += 1
+    found = index.search(query)
+    if not found:
+        return None
+    text, score, coverage = found
+    if score < config.FAQ_MIN_SCORE or coverage < config.FAQ_MIN_COVERAGE:
+        logger.debug(f"FAQ miss: score={score:.2f} coverage={coverage:.2f}")
+        return None
+    index.hits += 1
+    return text
@@ -0,0 +1,213 @@
+# jobs.py - পর্যায়ক্রমিক রক্ষণাবেক্ষণ জবের রানটাইম (Application এর job_queue এর উপর)
+# প্রতিটি জবের একটি নাম, বিরতি ও jitter থাকে; একই জব আগের রান শেষ হওয়ার আগে আবার শুরু হয় না
+# (skipped গোনা হয়)। প্রতি জবের রান, ব্যর্থতা, সময় ও শেষ ত্রুটি /jobs ও monitor স্ন্যাপশটে দেখা যায়।
+# জব async হলে event loop এ চলে (এগুলো নিজেরাই I/O await করে); সাধারণ (sync) ফাংশন হলে
+# ভারী কাজ ধরে নিয়ে নিজস্ব JOBS_WORKERS থ্রেডের executor এ চলে, যাতে DB pool বা loop এ
+# ইন্টারঅ্যাক্টিভ হ্যান্ডলারের লেটেন্সি না বাড়ে। async জবও offload() দিয়ে একই executor ব্যবহার করে।
+#
+# local জব প্রসেসের নিজস্ব মেমরি পরিষ্কার করে (রেট লিমিটার ইত্যাদি), তাই প্রতিটি প্রসেসে চলে;
+# বাকি (global) জব শুধু জব চালানো প্রসেসে (polling বা webhook worker 0)। অন্য worker এ /jobs
+# এলে global জবের কমান্ড job_commands টেবিলে যায়; জবের প্রসেস JOBS_CONTROL_INTERVAL পরপর সেগুলো
+# চালায় এবং JOBS_SNAPSHOT_INTERVAL পরপর (বা কমান্ডের পরে) নিজের মেট্রিক settings এ লেখে, যাতে
+# যেকোনো worker তালিকা দেখাতে পারে। একটিমাত্র প্রসেস হলে (polling) এই control টিক চলেই না।
+import asyncio
+import inspect
+import json
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import config
+import db
+from monitor import InstrumentedExecutor
+
+logger = logging.getLogger(__name__)
+
+ACTIONS = ('run', 'pause', 'resume')
+SNAPSHOT_KEY = 'jobs_snapshot'
+
+class PeriodicJob:
+    """একটি নামযুক্ত জব ও তার মেট্রিক"""
+    def __init__(self, name: str, func: Callable, interval: float, first: Optional[float], jitter: float,
+                 description: str, local: bool = False):
+        self.name = name
+        self.local = local
+        self.func = func
+        self.heavy = not inspect.iscoroutinefunction(func)
+        self.interval = interval
+        self.first = interval if first is None else first
+        self.jitter = jitter
+        self.description = description
+        self.handle = None  # telegram.ext.Job (install এর পর)
+        self.running = False
+        self.paused = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_started = 0.0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+        self.last_error: Optional[str] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'interval': self.interval, 'local': self.local, 'heavy': self.heavy, 'paused': self.paused,
+                'running': self.running,
+                'runs': self.runs, 'failures': self.failures, 'skipped': self.skipped,
+                'last_started': int(self.last_started) if self.last_started else None,
+                'last_ms': round(self.last_duration * 1000, 1), 'max_ms': round(self.max_duration * 1000, 1),
+                'avg_ms': round(self.total_duration / self.runs * 1000, 1) if self.runs else 0.0,
+                'last_error': self.last_error}
+
+class JobRuntime:
+    """জব রেজিস্ট্রি; install() এ job_queue তে run_repeating হিসেবে বসে"""
+    def __init__(self):
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self.job_queue = None
+        self.owner = False  # global জবগুলো এই প্রসেসে চলে কিনা
+        self._published = 0.0  # শেষবার মেট্রিক settings এ লেখার সময় (monotonic)
+        self._executor: Optional[InstrumentedExecutor] = None
+
+    @property
+    def executor(self) -> InstrumentedExecutor:
+        if self._executor is None:
+            self._executor = InstrumentedExecutor('jobs', config.JOBS_WORKERS)
+        return self._executor
+
+    def add(self, name: str, func: Callable, interval: float, first: Optional[float] = None,
+            jitter: Optional[float] = None, description: str = '', local: bool = False) -> PeriodicJob:
+        """জব রেজিস্টার (jitter সেকেন্ডে; না দিলে interval * JOBS_JITTER; local = প্রতি প্রসেসে)"""
+        if name in self.jobs:
+            raise ValueError(f"job {name!r} already registered")
+        if jitter is None:
+            jitter = interval * config.JOBS_JITTER
+        job = PeriodicJob(name, func, interval, first, jitter,
+                          description or (inspect.getdoc(func) or '').split('\n')[0], local)
+        self.jobs[name] = job
+        return job
+
+    def install(self, job_queue, run_global: bool = True, shared: bool = False) -> None:
+        """local জব (ও run_global হলে বাকি সব) job_queue তে বসানো; প্রতি প্রসেসে একবার
+
+        shared = অন্য worker প্রসেসও আছে (তখনই কমান্ড/মেট্রিক আদান-প্রদানের control টিক লাগে)।
+        """
+        self.job_queue = job_queue
+        self.owner = run_global
+        for job in self.jobs.values():
+            if not (job.local or run_global):
+                continue
+            # প্রথম রানও jitter পায়, যাতে রিস্টার্টের পর সব জব একই মুহূর্তে না চলে।
+            # max_instances=2: APScheduler এর বদলে _tick নিজে ওভারল্যাপ ধরে ও skipped গোনে
+            job.handle = job_queue.run_repeating(
+                self._tick, interval=job.interval, first=job.first + random.uniform(0, job.jitter),
+                name=job.name, data=job.name, job_kwargs={'jitter': job.jitter or None, 'max_instances': 2})
+        if run_global and shared:
+            job_queue.run_repeating(self._control, interval=config.JOBS_CONTROL_INTERVAL, first=1,
+                                    name='jobs_control')
+
+    def installed(self, name: str) -> bool:
+        return name in self.jobs and self.jobs[name].handle is not None
+
+    async def _tick(self, context) -> None:
+        await self.run(context.job.data, context)
+
+    async def run(self, name: str, context) -> bool:
+        """একবার চালানো; সফল হলে True (আগের রান চলতে থাকলে বা ব্যর্থ হলে False)"""
+        job = self.jobs[name]
+        if job.running:
+            job.skipped += 1
+            logger.warning(f"Job {name} still running after {time.time() - job.last_started:.1f}s, skipping tick")
+            return False
+        job.running = True
+        job.last_started = time.time()
+        started = time.perf_counter()
+        ok = False
+        try:
+            if job.heavy:
+                await offload(job.func)
+            else:
+                await job.func(context)
+            ok = True
+            job.last_error = None
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            logger.error(f"Job {name} failed: {e}", exc_info=True)
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration = time.perf_counter() - started
+            job.total_duration += job.last_duration
+            job.max_duration = max(job.max_duration, job.last_duration)
+        return ok
+
+    def trigger(self, name: str) -> None:
+        """এখনই একবার চালানো (নির্ধারিত সূচি বদলায় না; ওভারল্যাপ গার্ড প্রযোজ্য)"""
+        if not self.installed(name):
+            raise KeyError(name)
+        self.job_queue.run_once(self._tick, when=0, name=f'{name}:manual', data=name)
+
+    def apply(self, action: str, name: str) -> None:
+        if action == 'run':
+            self.trigger(name)
+        else:
+            self.set_paused(name, action == 'pause')
+
+    async def request(self, action: str, name: str) -> bool:
+        """/jobs কমান্ড; এই প্রসেসে চললে সাথে সাথে (True), না হলে জব প্রসেসের জন্য কিউ (False)"""
+        if self.installed(name):
+            self.apply(action, name)
+            return True
+        await db.run_db(db.add_job_command_sync, action, name)
+        return False
+
+    async def _control(self, context) -> None:
+        """অন্য worker এর কমান্ড চালানো ও global জবের মেট্রিক প্রকাশ"""
+        try:
+            applied = False
+            for action, name in await offload(db.take_job_commands_sync, config.JOBS_COMMAND_TTL):
+                if action in ACTIONS and self.installed(name):
+                    logger.info(f"Job command from another worker: {action} {name}")
+                    self.apply(action, name)
+                    applied = True
+            if not applied and time.monotonic() - self._published < config.JOBS_SNAPSHOT_INTERVAL:
+                return
+            self._published = time.monotonic()
+            snap = {name: s for name, s in self.snapshot().items() if not s.get('local', True)}
+            await offload(db.set_setting_sync, SNAPSHOT_KEY, json.dumps({'at': int(time.time()), 'jobs': snap}))
+        except Exception as e:
+            logger.error(f"Job control tick failed: {e}")
+
+    async def global_snapshot(self) -> Tuple[Dict[str, Any], Optional[int]]:
+        """global জবের মেট্রিক ও কত সেকেন্ড আগের (এই প্রসেসে চললে 0, অজানা হলে None)"""
+        if self.owner:
+            return {name: s for name, s in self.snapshot().items() if not s.get('local', True)}, 0
+        try:
+            data = json.loads(await db.run_db(db.get_setting_sync, SNAPSHOT_KEY) or 'null')
+        except ValueError:
+            data = None
+        if not data:
+            return {}, None
+        return data['jobs'], int(time.time()) - data['at']
+
+    def set_paused(self, name: str, paused: bool) -> None:
+        job = self.jobs[name]
+        job.paused = paused
+        if job.handle is not None:
+            job.handle.enabled = not paused
+
+    def names(self) -> List[str]:
+        return list(self.jobs)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """এই প্রসেসে বসানো জবগুলোর মেট্রিক (+ '_pool' = executor)"""
+        snap: Dict[str, Any] = {name: job.snapshot() for name, job in self.jobs.items() if job.handle is not None}
+        if self._executor is not None:
+            snap['_pool'] = self._executor.snapshot()
+        return snap
+
+async def offload(func: Callable, *args):
+    """sync কাজ জবের নিজস্ব executor এ (db.run_db এর মতো, কিন্তু DB pool এর বাইরে)"""
+    return await asyncio.get_running_loop().run_in_executor(runtime.executor, lambda: func(*args))
+
+runtime = JobRuntime()
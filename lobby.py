@@ -0,0 +1,149 @@
+# lobby.py - লবি চ্যানেলে প্রতি ফি টিয়ারে একটি লাইভ সারাংশ পোস্ট
+# আগে প্রতিটি কিউতে ঢোকা প্লেয়ারের জন্য আলাদা পোস্ট হত এবং ম্যাচ হলে মুছা হত; বাতিলের
+# পথে মুছা হত না। এখন কিউতে ঢোকা/বের হওয়া শুধু touch() করে, আর পোস্টগুলো সর্বোচ্চ প্রতি
+# LOBBY_EDIT_INTERVAL এ একবার এডিট হয় (টেক্সট না বদলালে কোনো API কল নেই)।
+# webhook মোডে শুধু জব চালানো worker লবির মালিক; অন্য worker এর পরিবর্তন পর্যায়ক্রমিক
+# lobby_job দিয়ে ধরা পড়ে, কারণ সারাংশ সবসময় DB থেকে পড়া হয়।
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from telegram.error import BadRequest
+import config
+import db
+import outbound
+
+logger = logging.getLogger(__name__)
+
+def fee_label(fee: float) -> str:
+    return 'Free' if fee == 0 else f"{fee:g} TK"
+
+def render(fee: float, rows: List[Dict[str, Any]]) -> str:
+    """একটি টিয়ারের পোস্ট টেক্সট (সময় নির্ভর কিছু নেই, তাই অপরিবর্তিত হলে এডিট হয় না)"""
+    if not rows:
+        return f"🎮 Lobby: {fee_label(fee)}\nএই মুহূর্তে কেউ অপেক্ষায় নেই।"
+    total = rows[0]['total']
+    lines = [f"🎮 Lobby: {fee_label(fee)}", f"অপেক্ষায়: {total} জন"]
+    for r in rows:
+        since = datetime.fromtimestamp(r['joined_at']).strftime('%H:%M')
+        lines.append(f"• {r['ingame_name'] or 'Player'} ({since} থেকে)")
+    if total > len(rows):
+        lines.append(f"… আরও {total - len(rows)} জন")
+    lines.append("খেলতে বটে 🎮 Play চাপুন।")
+    return "\n".join(lines)
+
+class LobbyManager:
+    """প্রতি ফি টিয়ারে একটি পোস্ট, কোয়ালেস করা এডিট
+
+    পোস্টের message_id settings টেবিলে থাকে, তাই রিস্টার্টের পরেও একই পোস্ট এডিট হয়।
+    """
+    SETTINGS_KEY = 'lobby_posts'
+
+    def __init__(self, interval: float = config.LOBBY_EDIT_INTERVAL):
+        self.interval = interval
+        self.bot = None
+        self.posts: Dict[float, int] = {}  # fee -> message_id
+        self.rendered: Dict[float, str] = {}  # fee -> শেষ পাঠানো টেক্সট
+        self._last_refresh = 0.0
+        self._task: Optional[asyncio.Task] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.touches = 0
+        self.refreshes = 0
+        self.api_calls = 0
+
+    async def _load(self) -> None:
+        raw = await db.get_setting(self.SETTINGS_KEY)
+        try:
+            self.posts = {float(k): int(v) for k, v in json.loads(raw).items()} if raw else {}
+        except (ValueError, AttributeError):
+            self.posts = {}
+
+    async def _save(self) -> None:
+        await db.set_setting(self.SETTINGS_KEY, json.dumps({str(k): v for k, v in self.posts.items()}))
+
+    async def start(self, bot) -> None:
+        """স্টার্টআপ: পুরনো প্রতি-প্লেয়ার পোস্ট মুছা, সংরক্ষিত পোস্ট লোড ও প্রথম রিফ্রেশ"""
+        self.bot = bot
+        self._lock = asyncio.Lock()
+        await self._load()
+        orphans = await db.take_queue_lobby_messages()
+        for mid in orphans:
+            try:
+                self.api_calls += 1
+                await bot.delete_message(config.LOBBY_CHANNEL_ID, mid, rate_limit_args=outbound.ADMIN)
+            except BadRequest:
+                pass  # আগেই মুছা বা ৪৮ ঘণ্টার বেশি পুরনো
+            except Exception as e:
+                logger.warning(f"Lobby orphan {mid} delete failed: {e}")
+        if orphans:
+            logger.info(f"Lobby: cleaned up {len(orphans)} orphaned per-player posts")
+        await self.refresh()
+
+    def touch(self) -> None:
+        """কিউ বদলেছে; শেষ রিফ্রেশের interval পরে (আগে নয়) একটি রিফ্রেশ নির্ধারণ"""
+        if self.bot is None:
+            return  # এই প্রসেস লবির মালিক নয়
+        self.touches += 1
+        if self._task and not self._task.done():
+            return  # ইতিমধ্যে নির্ধারিত রিফ্রেশে এটিও ধরা পড়বে
+        delay = max(0.0, self._last_refresh + self.interval - time.monotonic())
+        self._task = asyncio.create_task(self._refresh_after(delay))
+
+    async def _refresh_after(self, delay: float) -> None:
+        if delay:
+            await asyncio.sleep(delay)
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Lobby refresh error: {e}")
+
+    async def refresh(self) -> None:
+        """DB থেকে সারাংশ পড়ে শুধু পরিবর্তিত টিয়ারের পোস্ট এডিট/তৈরি করা"""
+        async with self._lock:
+            self._last_refresh = time.monotonic()
+            rows = await db.queue_summary(config.LOBBY_MAX_NAMES)
+            if rows is None:
+                return
+            self.refreshes += 1
+            tiers: Dict[float, List[Dict[str, Any]]] = {}
+            for r in rows:
+                tiers.setdefault(float(r['fee']), []).append(r)
+            changed = False
+            try:
+                with outbound.priority(outbound.MATCH):
+                    for fee in sorted(set(tiers) | set(self.posts)):
+                        text = render(fee, tiers.get(fee, []))
+                        if self.rendered.get(fee) == text:
+                            continue
+                        changed |= await self._publish(fee, text)
+                        self.rendered[fee] = text
+            finally:
+                # মাঝপথে send/edit ব্যর্থ হলেও এই পাসে পাঠানো পোস্টের id রাখা, না হলে পরের
+                # রিফ্রেশ ডুপ্লিকেট পোস্ট করে আর আগেরগুলো এতিম থাকে
+                if changed:
+                    await self._save()
+
+    async def _publish(self, fee: float, text: str) -> bool:
+        """পোস্ট এডিট, না থাকলে নতুন পোস্ট; message_id বদলালে True"""
+        mid = self.posts.get(fee)
+        if mid:
+            try:
+                self.api_calls += 1
+                await self.bot.edit_message_text(text, config.LOBBY_CHANNEL_ID, mid)
+                return False
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    return False
+                logger.warning(f"Lobby post for {fee_label(fee)} lost ({e}), reposting")
+        self.api_calls += 1
+        msg = await self.bot.send_message(config.LOBBY_CHANNEL_ID, text)
+        self.posts[fee] = msg.message_id
+        return True
+
+    def stats(self) -> Dict[str, int]:
+        return {'posts': len(self.posts), 'touches': self.touches, 'refreshes': self.refreshes,
+                'api_calls': self.api_calls}
+
+manager = LobbyManager()
@@ -0,0 +1,165 @@
+# monitor.py - event loop ল্যাগ, executor স্যাচুরেশন ও in-flight DB/AI কলের মনিটর
+# DB কাজ (db.run_db) একটি MAX_WORKERS থ্রেডের instrumented default executor এ চলে,
+# AI HTTP কল আলাদা pool এ, যাতে ধীর Groq রেসপন্স DB থ্রেড আটকে না রাখে।
+# একটি probe task নির্দিষ্ট বিরতিতে ঘুমিয়ে দেখে কত দেরিতে জাগল (= loop ল্যাগ)।
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict
+import config
+
+logger = logging.getLogger(__name__)
+
+class InstrumentedExecutor(ThreadPoolExecutor):
+    """কিউ-ডেপথ, সক্রিয় থ্রেড ও অপেক্ষার সময় গোনা ThreadPoolExecutor"""
+    def __init__(self, name: str, max_workers: int):
+        super().__init__(max_workers=max_workers, thread_name_prefix=f'{name}-pool')
+        self.name = name
+        self.size = max_workers
+        self._stat_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.max_queue_wait = 0.0
+        self.total_queue_wait = 0.0
+
+    def submit(self, fn, /, *args, **kwargs):
+        submitted = time.monotonic()
+        with self._stat_lock:
+            self.queued += 1
+
+        def run():
+            waited = time.monotonic() - submitted
+            with self._stat_lock:
+                self.queued -= 1
+                self.active += 1
+                self.total_queue_wait += waited
+                self.max_queue_wait = max(self.max_queue_wait, waited)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._stat_lock:
+                    self.active -= 1
+                    self.completed += 1
+
+        return super().submit(run)
+
+    def snapshot(self, reset_max: bool = False) -> Dict[str, Any]:
+        with self._stat_lock:
+            snap = {'size': self.size, 'active': self.active, 'queued': self.queued,
+                    'threads': len(self._threads), 'completed': self.completed,
+                    'avg_queue_wait_ms': round(self.total_queue_wait / self.completed * 1000, 1) if self.completed else 0.0,
+                    'max_queue_wait_ms': round(self.max_queue_wait * 1000, 1)}
+            if reset_max:
+                self.max_queue_wait = 0.0
+        return snap
+
+db_pool = InstrumentedExecutor('db', config.MAX_WORKERS)
+# স্ট্রিমিং রিকোয়েস্টে POST ও SSE পড়া দুটো থ্রেড নেয়
+ai_pool = InstrumentedExecutor('ai', config.AI_CONCURRENCY_MAX * 2)
+
+class Monitor:
+    """loop ল্যাগ probe, থ্রেশহোল্ড ওয়ার্নিং এবং পর্যায়ক্রমিক snapshot ফাইল"""
+    def __init__(self):
+        self.name = 'main'
+        self.lag_last = 0.0
+        self.lag_max = 0.0  # শেষ snapshot এর পর থেকে
+        self.lag_ewma = 0.0
+        self.lag_warnings = 0
+        self.saturation_warnings = 0
+        self.started_at = 0.0
+        self._tasks = []
+        self._last_warn: Dict[str, float] = {}
+        self._extra: Dict[str, Any] = {}
+
+    def _warn(self, key: str, msg: str) -> None:
+        # একই ধরনের ওয়ার্নিং প্রতি MONITOR_WARN_EVERY সেকেন্ডে একবার
+        now = time.monotonic()
+        if now - self._last_warn.get(key, 0) >= config.MONITOR_WARN_EVERY:
+            self._last_warn[key] = now
+            logger.warning(msg)
+
+    async def _probe(self) -> None:
+        interval = config.MONITOR_PROBE_INTERVAL
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(interval)
+            lag = max(0.0, time.monotonic() - start - interval)
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            self.lag_ewma = self.lag_ewma * 0.9 + lag * 0.1
+            if lag > config.MONITOR_LAG_WARN:
+                self.lag_warnings += 1
+                self._warn('lag', f"Event loop lag {lag * 1000:.0f} ms (threshold {config.MONITOR_LAG_WARN * 1000:.0f} ms)")
+            for pool in (db_pool, ai_pool):
+                if pool.queued > config.MONITOR_QUEUE_WARN:
+                    self.saturation_warnings += 1
+                    self._warn(f'pool-{pool.name}', f"Executor '{pool.name}' saturated: {pool.active}/{pool.size} "
+                                                    f"active, {pool.queued} queued")
+
+    async def _snapshots(self) -> None:
+        while True:
+            await asyncio.sleep(config.MONITOR_SNAPSHOT_INTERVAL)
+            try:
+                self.write_snapshot()
+            except OSError as e:
+                logger.warning(f"Monitor snapshot write failed: {e}")
+
+    def register(self, key: str, source) -> None:
+        """অন্য কম্পোনেন্টের snapshot() কলেবল যোগ করা (যেমন আপডেট প্রসেসর)"""
+        self._extra[key] = source
+
+    def snapshot(self, reset_max: bool = False) -> Dict[str, Any]:
+        # ai_manager লেজি লোড হয় (bot._ai); এখনো লোড না হলে কোনো AI কল হয়নি
+        ai_manager = sys.modules.get('ai_manager')
+        snap = {
+            'name': self.name, 'pid': os.getpid(), 'at': int(time.time()),
+            'uptime_s': int(time.monotonic() - self.started_at) if self.started_at else 0,
+            'loop_lag_ms': {'last': round(self.lag_last * 1000, 1), 'ewma': round(self.lag_ewma * 1000, 1),
+                            'max': round(self.lag_max * 1000, 1)},
+            'lag_warnings': self.lag_warnings, 'saturation_warnings': self.saturation_warnings,
+            'db_pool': db_pool.snapshot(reset_max), 'ai_pool': ai_pool.snapshot(reset_max),
+            'inflight': {'db': db_pool.active + db_pool.queued, 'ai': ai_manager.limiter.inflight if ai_manager else 0},
+        }
+        for key, source in self._extra.items():
+            try:
+                snap[key] = source()
+            except Exception as e:
+                snap[key] = {'error': str(e)}
+        if reset_max:
+            self.lag_max = 0.0
+        return snap
+
+    def write_snapshot(self) -> Path:
+        config.ensure_dirs()
+        path = Path(config.BASE_DIR) / f'monitor-{self.name}.json'
+        tmp = path.with_suffix('.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(self.snapshot(reset_max=True), f, indent=1)
+        os.replace(tmp, path)
+        return path
+
+    def start(self, name: str = 'main') -> None:
+        """চলমান loop এ default executor বসানো ও probe শুরু (প্রতি প্রসেসে একবার)"""
+        if self._tasks:
+            return
+        self.name = name
+        self.started_at = time.monotonic()
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(db_pool)
+        self._tasks = [loop.create_task(self._probe()), loop.create_task(self._snapshots())]
+        logger.info(f"Monitor started ({name}): db pool {db_pool.size}, ai pool {ai_pool.size} threads")
+
+    async def stop(self) -> None:
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+monitor = Monitor()
@@ -0,0 +1,209 @@
+# outbound.py - সব আউটবাউন্ড Telegram API কলের জন্য একটি অগ্রাধিকার-ভিত্তিক শিডিউলার
+# PTB এর BaseRateLimiter হিসেবে বসানো, তাই context.bot / message.reply_text সহ সব কল
+# এখান দিয়ে যায়। প্রতিটি চ্যাটের নিজস্ব token bucket (Telegram প্রতি-চ্যাট সীমা), তারপর
+# একটি গ্লোবাল bucket যেখানে অপেক্ষমাণ কলগুলো অগ্রাধিকার অনুযায়ী ছাড়া পায়:
+# ইন্টারঅ্যাক্টিভ রিপ্লাই > ম্যাচ নোটিফিকেশন > অ্যাডমিন ডাইজেস্ট > ব্রডকাস্ট।
+# অগ্রাধিকার দেওয়া হয় rate_limit_args=outbound.MATCH দিয়ে, অথবা with outbound.priority(...)
+# ব্লকের ভেতরে; কিছু না দিলে ইন্টারঅ্যাক্টিভ।
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+import config
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+MATCH = 1
+ADMIN = 2
+BROADCAST = 3
+CLASS_NAMES = {INTERACTIVE: 'interactive', MATCH: 'match', ADMIN: 'admin', BROADCAST: 'broadcast'}
+
+# মেসেজ পাঠানো/এডিট/মুছা প্রতি-চ্যাট ও গ্লোবাল সীমার আওতায়; বাকি কল শুধু RetryAfter সামলায়
+_THROTTLED_PREFIXES = ('send', 'edit', 'copy', 'forward', 'delete')
+
+_priority: contextvars.ContextVar = contextvars.ContextVar('outbound_priority', default=INTERACTIVE)
+
+@contextmanager
+def priority(level: int):
+    """এই ব্লকে (এবং এখান থেকে তৈরি task এ) করা কলগুলোর অগ্রাধিকার"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+class TokenBucket:
+    """rate টোকেন/সেকেন্ড, সর্বোচ্চ burst টোকেন"""
+    __slots__ = ('rate', 'burst', 'tokens', 'stamp')
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+
+    def delay(self, now: float) -> float:
+        """একটি টোকেন পেতে আর কত সেকেন্ড"""
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+class _ClassStats:
+    __slots__ = ('requests', 'waiting', 'total_wait', 'max_wait', 'retry_after')
+
+    def __init__(self):
+        self.requests = 0
+        self.waiting = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.retry_after = 0
+
+class PriorityRateLimiter(BaseRateLimiter[int]):
+    """প্রতি-চ্যাট ও গ্লোবাল token bucket, অগ্রাধিকার ক্লাস এবং স্বয়ংক্রিয় RetryAfter"""
+    def __init__(self, global_rate: float = config.OUTBOUND_GLOBAL_RATE,
+                 global_burst: float = config.OUTBOUND_GLOBAL_BURST,
+                 max_retries: int = config.OUTBOUND_MAX_RETRIES):
+        self.max_retries = max_retries
+        self._global = TokenBucket(global_rate, global_burst)
+        self._chats: Dict[int, TokenBucket] = {}
+        self._heap: List[Tuple[int, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._pump: Optional[asyncio.Task] = None
+        self._blocked_until = 0.0
+        self._last_prune = time.monotonic()
+        self.stats = {c: _ClassStats() for c in CLASS_NAMES}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._pump:
+            self._pump.cancel()
+        for _, _, fut in self._heap:
+            fut.cancel()
+        self._heap.clear()
+
+    # --- Buckets ---
+    def _chat_bucket(self, chat_id: Any) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            try:
+                group = int(chat_id) < 0
+            except (TypeError, ValueError):
+                group = True  # @channel_username
+            if group:
+                bucket = TokenBucket(config.OUTBOUND_GROUP_RATE, config.OUTBOUND_GROUP_BURST)
+            else:
+                bucket = TokenBucket(config.OUTBOUND_PRIVATE_RATE, config.OUTBOUND_PRIVATE_BURST)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _prune(self, now: float) -> None:
+        # পূর্ণ হয়ে যাওয়া (নিষ্ক্রিয়) চ্যাট bucket সরানো
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        for chat_id in [c for c, b in self._chats.items() if b.delay(now) == 0 and b.tokens >= b.burst]:
+            del self._chats[chat_id]
+
+    async def _wait_chat(self, chat_id: Any) -> None:
+        bucket = self._chat_bucket(chat_id)
+        while True:
+            d = bucket.delay(time.monotonic())
+            if d <= 0:
+                bucket.take()
+                return
+            await asyncio.sleep(d)
+
+    async def _wait_global(self, level: int) -> None:
+        now = time.monotonic()
+        if not self._heap and now >= self._blocked_until and self._global.delay(now) <= 0:
+            self._global.take()
+            return
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (level, next(self._seq), fut))
+        if self._pump is None or self._pump.done():
+            self._pump = asyncio.create_task(self._run_pump())
+        await fut
+
+    async def _run_pump(self) -> None:
+        """গ্লোবাল টোকেন পাওয়া মাত্র সর্বোচ্চ অগ্রাধিকারের অপেক্ষমাণ কল ছাড়া"""
+        while self._heap:
+            now = time.monotonic()
+            wait = max(self._blocked_until - now, self._global.delay(now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+            _, _, fut = heapq.heappop(self._heap)
+            if fut.done():  # বাতিল হওয়া কল
+                continue
+            self._global.take()
+            fut.set_result(None)
+
+    # --- BaseRateLimiter ---
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        level = rate_limit_args if rate_limit_args in CLASS_NAMES else _priority.get()
+        st = self.stats[level]
+        st.requests += 1
+        throttled = endpoint.startswith(_THROTTLED_PREFIXES)
+        chat_id = data.get('chat_id')
+        attempt = 0
+        while True:
+            if throttled:
+                start = time.monotonic()
+                st.waiting += 1
+                try:
+                    if chat_id is not None:
+                        await self._wait_chat(chat_id)
+                    await self._wait_global(level)
+                finally:
+                    st.waiting -= 1
+                waited = time.monotonic() - start
+                st.total_wait += waited
+                st.max_wait = max(st.max_wait, waited)
+                self._prune(time.monotonic())
+            elif self._blocked_until > time.monotonic():
+                await asyncio.sleep(self._blocked_until - time.monotonic())
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                st.retry_after += 1
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                # flood control পুরো বটের উপর, তাই সব কল থামানো
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                logger.warning(f"RetryAfter {delay}s on {endpoint} ({CLASS_NAMES[level]}), "
+                               f"attempt {attempt + 1}/{self.max_retries + 1}")
+                if attempt == self.max_retries:
+                    raise
+                attempt += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """অগ্রাধিকার ক্লাস অনুযায়ী মেট্রিক্স"""
+        now = time.monotonic()
+        return {
+            'queued_global': len(self._heap),
+            'chats_tracked': len(self._chats),
+            'blocked_for': round(max(0.0, self._blocked_until - now), 1),
+            'classes': {CLASS_NAMES[c]: {'requests': s.requests, 'waiting': s.waiting,
+                                         'avg_wait_ms': round(s.total_wait / s.requests * 1000, 1) if s.requests else 0.0,
+                                         'max_wait_ms': round(s.max_wait * 1000, 1), 'retry_after': s.retry_after}
+                        for c, s in self.stats.items()},
+        }
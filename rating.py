@@ -0,0 +1,192 @@
+# rating.py - ELO রেটিং ইঞ্জিন (একমাত্র ELO ইমপ্লিমেন্টেশন) ও রিপ্লে টুল
+# ব্যবহার:
+#   python rating.py replay [--schedule 0:40,30:32,100:24] [--initial 1000] [--with-records] [--dry-run]
+#   python rating.py bench --matches 300000 --players 20000
+import argparse
+import bisect
+import logging
+import random
+import time
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+import config
+
+logger = logging.getLogger(__name__)
+
+# --- ELO Core ---
+def expected_score(rating: float, opponent_rating: float) -> float:
+    """প্রতিপক্ষের বিপক্ষে প্রত্যাশিত স্কোর"""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+def elo_delta(rating: float, opponent_rating: float, score: float, k_factor: float = 32) -> float:
+    """রেটিং পরিবর্তন (রাউন্ড ছাড়া)"""
+    return k_factor * (score - expected_score(rating, opponent_rating))
+
+def calculate_elo(player_rating: int, opponent_rating: int, score: int, k_factor: int = 32) -> int:
+    """ELO রেটিং গণনা"""
+    return int(round(player_rating + elo_delta(player_rating, opponent_rating, score, k_factor)))
+
+# --- K-factor Schedule ---
+class KSchedule:
+    """খেলা ম্যাচের সংখ্যা অনুযায়ী K-factor, যেমন '0:40,30:32,100:24'"""
+    def __init__(self, spec: str = '0:32'):
+        steps = []
+        for part in spec.split(','):
+            games, k = part.split(':')
+            steps.append((int(games), float(k)))
+        steps.sort()
+        if not steps or steps[0][0] != 0:
+            raise ValueError(f"K schedule must start at 0 games: {spec!r}")
+        self.spec = spec
+        self.thresholds = [g for g, _ in steps]
+        self.values = [k for _, k in steps]
+        # ছোট গেম-কাউন্টের জন্য সরাসরি লুকআপ টেবিল
+        self._table = array('d', (self._lookup(g) for g in range(self.thresholds[-1] + 1)))
+
+    def _lookup(self, games: int) -> float:
+        return self.values[bisect.bisect_right(self.thresholds, games) - 1]
+
+    def k_for(self, games: int) -> float:
+        return self._table[games] if games < len(self._table) else self.values[-1]
+
+_live_schedule: Optional[KSchedule] = None
+
+def live_schedule() -> KSchedule:
+    """লাইভ ম্যাচ রেজাল্টে ব্যবহৃত schedule (config.ELO_K_SCHEDULE)"""
+    global _live_schedule
+    if _live_schedule is None or _live_schedule.spec != config.ELO_K_SCHEDULE:
+        _live_schedule = KSchedule(config.ELO_K_SCHEDULE)
+    return _live_schedule
+
+# --- Replay ---
+class ReplayResult:
+    __slots__ = ('ratings', 'wins', 'losses', 'matches')
+
+    def __init__(self, ratings: Dict[int, int], wins: Dict[int, int], losses: Dict[int, int], matches: int):
+        self.ratings = ratings
+        self.wins = wins
+        self.losses = losses
+        self.matches = matches
+
+def replay(results: Iterable[Tuple[int, int]], schedule: KSchedule, initial: int = config.ELO_INITIAL) -> ReplayResult:
+    """(winner_id, loser_id) ক্রমানুসারে রিপ্লে
+
+    লাইভ রেজাল্টের মতই প্রতিটি ধাপে রাউন্ড করা হয়, তাই একই schedule এ
+    রিপ্লে করলে লাইভ রেটিং হুবহু ফিরে আসে। রেটিং ও ম্যাচ-কাউন্ট user_id -> ইনডেক্স
+    ম্যাপ করে array তে রাখা হয়, প্রতি ম্যাচে কোনো অবজেক্ট তৈরি হয় না।
+    """
+    index: Dict[int, int] = {}
+    ids = array('q')
+    ratings = array('d')
+    wins = array('l')
+    losses = array('l')
+    k_for = schedule.k_for
+    n = 0
+    for winner, loser in results:
+        iw = index.get(winner)
+        if iw is None:
+            iw = index[winner] = len(ids)
+            ids.append(winner); ratings.append(initial); wins.append(0); losses.append(0)
+        il = index.get(loser)
+        if il is None:
+            il = index[loser] = len(ids)
+            ids.append(loser); ratings.append(initial); wins.append(0); losses.append(0)
+        rw, rl = ratings[iw], ratings[il]
+        ratings[iw] = round(rw + k_for(wins[iw] + losses[iw]) * (1 - 1 / (1 + 10 ** ((rl - rw) / 400))))
+        ratings[il] = round(rl - k_for(wins[il] + losses[il]) * (1 / (1 + 10 ** ((rw - rl) / 400))))
+        wins[iw] += 1
+        losses[il] += 1
+        n += 1
+    return ReplayResult(
+        {uid: int(ratings[i]) for i, uid in enumerate(ids)},
+        {uid: wins[i] for i, uid in enumerate(ids)},
+        {uid: losses[i] for i, uid in enumerate(ids)},
+        n,
+    )
+
+def load_results(conn) -> List[Tuple[int, int]]:
+    """সম্পন্ন ম্যাচগুলো নিষ্পত্তির ক্রমে (winner, loser) তালিকা
+
+    লাইভ ELO resolve_match_sync এ বসে, আর অ্যাডমিন রিভিউ প্রায়ই তৈরির ক্রম ভেঙে নিষ্পত্তি করে,
+    তাই ক্রম বিজয়ীর match_history.played_at থেকে (হিস্টোরি না থাকলে created_at); একই সেকেন্ডে
+    নিষ্পত্তি হলে created_at ক্রম। v7 এর আগের ম্যাচের played_at আসলে created_at, তাই সেগুলোর
+    রিপ্লে লাইভ রেটিংয়ের আসন্ন মান মাত্র। JOIN এর বদলে একবারের ম্যাপ, কারণ হিস্টোরির PK
+    match_id দিয়ে খোঁজা যায় না।
+    """
+    played = dict(conn.execute("SELECT match_id, played_at FROM match_history WHERE won = 1"))
+    rows = conn.execute("""SELECT winner_id, player1_id, player2_id, match_id, created_at FROM active_matches
+                           WHERE status='completed' AND winner_id IS NOT NULL
+                           ORDER BY created_at, rowid""").fetchall()
+    rows.sort(key=lambda r: played.get(r[3], r[4]))  # stable: একই সেকেন্ডে created_at ক্রম থাকে
+    return [(winner, p2 if winner == p1 else p1) for winner, p1, p2, _, _ in rows]
+
+def write_back(result: ReplayResult, initial: int = config.ELO_INITIAL, with_records: bool = False) -> None:
+    """সব রেটিং এক ট্রানজ্যাকশনে লেখা (কখনো না খেলা ইউজার initial এ ফেরে)"""
+    import db
+    with db.transaction() as c:
+        c.execute("UPDATE users SET elo_rating=?", (initial,))
+        c.executemany("UPDATE users SET elo_rating=? WHERE user_id=?",
+                      ((r, uid) for uid, r in result.ratings.items()))
+        if with_records:
+            c.execute("UPDATE users SET wins=0, losses=0")
+            c.executemany("UPDATE users SET wins=?, losses=? WHERE user_id=?",
+                          ((result.wins[uid], result.losses[uid], uid) for uid in result.ratings))
+
+def rebuild_ratings(spec: Optional[str] = None, initial: int = config.ELO_INITIAL,
+                    with_records: bool = False, dry_run: bool = False) -> ReplayResult:
+    """ডাটাবেসের সব ম্যাচ রিপ্লে করে রেটিং পুনর্গঠন"""
+    import db
+    schedule = KSchedule(spec or config.ELO_K_SCHEDULE)
+    result = replay(load_results(db.get_read_conn()), schedule, initial)
+    if not dry_run:
+        write_back(result, initial, with_records)
+    logger.info(f"Rating replay: {result.matches} matches, {len(result.ratings)} players, "
+                f"schedule={schedule.spec}, dry_run={dry_run}")
+    return result
+
+def _synthetic(matches: int, players: int) -> List[Tuple[int, int]]:
+    rnd = random.Random(1)
+    out = []
+    for _ in range(matches):
+        a, b = rnd.sample(range(1, players + 1), 2)
+        out.append((a, b))
+    return out
+
+def main():
+    parser = argparse.ArgumentParser(description='ELO rating engine')
+    sub = parser.add_subparsers(dest='cmd', required=True)
+    p_replay = sub.add_parser('replay', help='rebuild ratings from completed matches')
+    p_replay.add_argument('--schedule', default=config.ELO_K_SCHEDULE)
+    p_replay.add_argument('--initial', type=int, default=config.ELO_INITIAL)
+    p_replay.add_argument('--with-records', action='store_true', help='also recount wins/losses')
+    p_replay.add_argument('--dry-run', action='store_true')
+    p_bench = sub.add_parser('bench', help='time replay on synthetic matches')
+    p_bench.add_argument('--matches', type=int, default=300000)
+    p_bench.add_argument('--players', type=int, default=20000)
+    p_bench.add_argument('--schedule', default='0:40,30:32,100:24')
+    args = parser.parse_args()
+
+    if args.cmd == 'replay':
+        import db
+        db.init_db()
+        before = {r[0]: r[1] for r in db.get_read_conn().execute("SELECT user_id, elo_rating FROM users")}
+        start = time.perf_counter()
+        result = rebuild_ratings(args.schedule, args.initial, args.with_records, args.dry_run)
+        elapsed = time.perf_counter() - start
+        changed = sorted(((abs(r - (before.get(uid) or args.initial)), uid, before.get(uid), r)
+                          for uid, r in result.ratings.items()), reverse=True)[:10]
+        print(f"Replayed {result.matches} matches for {len(result.ratings)} players in {elapsed:.2f}s"
+              f"{' (dry run)' if args.dry_run else ''}")
+        for diff, uid, old, new in changed:
+            if diff:
+                print(f"  {uid}: {old} -> {new}")
+    else:
+        data = _synthetic(args.matches, args.players)
+        start = time.perf_counter()
+        result = replay(data, KSchedule(args.schedule))
+        elapsed = time.perf_counter() - start
+        print(f"{result.matches} matches / {len(result.ratings)} players: {elapsed:.2f}s "
+              f"({result.matches / elapsed:,.0f} matches/s)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# reaper.py - ম্যাচমেকিং কিউর রক্ষণাবেক্ষণ: মেয়াদোত্তীর্ণ এন্ট্রি সরানো ও বয়সের পরিসংখ্যান
+# QUEUE_TTL এর বেশি পুরনো এন্ট্রি (fee, joined_at) ইন্ডেক্স ধরে QUEUE_REAP_BATCH করে মুছা হয়,
+# প্রতিটি ব্যাচ আলাদা ট্রানজ্যাকশনে যাতে ম্যাচমেকিং লেখা বেশিক্ষণ আটকে না থাকে।
+# সরানো প্লেয়ারদের একসাথে (চাঙ্কে, নিচু অগ্রাধিকারে) জানানো হয় এবং লবি পোস্ট আপডেট হয়।
+import asyncio
+import logging
+import math
+import time
+from typing import Any, Dict, List
+from telegram.error import BadRequest
+import config
+import db
+import lobby
+import outbound
+from records import QueueRow
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_TEXT = ("⌛ অনেকক্ষণ প্রতিপক্ষ পাওয়া যায়নি, তাই আপনাকে ম্যাচ কিউ থেকে সরানো হয়েছে।\n"
+                "আবার খেলতে 🎮 Play চাপুন।")
+
+stats = {'runs': 0, 'expired': 0, 'batches': 0, 'notified': 0}
+
+def percentile(values: List[float], p: float) -> float:
+    """সাজানো তালিকার nearest-rank পার্সেন্টাইল"""
+    if not values:
+        return 0.0
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+async def queue_ages() -> Dict[float, Dict[str, Any]]:
+    """প্রতি fee টিয়ারে অপেক্ষমাণ সংখ্যা ও অপেক্ষার সময়ের p50/p90/p99/max (সেকেন্ড)"""
+    now = int(time.time())
+    out = {}
+    for fee, joined in (await db.queue_joined()).items():
+        ages = [now - j for j in reversed(joined)]  # joined_at ঊর্ধ্বক্রম, তাই বয়স নিম্নক্রম -> উল্টানো
+        out[fee] = {'count': len(ages), 'p50': percentile(ages, 50), 'p90': percentile(ages, 90),
+                    'p99': percentile(ages, 99), 'max': ages[-1]}
+    return out
+
+def format_ages(ages: Dict[float, Dict[str, Any]]) -> str:
+    if not ages:
+        return "Queue: empty"
+    return "\n".join(f"Queue {lobby.fee_label(fee)}: {a['count']} waiting, age p50 {a['p50']}s, "
+                     f"p90 {a['p90']}s, p99 {a['p99']}s, max {a['max']}s"
+                     for fee, a in sorted(ages.items()))
+
+async def _notify(bot, rows: List[QueueRow]) -> None:
+    chunk = config.BROADCAST_CHUNK
+    for i in range(0, len(rows), chunk):
+        part = rows[i:i + chunk]
+        results = await asyncio.gather(*(bot.send_message(r.user_id, EXPIRED_TEXT,
+                                                          rate_limit_args=outbound.BROADCAST) for r in part),
+                                       return_exceptions=True)
+        stats['notified'] += sum(1 for r in results if not isinstance(r, Exception))
+
+async def _delete_posts(bot, ids: List[int]) -> None:
+    """আগের সংস্করণের প্রতি-প্লেয়ার লবি পোস্ট (থাকলে)"""
+    for mid in ids:
+        try:
+            await bot.delete_message(config.LOBBY_CHANNEL_ID, mid, rate_limit_args=outbound.ADMIN)
+        except BadRequest:
+            pass
+        except Exception as e:
+            logger.warning(f"Expired lobby post {mid} delete failed: {e}")
+
+async def reap(bot, max_batches: int = 10) -> int:
+    """মেয়াদোত্তীর্ণ কিউ এন্ট্রি সরানো; সরানো এন্ট্রির সংখ্যা"""
+    stats['runs'] += 1
+    cutoff = int(time.time()) - config.QUEUE_TTL
+    expired: List[QueueRow] = []
+    for _ in range(max_batches):
+        rows = await db.expire_queue(cutoff, config.QUEUE_REAP_BATCH)
+        if not rows:
+            break
+        stats['batches'] += 1
+        expired.extend(rows)
+        if len(rows) < config.QUEUE_REAP_BATCH:
+            break
+    if not expired:
+        return 0
+    stats['expired'] += len(expired)
+    lobby.manager.touch()
+    await _delete_posts(bot, [r.lobby_message_id for r in expired if r.lobby_message_id])
+    await _notify(bot, expired)
+    logger.info(f"Queue reaper expired {len(expired)} entries older than {config.QUEUE_TTL}s")
+    return len(expired)
@@ -0,0 +1,82 @@
+# records.py - ডাটাবেস সারির হালকা টাইপড অবজেক্ট
+# আগে প্রতিটি রিড `SELECT *` করে sqlite3.Row কে নতুন dict এ কপি করত। এখন প্রতিটি টেবিলের
+# কুয়েরি শুধু দরকারি কলাম চায় এবং cursor এর row_factory সরাসরি __slots__ অবজেক্ট বানায়
+# (প্রতি সারিতে dict ও Row দুটোর বদলে একটি ছোট অবজেক্ট)।
+# মাইগ্রেশনের সময় পুরনো কোড যেন না ভাঙে, তাই r['col'], r.get('col', default), 'col' in r,
+# keys()/items() ও dict(r) সবই কাজ করে; নতুন কোডে r.col ব্যবহার করা উচিত।
+from typing import Any, Dict, Iterator, Tuple
+
+class Record:
+    """__slots__ ভিত্তিক সারি; সাবক্লাস COLUMNS (= __slots__) এ কলামের ক্রম দেয়"""
+    __slots__ = ()
+    COLUMNS: Tuple[str, ...] = ()
+
+    def __init__(self, *values: Any):
+        for name, value in zip(self.COLUMNS, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def factory(cls, cursor, row: tuple) -> 'Record':
+        """cursor.row_factory হিসেবে ব্যবহারের জন্য"""
+        return cls(*row)
+
+    @classmethod
+    def columns(cls, alias: str = '') -> str:
+        """SELECT এর কলাম তালিকা (COLUMNS এর ক্রমে, factory এর সাথে মিলিয়ে)"""
+        prefix = f"{alias}." if alias else ''
+        return ', '.join(prefix + name for name in cls.COLUMNS)
+
+    # --- dict-সামঞ্জস্য (মাইগ্রেশনের সময়) ---
+    def __getitem__(self, key: str) -> Any:
+        if key not in self.COLUMNS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default) if key in self.COLUMNS else default
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.COLUMNS
+
+    def keys(self) -> Tuple[str, ...]:
+        return self.COLUMNS
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return ((name, getattr(self, name)) for name in self.COLUMNS)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Record):
+            return type(self) is type(other) and tuple(self.items()) == tuple(other.items())
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({', '.join(f'{k}={v!r}' for k, v in self.items())})"
+
+class UserRow(Record):
+    """users টেবিল (phone_number ও created_at বটের কোথাও পড়া হয় না, তাই প্রজেকশনে নেই)"""
+    __slots__ = COLUMNS = ('user_id', 'ingame_name', 'is_registered', 'balance', 'welcome_given',
+                           'wins', 'losses', 'state', 'state_data', 'referrer_id', 'elo_rating',
+                           'is_banned', 'current_streak', 'best_streak')
+
+class MatchRow(Record):
+    """active_matches টেবিল"""
+    __slots__ = COLUMNS = ('match_id', 'player1_id', 'player2_id', 'fee', 'status', 'room_code',
+                           'created_at', 'p1_screenshot_id', 'p2_screenshot_id', 'winner_id')
+
+class QueueRow(Record):
+    """matchmaking_queue টেবিল"""
+    __slots__ = COLUMNS = ('user_id', 'fee', 'joined_at', 'lobby_message_id')
+
+class LeaderRow(Record):
+    """লিডারবোর্ডের এক সারি"""
+    __slots__ = COLUMNS = ('ingame_name', 'wins', 'elo_rating')
+
+class HistoryRow(Record):
+    """match_history এর এক সারি (একজন খেলোয়াড়ের দিক থেকে), প্রতিপক্ষের নাম সহ"""
+    __slots__ = COLUMNS = ('match_id', 'played_at', 'opponent_id', 'opponent_name', 'fee', 'won',
+                           'elo_before', 'elo_after')
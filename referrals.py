@@ -0,0 +1,171 @@
+# referrals.py - রেফারেল ট্রি কাউন্ট ও ব্যাচ করা রেফারেল বোনাস
+# users.referrer_id ইন্ডেক্সড, তাই বহু-লেভেল কাউন্ট একটি recursive CTE তে হয় এবং শুধু
+# ওই ইউজারের সাব-ট্রি ছোঁয়; ফলাফল REFERRAL_CACHE_TTL পর্যন্ত ক্যাশ থাকে।
+# referee রেজিস্ট্রেশন শেষ করলে referral_rewards এ একটি pending সারি হয় (PRIMARY KEY এর
+# কারণে একবারই); referral_job প্রতি REFERRAL_BATCH_SIZE সারি এক ট্রানজ্যাকশনে ব্যালেন্স,
+# transactions লেজার ও স্ট্যাটাস আপডেট করে এবং প্রতি রেফারারকে একটি নোটিফিকেশন পাঠায়।
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+import config
+import db
+import outbound
+
+logger = logging.getLogger(__name__)
+
+REGISTRATION = 'registration'
+FIRST_DEPOSIT = 'first_deposit'
+
+_cache: Dict[int, Tuple[float, Dict[str, Any]]] = {}  # uid -> (expires, summary)
+stats = {'queued': 0, 'paid': 0, 'voided': 0, 'batches': 0, 'cache_hits': 0, 'cache_misses': 0}
+
+# --- Queries (sync) ---
+def queue_reward_sync(referee_id: int, trigger: str, amount: float) -> List[int]:
+    """referee এর রেফারার থাকলে pending রিওয়ার্ড যোগ; রিটার্ন: ক্যাশ বাতিলের জন্য ঊর্ধ্বতন রেফারাররা"""
+    try:
+        with db.transaction() as c:
+            c.execute("""INSERT OR IGNORE INTO referral_rewards(referee_id, trigger, referrer_id, amount, created_at)
+                         SELECT user_id, ?, referrer_id, ?, ? FROM users
+                         WHERE user_id = ? AND referrer_id IS NOT NULL""",
+                      (trigger, amount, int(time.time()), referee_id))
+            if c.rowcount != 1:
+                return []
+            c.execute("""WITH RECURSIVE up(user_id, depth) AS (
+                             SELECT referrer_id, 1 FROM users WHERE user_id = ?
+                             UNION ALL
+                             SELECT u.referrer_id, up.depth + 1 FROM users u JOIN up ON u.user_id = up.user_id
+                             WHERE u.referrer_id IS NOT NULL AND up.depth < ?)
+                         SELECT user_id FROM up""", (referee_id, config.REFERRAL_DEPTH))
+            return [r[0] for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"queue_reward_sync error: {e}")
+        return []
+
+def summary_sync(uid: int, depth: int) -> Optional[Dict[str, Any]]:
+    """লেভেল অনুযায়ী রেফারি সংখ্যা ও মোট পাওয়া বোনাস"""
+    try:
+        c = db.get_read_conn().cursor()
+        # depth সীমা পুরনো ডাটায় থাকা সম্ভাব্য চক্রেও রিকার্শন থামায়
+        c.execute("""WITH RECURSIVE tree(user_id, registered, depth) AS (
+                         SELECT user_id, is_registered, 1 FROM users WHERE referrer_id = ?
+                         UNION ALL
+                         SELECT u.user_id, u.is_registered, t.depth + 1 FROM users u
+                         JOIN tree t ON u.referrer_id = t.user_id WHERE t.depth < ?)
+                     SELECT depth, COUNT(*) AS total, SUM(registered) AS registered
+                     FROM tree GROUP BY depth ORDER BY depth""", (uid, depth))
+        levels = [{'depth': r['depth'], 'total': r['total'], 'registered': r['registered'] or 0}
+                  for r in c.fetchall()]
+        c.execute("""SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM referral_rewards
+                     WHERE referrer_id = ? AND status = 'paid'""", (uid,))
+        paid, earned = c.fetchone()
+        return {'levels': levels, 'rewards': paid, 'earned': earned}
+    except Exception as e:
+        logger.error(f"summary_sync error: {e}")
+        return None
+
+def pay_batch_sync(limit: int) -> Optional[Tuple[int, List[Tuple[int, int, float]]]]:
+    """সবচেয়ে পুরনো limit টি pending রিওয়ার্ড এক কমিটে পোস্ট
+
+    রিটার্ন: (প্রসেস হওয়া সারি, [(রেফারার, সংখ্যা, মোট)]); ব্যান/মুছে যাওয়া রেফারারের রিওয়ার্ড void হয়।
+    """
+    try:
+        with db.transaction() as c:
+            c.execute("""SELECT r.referee_id, r.trigger, r.referrer_id, r.amount,
+                                u.user_id IS NOT NULL AND NOT COALESCE(u.is_banned, 0) AS eligible
+                         FROM referral_rewards r LEFT JOIN users u ON u.user_id = r.referrer_id
+                         WHERE r.status = 'pending' ORDER BY r.created_at LIMIT ?""", (limit,))
+            rows = c.fetchall()
+            if not rows:
+                return 0, []
+            now = int(time.time())
+            totals: Dict[int, List[float]] = {}
+            ledger, marks = [], []
+            for r in rows:
+                if not r['eligible']:
+                    marks.append(('void', now, r['referee_id'], r['trigger']))
+                    continue
+                t = totals.setdefault(r['referrer_id'], [0, 0.0])
+                t[0] += 1
+                t[1] += r['amount']
+                ledger.append((r['referrer_id'], r['amount'], 'referral_bonus',
+                               f"{r['trigger']} of {r['referee_id']}", now))
+                marks.append(('paid', now, r['referee_id'], r['trigger']))
+            c.executemany("UPDATE users SET balance=balance+? WHERE user_id=?",
+                          [(amt, ref) for ref, (_, amt) in totals.items()])
+            c.executemany("INSERT INTO transactions(user_id, amount, type, note, created_at) VALUES(?,?,?,?,?)",
+                          ledger)
+            c.executemany("UPDATE referral_rewards SET status=?, paid_at=? WHERE referee_id=? AND trigger=?", marks)
+        stats['paid'] += len(ledger)
+        stats['voided'] += len(marks) - len(ledger)
+        stats['batches'] += 1
+        return len(rows), [(ref, int(n), amt) for ref, (n, amt) in totals.items()]
+    except Exception as e:
+        logger.error(f"pay_batch_sync error: {e}")
+        return None
+
+def pending_count_sync() -> int:
+    try:
+        c = db.get_read_conn().cursor()
+        c.execute("SELECT COUNT(*) FROM referral_rewards WHERE status = 'pending'")
+        return c.fetchone()[0]
+    except Exception as e:
+        logger.error(f"pending_count_sync error: {e}")
+        return 0
+
+# --- Async API ---
+async def queue_reward(referee_id: int, trigger: str, amount: float = config.REFERRAL_BONUS) -> bool:
+    """রিওয়ার্ড কিউ করা (পরের referral_job এ পোস্ট হয়)"""
+    ancestors = await db.run_db(queue_reward_sync, referee_id, trigger, amount)
+    for uid in ancestors:
+        _cache.pop(uid, None)
+    if ancestors:
+        stats['queued'] += 1
+    return bool(ancestors)
+
+async def on_registered(uid: int) -> bool:
+    return await queue_reward(uid, REGISTRATION)
+
+async def summary(uid: int) -> Optional[Dict[str, Any]]:
+    """ক্যাশ করা রেফারেল সারাংশ"""
+    now = time.monotonic()
+    hit = _cache.get(uid)
+    if hit and hit[0] > now:
+        stats['cache_hits'] += 1
+        return hit[1]
+    stats['cache_misses'] += 1
+    res = await db.run_db(summary_sync, uid, config.REFERRAL_DEPTH)
+    if res is not None:
+        if len(_cache) > 10000:
+            _cache.clear()
+        _cache[uid] = (now + config.REFERRAL_CACHE_TTL, res)
+    return res
+
+async def pay_pending(bot, max_batches: int = 20) -> int:
+    """pending রিওয়ার্ড ব্যাচে পোস্ট করে রেফারারদের জানানো; পোস্ট হওয়া সংখ্যা"""
+    credited: Dict[int, List[float]] = {}
+    for _ in range(max_batches):
+        res = await db.run_db(pay_batch_sync, config.REFERRAL_BATCH_SIZE)
+        if not res or not res[0]:
+            break
+        for ref, n, amt in res[1]:
+            t = credited.setdefault(ref, [0, 0.0])
+            t[0] += n
+            t[1] += amt
+    if not credited:
+        return 0
+    for ref in credited:
+        _cache.pop(ref, None)
+    items = list(credited.items())
+    chunk = config.BROADCAST_CHUNK
+    for i in range(0, len(items), chunk):
+        await asyncio.gather(*(bot.send_message(ref, f"🎁 রেফারেল বোনাস: +{amt:.2f} TK ({int(n)} টি)",
+                                                rate_limit_args=outbound.BROADCAST)
+                               for ref, (n, amt) in items[i:i + chunk]),
+                             return_exceptions=True)
+    total = sum(int(n) for n, _ in credited.values())
+    logger.info(f"Referral rewards posted: {total} to {len(credited)} referrers")
+    return total
+
+async def pending_count() -> int:
+    return await db.run_db(pending_count_sync)
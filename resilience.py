@@ -0,0 +1,150 @@
+# resilience.py - বাইরের API (Groq) কলের জন্য circuit breaker, AIMD concurrency ও backoff
+# ব্রেকার খোলা থাকলে কল একেবারেই হয় না, ইউজার সাথে সাথে বিকল্প উত্তর পায়; কুলডাউন শেষে
+# half-open অবস্থায় সীমিত probe কল যায়, সফল হলে আবার বন্ধ (স্বাভাবিক)।
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """পরপর ব্যর্থতায় খোলে, কুলডাউনের পর half-open probe দিয়ে যাচাই করে"""
+    def __init__(self, name: str, failure_threshold: int, cooldown: float,
+                 max_cooldown: float, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.half_open_probes = half_open_probes
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = cooldown
+        self.opened_at = 0.0
+        self.probes = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """এখন কল করা যাবে কিনা (half-open এ probe স্লট নেয়)"""
+        if self.state == CLOSED:
+            return True
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.cooldown:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self.probes = 0
+            logger.info(f"Breaker {self.name}: half-open, probing")
+        if self.probes < self.half_open_probes:
+            self.probes += 1
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logger.info(f"Breaker {self.name}: closed")
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = self.base_cooldown
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN:
+            # probe ব্যর্থ: কুলডাউন দ্বিগুণ করে আবার খোলা
+            self.cooldown = min(self.cooldown * 2, self.max_cooldown)
+            self._open()
+        elif self.state == CLOSED and self.failures >= self.failure_threshold:
+            self._open()
+
+    def release_probe(self) -> None:
+        """ফলাফল ছাড়াই শেষ হওয়া probe (যেমন বাতিল) এর স্লট ফেরত দেওয়া"""
+        if self.state == HALF_OPEN and self.probes:
+            self.probes -= 1
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.trips += 1
+        logger.warning(f"Breaker {self.name}: open for {self.cooldown:.0f}s after {self.failures} failures")
+
+    def retry_in(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+class AIMDLimiter:
+    """ল্যাটেন্সি ও 429 অনুযায়ী additive-increase / multiplicative-decrease concurrency সীমা"""
+    def __init__(self, initial: float, minimum: float, maximum: float,
+                 latency_target: float, decrease_factor: float = 0.5):
+        self.limit = float(initial)
+        self.minimum = float(minimum)
+        self.maximum = float(maximum)
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.inflight = 0
+        self.shed = 0
+        self._cond: Optional[asyncio.Condition] = None
+        self._loop = None
+
+    def _condition(self) -> asyncio.Condition:
+        # চলমান event loop এর জন্য তৈরি (import এর সময় নয়)
+        loop = asyncio.get_running_loop()
+        if self._cond is None or self._loop is not loop:
+            self._cond = asyncio.Condition()
+            self._loop = loop
+        return self._cond
+
+    async def acquire(self, wait: float) -> bool:
+        """সীমার মধ্যে স্লট পাওয়া গেলে True; wait সেকেন্ডে না পেলে False"""
+        cond = self._condition()
+        async with cond:
+            try:
+                await asyncio.wait_for(cond.wait_for(lambda: self.inflight < int(self.limit)), wait)
+            except asyncio.TimeoutError:
+                self.shed += 1
+                return False
+            self.inflight += 1
+            return True
+
+    async def release(self) -> None:
+        cond = self._condition()
+        async with cond:
+            self.inflight -= 1
+            cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self.on_overload()
+        else:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+    def on_overload(self) -> None:
+        self.limit = max(self.minimum, self.limit * self.decrease_factor)
+
+def backoff_delay(attempt: int, base: float, cap: float, retry_after: Optional[float] = None) -> float:
+    """full-jitter exponential backoff; Retry-After থাকলে তার চেয়ে কম অপেক্ষা নয়"""
+    delay = random.uniform(0, min(cap, base * (2 ** attempt)))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, base)
+    return delay
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After হেডার (সেকেন্ড) পার্স করা"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+def snapshot(breaker: CircuitBreaker, limiter: AIMDLimiter) -> Dict[str, Any]:
+    return {'state': breaker.state, 'retry_in': round(breaker.retry_in(), 1), 'trips': breaker.trips,
+            'rejected': breaker.rejected, 'limit': round(limiter.limit, 2), 'inflight': limiter.inflight,
+            'shed': limiter.shed}
@@ -0,0 +1,183 @@
+# reviews.py - অ্যাডমিন ম্যাচ রিভিউ পাইপলাইন
+# প্রতিটি অ্যাডমিন একটি মাত্র "রিভিউ কার্ড" পায় (স্ক্রিনশট + বাটন), নতুন রিভিউ এলে
+# কার্ডটি এডিট হয়। স্ক্রিনশট সবসময় file_id দিয়ে পাঠানো হয়, ডাউনলোড করা হয় না।
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional, Any
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, InputMediaPhoto
+from telegram.error import BadRequest
+import config
+import db
+import outbound
+
+logger = logging.getLogger(__name__)
+
+def _caption(match: Dict[str, Any], side: int, pos: int, total: int) -> str:
+    return (f"🧾 Match #{match['match_id']} Review ({pos}/{total})\n"
+            f"Fee: {match['fee']} TK\n"
+            f"দেখানো হচ্ছে: Player {side} স্ক্রিনশট")
+
+def _keyboard(match: Dict[str, Any], side: int, pending: List[Dict[str, Any]], pos: int) -> InlineKeyboardMarkup:
+    mid = match['match_id']
+    other = 2 if side == 1 else 1
+    kb = [[InlineKeyboardButton(f"🖼 Player {other}", callback_data=f"rv_show_{mid}_{other}")],
+          [InlineKeyboardButton("P1 Win", callback_data=f"admin_res_{mid}_{match['player1_id']}"),
+           InlineKeyboardButton("P2 Win", callback_data=f"admin_res_{mid}_{match['player2_id']}")]]
+    nav = []
+    if pos > 1:
+        nav.append(InlineKeyboardButton("◀", callback_data=f"rv_show_{pending[pos - 2]['match_id']}_1"))
+    if pos < len(pending):
+        nav.append(InlineKeyboardButton("▶", callback_data=f"rv_show_{pending[pos]['match_id']}_1"))
+    if nav:
+        kb.append(nav)
+    return InlineKeyboardMarkup(kb)
+
+class ReviewBoard:
+    """প্রতি অ্যাডমিনের জন্য একটি পেজড রিভিউ কার্ড
+
+    কার্ডের অবস্থান settings টেবিলে রাখা হয়, তাই webhook মোডে যে worker
+    প্রসেসই নোটিফিকেশন পাঠাক, সবাই একই কার্ড এডিট করে। প্রসেসের ভেতরে প্রতিটি
+    অপারেশন একটি lock এ চলে (load -> Bot API -> save এর মাঝে অন্যটি self.cards বদলায় না);
+    সেভ করার সময় একটি ট্রানজ্যাকশনে সেটিং আবার পড়ে শুধু এই অপারেশনে ছোঁয়া অ্যাডমিনদের
+    কার্ড বসানো হয়, যাতে অন্য প্রসেসের একই সময়ের পরিবর্তন মুছে না যায়।
+    """
+    SETTINGS_KEY = 'review_cards'
+
+    def __init__(self):
+        # admin_id -> {'message_id', 'match_id', 'side'}
+        self.cards: Dict[int, Dict[str, Any]] = {}
+        self.api_calls = 0
+        self._lock = asyncio.Lock()
+
+    @staticmethod
+    def _parse(raw: Optional[str]) -> Dict[int, Dict[str, Any]]:
+        try:
+            return {int(k): v for k, v in json.loads(raw).items()} if raw else {}
+        except (ValueError, AttributeError):
+            return {}
+
+    async def _load(self) -> None:
+        self.cards = self._parse(await db.get_setting(self.SETTINGS_KEY))
+
+    def _merge_sync(self, changes: Dict[int, Optional[Dict[str, Any]]]) -> None:
+        """সেটিং পড়া, ছোঁয়া অ্যাডমিনদের কার্ড বসানো/মুছা ও লেখা একই ট্রানজ্যাকশনে"""
+        try:
+            with db.transaction() as c:
+                c.execute("SELECT value FROM settings WHERE key=?", (self.SETTINGS_KEY,))
+                row = c.fetchone()
+                cards = self._parse(row[0] if row else None)
+                for admin_id, card in changes.items():
+                    if card is None:
+                        cards.pop(admin_id, None)
+                    else:
+                        cards[admin_id] = card
+                c.execute("INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)",
+                          (self.SETTINGS_KEY, json.dumps(cards)))
+        except Exception as e:
+            logger.error(f"Review card save error: {e}")
+
+    async def _save(self, admins) -> None:
+        await db.run_db(self._merge_sync, {a: self.cards.get(a) for a in admins})
+
+    async def _send_card(self, bot, admin_id: int, pending: List[Dict[str, Any]], idx: int = 0, side: int = 1) -> None:
+        match = pending[idx]
+        fid = match['p1_screenshot_id'] if side == 1 else match['p2_screenshot_id']
+        self.api_calls += 1
+        msg = await bot.send_photo(admin_id, fid, caption=_caption(match, side, idx + 1, len(pending)),
+                                   reply_markup=_keyboard(match, side, pending, idx + 1))
+        self.cards[admin_id] = {'message_id': msg.message_id, 'match_id': match['match_id'], 'side': side}
+
+    async def _render(self, bot, admin_id: int, pending: List[Dict[str, Any]],
+                      match_id: Optional[str] = None, side: int = 1) -> None:
+        """কার্ডটি নির্দিষ্ট ম্যাচে সেট করা (শুধু এডিট, নতুন মেসেজ নয়)"""
+        card = self.cards.get(admin_id)
+        if not pending:
+            if card:
+                self.cards.pop(admin_id, None)
+                self.api_calls += 1
+                await bot.edit_message_caption(admin_id, card['message_id'], caption="✅ কোনো রিভিউ বাকি নেই।")
+            return
+        if not card:
+            return await self._send_card(bot, admin_id, pending, 0, side)
+
+        ids = [m['match_id'] for m in pending]
+        target = match_id or card['match_id']
+        idx = ids.index(target) if target in ids else 0
+        match = pending[idx]
+        caption = _caption(match, side, idx + 1, len(pending))
+        markup = _keyboard(match, side, pending, idx + 1)
+        try:
+            self.api_calls += 1
+            if match['match_id'] == card['match_id'] and side == card['side']:
+                # একই ছবি: শুধু ক্যাপশন (কাউন্টার) আপডেট
+                await bot.edit_message_caption(admin_id, card['message_id'], caption=caption, reply_markup=markup)
+            else:
+                fid = match['p1_screenshot_id'] if side == 1 else match['p2_screenshot_id']
+                await bot.edit_message_media(InputMediaPhoto(fid, caption=caption), admin_id,
+                                             card['message_id'], reply_markup=markup)
+            card.update(match_id=match['match_id'], side=side)
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                return
+            # কার্ড মুছে ফেলা হয়েছে বা এডিট করা যাচ্ছে না - নতুন কার্ড পাঠানো
+            logger.warning(f"Review card for admin {admin_id} lost ({e}), sending a new one")
+            self.cards.pop(admin_id, None)
+            await self._send_card(bot, admin_id, pending, idx, side)
+
+    async def _fan_out(self, coros) -> None:
+        results = await asyncio.gather(*coros, return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception):
+                logger.warning(f"Review notification failed: {r}")
+
+    async def notify_new(self, bot) -> None:
+        """নতুন রিভিউ: সব অ্যাডমিনকে একসাথে (প্রতি অ্যাডমিন একটি কল)"""
+        async with self._lock:
+            await self._load()
+            pending = await db.get_pending_reviews()
+            with outbound.priority(outbound.ADMIN):
+                await self._fan_out([self._render(bot, a, pending) for a in config.ADMINS])
+            await self._save(config.ADMINS)
+
+    async def show(self, bot, admin_id: int, match_id: str, side: int) -> None:
+        """অ্যাডমিন কার্ডে অন্য ম্যাচ/স্ক্রিনশট দেখতে চাইলে"""
+        async with self._lock:
+            await self._load()
+            pending = await db.get_pending_reviews()
+            await self._render(bot, admin_id, pending, match_id, side)
+            await self._save([admin_id])
+
+    async def open(self, bot, admin_id: int) -> bool:
+        """/reviews: নতুন কার্ড খোলা (পুরনো কার্ড থাকলে সেটি বাদ)"""
+        async with self._lock:
+            await self._load()
+            pending = await db.get_pending_reviews()
+            self.cards.pop(admin_id, None)
+            if pending:
+                await self._send_card(bot, admin_id, pending)
+            await self._save([admin_id])
+            return bool(pending)
+
+    async def after_resolve(self, bot, match_id: str) -> None:
+        """ম্যাচ রেজাল্ট হলে যাদের কার্ডে এটি ছিল তাদের পরেরটিতে নেওয়া"""
+        async with self._lock:
+            await self._load()
+            pending = await db.get_pending_reviews()
+            admins = list(self.cards)
+            coros = []
+            for admin_id in admins:
+                card = self.cards[admin_id]
+                target = None if card['match_id'] == match_id else card['match_id']
+                side = 1 if target is None else card['side']
+                coros.append(self._render(bot, admin_id, pending, target, side))
+            await self._fan_out(coros)
+            await self._save(admins)
+
+    async def card_message_id(self, admin_id: int) -> Optional[int]:
+        async with self._lock:
+            await self._load()
+            card = self.cards.get(admin_id)
+            return card['message_id'] if card else None
+
+board = ReviewBoard()
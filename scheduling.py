@@ -0,0 +1,196 @@
+# scheduling.py - ইউজার-ভিত্তিক ক্রম বজায় রেখে আপডেটের সমান্তরাল প্রসেসিং
+# ভিন্ন ইউজারের আপডেট একসাথে চলে; একই ইউজারের আপডেট আসার ক্রমে একটির পর একটি চলে,
+# কারণ স্টেট মেশিন (awaiting_ign -> awaiting_phone ...) ক্রমের উপর নির্ভর করে।
+# হ্যান্ডলারে পাঠানোর আগে admission.controller নিচু অগ্রাধিকারের আপডেট বাদ/সীমিত করে।
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from typing import Any, Awaitable, Dict, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+import admission
+import config
+
+logger = logging.getLogger(__name__)
+
+# BaseUpdateProcessor এর নিজস্ব semaphore শুধু মোট ট্র্যাক করা আপডেটের সীমা;
+# আসল সমান্তরালতার সীমা ইউজার-লক নেওয়ার পরে প্রয়োগ হয়, যাতে একই ইউজারের
+# অপেক্ষমাণ আপডেট গ্লোবাল স্লট আটকে না রাখে।
+MAX_TRACKED_UPDATES = 10_000
+
+class _Slot:
+    """চলমান হ্যান্ডলারের স্লট (হ্যান্ডলার একই task এ চলে, তাই contextvar দিয়ে দেখা যায়)"""
+    __slots__ = ('processor', 'held', 'low')
+
+    def __init__(self, processor: 'UserOrderedUpdateProcessor', low: bool):
+        self.processor = processor
+        self.held = False
+        self.low = low
+
+_current_slot: contextvars.ContextVar[Optional[_Slot]] = contextvars.ContextVar('update_slot', default=None)
+
+@contextlib.asynccontextmanager
+async def low_priority():
+    """হ্যান্ডলারের বাকি অংশ নিচু অগ্রাধিকারে (classify যা ধরতে পারে না, যেমন AI fallback)
+
+    গ্লোবাল স্লট ছেড়ে low স্লট নিয়ে আবার গ্লোবাল স্লট নেয় - _run এর একই ক্রম, যাতে low স্লটের
+    জন্য অপেক্ষারত আপডেট গ্লোবাল স্লট আটকে ডেডলক না করে। প্রসেসরের বাইরে (বা আগেই low হলে) কিছু করে না।
+    """
+    slot = _current_slot.get()
+    if slot is None or slot.low or not slot.held:
+        yield
+        return
+    proc = slot.processor
+    proc._slots.release()
+    slot.held = False
+    proc.running -= 1
+    proc.waiting_slot += 1
+    try:
+        await proc._low_slots.acquire()
+        try:
+            await proc._slots.acquire()
+        except BaseException:
+            proc._low_slots.release()
+            raise
+    finally:
+        proc.waiting_slot -= 1
+    slot.held = True
+    proc.running += 1
+    try:
+        yield
+    finally:
+        proc._low_slots.release()
+
+def update_key(update: object) -> Optional[int]:
+    """কোন ইউজারের ক্রমে আপডেটটি চলবে"""
+    if isinstance(update, Update):
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+    return None
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """প্রতি ইউজারে ক্রমিক, ইউজারদের মধ্যে সমান্তরাল আপডেট প্রসেসর"""
+    def __init__(self, max_concurrent: int):
+        super().__init__(MAX_TRACKED_UPDATES)
+        self.limit = max(1, max_concurrent)
+        self._slots = asyncio.BoundedSemaphore(self.limit)
+        # নিচু অগ্রাধিকারের আপডেট সব স্লট দখল করতে পারে না; বাকিগুলো এখানে অপেক্ষা করে
+        self._low_slots = asyncio.BoundedSemaphore(max(1, min(self.limit, config.ADMISSION_LOW_CONCURRENCY)))
+        self._user_locks: Dict[int, asyncio.Lock] = {}
+        self._user_depth: Dict[int, int] = {}
+        self.pending = 0
+        self.running = 0
+        self.waiting_slot = 0
+        self.processed = 0
+        self.shed = 0
+        self.max_user_depth = 0
+        self.total_wait = 0.0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def _run(self, coroutine: Awaitable[Any], queued_at: float, low: bool) -> float:
+        """স্লট পেলে হ্যান্ডলার চালানো; স্লট পাওয়া পর্যন্ত অপেক্ষার সময় ফেরত"""
+        self.waiting_slot += 1
+        try:
+            if low:
+                await self._low_slots.acquire()
+            try:
+                await self._slots.acquire()
+            except BaseException:
+                if low:
+                    self._low_slots.release()
+                raise
+        finally:
+            self.waiting_slot -= 1
+            self.pending -= 1
+        slot = _Slot(self, low)
+        slot.held = True
+        self.running += 1
+        wait = time.monotonic() - queued_at
+        self.total_wait += wait
+        token = _current_slot.set(slot)
+        try:
+            await coroutine
+        finally:
+            _current_slot.reset(token)
+            self.processed += 1
+            if slot.held:  # low_priority() এর অপেক্ষায় বাতিল হলে স্লট আগেই ছাড়া
+                slot.held = False
+                self.running -= 1
+                self._slots.release()
+            if low:
+                self._low_slots.release()
+        return wait
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        queued_at = time.monotonic()
+        ctl = admission.controller
+        ctl.enter()
+        kind = admission.classify(update)
+        if kind and not ctl.admit(kind):
+            coroutine.close()  # হ্যান্ডলার শুরুই হয় না
+            self.shed += 1
+            try:
+                await admission.reply_busy(update)
+            finally:
+                ctl.leave(None)
+            return
+        # ওভারলোডের মাপ কিউ/স্লটের অপেক্ষা, হ্যান্ডলারের মোট সময় নয়: ধীর বাইরের API (AI স্ট্রিম)
+        # নিজে ওভারলোড নয়, আর তার জন্য প্রোফাইল/লিডারবোর্ড বাদ পড়া উচিত নয়
+        wait = None
+        try:
+            wait = await self._ordered(update, coroutine, queued_at, kind is not None)
+        finally:
+            ctl.leave(wait)
+
+    async def _ordered(self, update: object, coroutine: Awaitable[Any], queued_at: float, low: bool) -> float:
+        self.pending += 1
+        key = update_key(update)
+        if key is None:
+            return await self._run(coroutine, queued_at, low)
+
+        lock = self._user_locks.get(key)
+        if lock is None:
+            lock = self._user_locks[key] = asyncio.Lock()
+        depth = self._user_depth.get(key, 0) + 1
+        self._user_depth[key] = depth
+        self.max_user_depth = max(self.max_user_depth, depth)
+        started = False
+        try:
+            async with lock:  # asyncio.Lock FIFO, তাই আসার ক্রম বজায় থাকে
+                started = True  # এখান থেকে pending কমানো _run এর দায়িত্ব
+                return await self._run(coroutine, queued_at, low)
+        finally:
+            if not started:
+                # ইউজার-লকের অপেক্ষায় বাতিল: _run শুরুই হয়নি
+                self.pending -= 1
+                coroutine.close()
+            depth = self._user_depth[key] - 1
+            if depth:
+                self._user_depth[key] = depth
+            else:
+                del self._user_depth[key]
+                self._user_locks.pop(key, None)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """কিউ-ডেপথ মেট্রিক্স"""
+        return {
+            'limit': self.limit,
+            'running': self.running,
+            'queued': self.pending,
+            'waiting_slot': self.waiting_slot,
+            'active_users': len(self._user_depth),
+            'deepest_user_queue': max(self._user_depth.values(), default=0),
+            'max_user_depth_seen': self.max_user_depth,
+            'processed': self.processed,
+            'shed': self.shed,
+            'avg_wait_ms': round(self.total_wait / self.processed * 1000, 1) if self.processed else 0.0,
+        }
@@ -0,0 +1,314 @@
+# storage.py - বটের মূল ডাটার (ইউজার, কিউ, ম্যাচ, লেজার, সেটিংস) বদলযোগ্য স্টোরেজ ব্যাকএন্ড
+# db.py এর async API (db.get_user, db.match_or_enqueue ...) এখন db.backend() এর মাধ্যমে চলে:
+#   - SQLiteStorage: বর্তমান db.*_sync ফাংশনগুলো (ডিফল্ট)
+#   - MemoryStorage: একই আচরণের dict ভিত্তিক ইঞ্জিন, ডিস্ক I/O ছাড়া (bench_handlers.py ও
+#     conformance.py db.set_backend দিয়ে বসায়)। শুধু এক প্রসেসে চলে এবং বন্ধ করলে সব ডাটা হারায়।
+# রিভিউ, টুর্নামেন্ট, রেফারেল, ডিপোজিট, FAQ, লবি/রিপার, ম্যাচ টাইমআউট ও ব্যাকআপ নিজস্ব SQL চালায়
+# (MemoryStorage এ resolve hook ও চলে না), তাই বট নিজে STORAGE_BACKEND=sqlite ছাড়া চালু হয় না।
+# দুটো ব্যাকএন্ডের আচরণ মিলছে কিনা conformance.py যাচাই করে।
+import bisect
+import itertools
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+import config
+import db
+import rating
+from records import HistoryRow, LeaderRow, MatchRow, QueueRow, UserRow
+
+logger = logging.getLogger(__name__)
+
+class Storage(ABC):
+    """স্টোরেজ ইন্টারফেস; মেথডগুলো sync (db.run_db দিয়ে executor এ চলে, inline হলে সরাসরি)
+
+    ত্রুটিতে db.py এর মতোই লগ করে None/False/খালি মান ফেরত দেয়, exception তোলে না।
+    """
+    name = 'abstract'
+    inline = False  # True হলে event loop থেকে সরাসরি ডাকা যায় (ব্লক করে না)
+
+    # --- Users ---
+    @abstractmethod
+    def get_user(self, uid: int) -> Optional[UserRow]: ...
+    @abstractmethod
+    def create_user(self, uid: int, name: str, ref: Optional[int]) -> None: ...
+    @abstractmethod
+    def update_user_fields(self, uid: int, data: Dict[str, Any]) -> None: ...
+    @abstractmethod
+    def get_all_ids(self) -> List[int]: ...
+    @abstractmethod
+    def get_top_wins(self, limit: int) -> List[LeaderRow]: ...
+    @abstractmethod
+    def total_users(self) -> int: ...
+
+    # --- Ledger ---
+    @abstractmethod
+    def adjust_balance(self, uid: int, amt: float, type: str, note: str = '') -> None: ...
+    @abstractmethod
+    def get_ledger(self, uid: int, limit: int) -> List[Dict[str, Any]]: ...
+
+    # --- Queue ---
+    @abstractmethod
+    def match_or_enqueue(self, uid: int, fee: float) -> Tuple[Optional[QueueRow], Optional[str], bool]: ...
+    @abstractmethod
+    def find_opponent(self, fee: float, exc_uid: int) -> Optional[QueueRow]: ...
+    @abstractmethod
+    def add_to_queue(self, uid: int, fee: float, mid: int) -> None: ...
+    @abstractmethod
+    def remove_from_queue(self, uid: int) -> None: ...
+
+    # --- Matches ---
+    @abstractmethod
+    def create_match(self, p1: int, p2: int, fee: float) -> Optional[str]: ...
+    @abstractmethod
+    def get_match(self, mid: str) -> Optional[MatchRow]: ...
+    @abstractmethod
+    def set_room_code(self, mid: str, code: str) -> None: ...
+    @abstractmethod
+    def submit_screenshot(self, mid: str, uid: int, fid: str) -> Optional[MatchRow]: ...
+    @abstractmethod
+    def resolve_match(self, mid: str, wid: int) -> bool: ...
+    @abstractmethod
+    def cancel_match(self, mid: str) -> None: ...
+    @abstractmethod
+    def total_matches(self) -> int: ...
+    @abstractmethod
+    def get_history(self, uid: int, offset: int, limit: int) -> List[HistoryRow]: ...
+
+    # --- Settings ---
+    @abstractmethod
+    def get_setting(self, key: str) -> Optional[str]: ...
+    @abstractmethod
+    def set_setting(self, key: str, value: str) -> None: ...
+
+class SQLiteStorage(Storage):
+    """বর্তমান SQLite ইমপ্লিমেন্টেশন (db.py এর *_sync ফাংশন)"""
+    name = 'sqlite'
+
+    get_user = staticmethod(db.get_user_sync)
+    create_user = staticmethod(db.create_user_sync)
+    update_user_fields = staticmethod(db.update_user_fields_sync)
+    get_all_ids = staticmethod(db.get_all_ids_sync)
+    get_top_wins = staticmethod(db.get_top_wins_sync)
+    total_users = staticmethod(db.get_total_users_sync)
+    adjust_balance = staticmethod(db.adjust_balance_sync)
+    get_ledger = staticmethod(db.get_ledger_sync)
+    match_or_enqueue = staticmethod(db.match_or_enqueue_sync)
+    find_opponent = staticmethod(db.find_opp_sync)
+    add_to_queue = staticmethod(db.add_queue_sync)
+    remove_from_queue = staticmethod(db.rem_queue_sync)
+    create_match = staticmethod(db.create_match_sync)
+    get_match = staticmethod(db.get_match_sync)
+    set_room_code = staticmethod(db.set_room_code_sync)
+    submit_screenshot = staticmethod(db.submit_ss_sync)
+    resolve_match = staticmethod(db.resolve_match_sync)
+    cancel_match = staticmethod(db.cancel_match_sync)
+    total_matches = staticmethod(db.get_total_matches_sync)
+    get_history = staticmethod(db.get_history_sync)
+    get_setting = staticmethod(db.get_setting_sync)
+    set_setting = staticmethod(db.set_setting_sync)
+
+# users টেবিলের সব কলাম ও ডিফল্ট (UserRow এ নেই এমন কলামও update_user_fields দিয়ে লেখা যায়)
+_USER_DEFAULTS = {'user_id': None, 'ingame_name': None, 'phone_number': None, 'is_registered': 0,
+                  'balance': 0.0, 'welcome_given': 0, 'wins': 0, 'losses': 0, 'created_at': None,
+                  'state': None, 'state_data': None, 'referrer_id': None, 'elo_rating': 1000,
+                  'is_banned': 0, 'current_streak': 0, 'best_streak': 0}
+
+class MemoryStorage(Storage):
+    """dict ভিত্তিক ইঞ্জিন; প্রতিটি অপারেশন একটি লকের ভেতরে, তাই SQLite ট্রানজ্যাকশনের মতো পরমাণবিক"""
+    name = 'memory'
+    inline = True
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.users: Dict[int, Dict[str, Any]] = {}
+        self.queue: Dict[int, Dict[str, Any]] = {}  # user_id -> queue সারি
+        self.matches: Dict[str, Dict[str, Any]] = {}
+        self.ledger: List[Dict[str, Any]] = []
+        self.settings: Dict[str, str] = {}
+        # user_id -> (played_at, match_id, সারি) পুরনো থেকে নতুন ক্রমে, SQLite এর primary key এর মতো
+        self.history: Dict[int, List[Tuple[int, str, Tuple[Any, ...]]]] = {}
+        self._ledger_ids = itertools.count(1)
+
+    @staticmethod
+    def _user_row(u: Dict[str, Any]) -> UserRow:
+        return UserRow(*(u[c] for c in UserRow.COLUMNS))
+
+    # --- Users ---
+    def get_user(self, uid: int) -> Optional[UserRow]:
+        with self._lock:
+            u = self.users.get(uid)
+            return self._user_row(u) if u else None
+
+    def create_user(self, uid: int, name: str, ref: Optional[int]) -> None:
+        with self._lock:
+            if uid in self.users:
+                return
+            u = dict(_USER_DEFAULTS, user_id=uid, ingame_name=name, created_at=datetime.now())
+            # রেফারার শুধু নতুন ইউজারে এবং বিদ্যমান অন্য ইউজার হলে
+            if ref and ref != uid and ref in self.users:
+                u['referrer_id'] = ref
+            self.users[uid] = u
+
+    def update_user_fields(self, uid: int, data: Dict[str, Any]) -> None:
+        with self._lock:
+            unknown = set(data) - set(_USER_DEFAULTS)
+            if unknown:
+                logger.error(f"update_user_fields error: no such column: {', '.join(sorted(unknown))}")
+                return
+            u = self.users.get(uid)
+            if u:
+                u.update(data)
+
+    def get_all_ids(self) -> List[int]:
+        with self._lock:
+            return sorted(uid for uid, u in self.users.items() if u['is_registered'] == 1)
+
+    def get_top_wins(self, limit: int) -> List[LeaderRow]:
+        with self._lock:
+            rows = sorted((u for u in self.users.values() if u['is_registered'] == 1),
+                          key=lambda u: (-(u['elo_rating'] or 0), u['user_id']))[:limit]
+            return [LeaderRow(u['ingame_name'], u['wins'], u['elo_rating']) for u in rows]
+
+    def total_users(self) -> int:
+        with self._lock:
+            return sum(1 for u in self.users.values() if u['is_registered'] == 1)
+
+    # --- Ledger ---
+    def adjust_balance(self, uid: int, amt: float, type: str, note: str = '') -> None:
+        with self._lock:
+            u = self.users.get(uid)
+            if u:
+                u['balance'] = (u['balance'] or 0) + amt
+            # SQLite এর মতোই: ইউজার না থাকলেও লেজার সারি লেখা হয়
+            self.ledger.append({'id': next(self._ledger_ids), 'user_id': uid, 'amount': amt, 'type': type,
+                                'note': note, 'created_at': int(time.time())})
+
+    def get_ledger(self, uid: int, limit: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = [dict(r) for r in reversed(self.ledger) if r['user_id'] == uid]
+            return rows[:limit]
+
+    # --- Queue ---
+    def _oldest_opponent(self, fee: float, exc_uid: int) -> Optional[Dict[str, Any]]:
+        cutoff = int(time.time()) - config.QUEUE_TTL
+        found = [q for q in self.queue.values()
+                 if q['fee'] == fee and q['joined_at'] >= cutoff and q['user_id'] != exc_uid]
+        return min(found, key=lambda q: (q['joined_at'], q['user_id'])) if found else None
+
+    def match_or_enqueue(self, uid: int, fee: float) -> Tuple[Optional[QueueRow], Optional[str], bool]:
+        with self._lock:
+            q = self._oldest_opponent(fee, uid)
+            if q:
+                opp = QueueRow(*(q[c] for c in QueueRow.COLUMNS))
+                self.queue.pop(opp.user_id, None)
+                self.queue.pop(uid, None)
+                return opp, self.create_match(uid, opp.user_id, fee), False
+            self.queue[uid] = {'user_id': uid, 'fee': fee, 'joined_at': int(time.time()), 'lobby_message_id': None}
+            return None, None, True
+
+    def find_opponent(self, fee: float, exc_uid: int) -> Optional[QueueRow]:
+        with self._lock:
+            q = self._oldest_opponent(fee, exc_uid)
+            return QueueRow(*(q[c] for c in QueueRow.COLUMNS)) if q else None
+
+    def add_to_queue(self, uid: int, fee: float, mid: int) -> None:
+        with self._lock:
+            self.queue[uid] = {'user_id': uid, 'fee': fee, 'joined_at': int(time.time()), 'lobby_message_id': mid}
+
+    def remove_from_queue(self, uid: int) -> None:
+        with self._lock:
+            self.queue.pop(uid, None)
+
+    # --- Matches ---
+    def create_match(self, p1: int, p2: int, fee: float) -> Optional[str]:
+        with self._lock:
+            mid = str(uuid.uuid4())[:8]
+            self.matches[mid] = {'match_id': mid, 'player1_id': p1, 'player2_id': p2, 'fee': fee,
+                                 'status': 'waiting_for_code', 'room_code': None, 'created_at': int(time.time()),
+                                 'p1_screenshot_id': None, 'p2_screenshot_id': None, 'winner_id': None}
+            return mid
+
+    def get_match(self, mid: str) -> Optional[MatchRow]:
+        with self._lock:
+            m = self.matches.get(mid)
+            return MatchRow(*(m[c] for c in MatchRow.COLUMNS)) if m else None
+
+    def set_room_code(self, mid: str, code: str) -> None:
+        with self._lock:
+            m = self.matches.get(mid)
+            if m:
+                m.update(room_code=code, status='in_progress')
+
+    def submit_screenshot(self, mid: str, uid: int, fid: str) -> Optional[MatchRow]:
+        with self._lock:
+            m = self.matches.get(mid)
+            if not m:
+                return None
+            m['p1_screenshot_id' if uid == m['player1_id'] else 'p2_screenshot_id'] = fid
+            return self.get_match(mid)
+
+    def resolve_match(self, mid: str, wid: int) -> bool:
+        with self._lock:
+            m = self.matches.get(mid)
+            if not m or m['status'] == 'completed':
+                return False
+            lid = m['player2_id'] if wid == m['player1_id'] else m['player1_id']
+            u1, u2 = self.users.get(wid), self.users.get(lid)
+            if not u1 or not u2:
+                return False
+            ks = rating.live_schedule()
+            r1, r2 = u1['elo_rating'], u2['elo_rating']
+            nr1 = rating.calculate_elo(r1, r2, 1, ks.k_for((u1['wins'] or 0) + (u1['losses'] or 0)))
+            nr2 = rating.calculate_elo(r2, r1, 0, ks.k_for((u2['wins'] or 0) + (u2['losses'] or 0)))
+            streak = max(u1['current_streak'], 0) + 1
+            u1.update(elo_rating=nr1, wins=u1['wins'] + 1, current_streak=streak,
+                      best_streak=max(u1['best_streak'], streak))
+            u2.update(elo_rating=nr2, losses=u2['losses'] + 1, current_streak=min(u2['current_streak'], 0) - 1)
+            now = int(time.time())
+            for uid, opp, won, before, after in ((wid, lid, 1, r1, nr1), (lid, wid, 0, r2, nr2)):
+                rows = self.history.setdefault(uid, [])
+                bisect.insort(rows, (now, mid, (opp, m['fee'], won, before, after)))
+            if m['fee'] > 0:
+                self.adjust_balance(wid, m['fee'] * 2 * 0.9, 'match_win')
+            m.update(status='completed', winner_id=wid)
+            return True
+
+    def cancel_match(self, mid: str) -> None:
+        with self._lock:
+            m = self.matches.get(mid)
+            if m:
+                m['status'] = 'cancelled'
+
+    def total_matches(self) -> int:
+        with self._lock:
+            return sum(1 for m in self.matches.values() if m['status'] == 'completed')
+
+    def get_history(self, uid: int, offset: int, limit: int) -> List[HistoryRow]:
+        with self._lock:
+            rows = self.history.get(uid, [])
+            end = len(rows) - offset
+            out = []
+            for played_at, mid, (opp, fee, won, before, after) in reversed(rows[max(end - limit, 0):max(end, 0)]):
+                name = self.users[opp]['ingame_name'] if opp in self.users else None
+                out.append(HistoryRow(mid, played_at, opp, name, fee, won, before, after))
+            return out
+
+    # --- Settings ---
+    def get_setting(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self.settings.get(key)
+
+    def set_setting(self, key: str, value: str) -> None:
+        with self._lock:
+            self.settings[key] = value
+
+BACKENDS = {SQLiteStorage.name: SQLiteStorage, MemoryStorage.name: MemoryStorage}
+
+def create(name: str) -> Storage:
+    if name not in BACKENDS:
+        raise ValueError(f"unknown storage backend {name!r} (choose from {', '.join(BACKENDS)})")
+    return BACKENDS[name]()
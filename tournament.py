@@ -0,0 +1,309 @@
+# tournament.py - টুর্নামেন্ট ইঞ্জিন (single elimination ও Swiss)
+# প্রতিটি রাউন্ডের ম্যাচ সাধারণ 1v1 পাইপলাইনের active_matches এ এক ট্রানজ্যাকশনে তৈরি হয়।
+# resolve_match_sync এর হুক থেকে রাউন্ড শেষ হওয়া ধরা পড়ে এবং পরের রাউন্ড তৈরি হয়;
+# খেলোয়াড়দের নোটিফিকেশন deliver_events() দিয়ে পাঠানো হয়; ইভেন্ট জমা হয় শুধু ট্রানজ্যাকশন
+# কমিট হওয়ার পরে (db.after_commit), যাতে রোলব্যাক হওয়া রাউন্ড/ফলাফলের নোটিফিকেশন না যায়।
+import asyncio
+import logging
+import time
+import uuid
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+import config
+import db
+import outbound
+
+logger = logging.getLogger(__name__)
+
+SINGLE = 'single'
+SWISS = 'swiss'
+FORMATS = (SINGLE, SWISS)
+
+# হুক (executor থ্রেড) থেকে bot এর কাছে পাঠানোর ইভেন্ট
+_events: Deque[Dict[str, Any]] = deque()
+
+# --- Pairing ---
+def bracket_order(size: int) -> List[int]:
+    """স্ট্যান্ডার্ড ব্র্যাকেট সিড ক্রম, যেমন 8 -> [1, 8, 4, 5, 2, 7, 3, 6]"""
+    order = [1]
+    while len(order) < size:
+        n = len(order) * 2
+        order = [x for s in order for x in (s, n + 1 - s)]
+    return order
+
+def seed_pairs(seeded: List[int]) -> List[Tuple[int, Optional[int]]]:
+    """সিড অনুযায়ী প্রথম রাউন্ডের জোড়া; ২ এর ঘাত না হলে উপরের সিডরা bye পায়"""
+    n = len(seeded)
+    size = 1 << (n - 1).bit_length()
+    order = bracket_order(size)
+    pairs = []
+    for i in range(0, size, 2):
+        a, b = order[i], order[i + 1]
+        pa = seeded[a - 1] if a <= n else None
+        pb = seeded[b - 1] if b <= n else None
+        if pa is None:
+            pa, pb = pb, None
+        pairs.append((pa, pb))
+    return pairs
+
+def swiss_pairs(standings: List[Tuple[int, float, int, int]],
+                played: Set[frozenset]) -> Tuple[List[Tuple[int, int]], Optional[int]]:
+    """Swiss জোড়া: (user_id, score, seed, had_bye) থেকে একই স্কোরের কাছাকাছি, আগে না খেলা প্রতিপক্ষ"""
+    order = sorted(standings, key=lambda p: (-p[1], p[2]))
+    bye = None
+    if len(order) % 2:
+        for i in range(len(order) - 1, -1, -1):
+            if not order[i][3]:
+                bye = order.pop(i)[0]
+                break
+        else:
+            bye = order.pop()[0]
+
+    pool = [p[0] for p in order]
+    pairs = []
+    while pool:
+        a = pool.pop(0)
+        pick = 0
+        for j, b in enumerate(pool):
+            if frozenset((a, b)) not in played:
+                pick = j
+                break
+        pairs.append((a, pool.pop(pick)))
+    return pairs, bye
+
+# --- DB Helpers (ট্রানজ্যাকশনের ভেতরে ডাকা হয়) ---
+def _get(c, tid: int) -> Optional[Dict[str, Any]]:
+    c.execute("SELECT * FROM tournaments WHERE id=?", (tid,))
+    r = c.fetchone()
+    return dict(r) if r else None
+
+def _create_round(c, t: Dict[str, Any], rnd: int, pairs: Iterable[Tuple[int, Optional[int]]]) -> Dict[str, Any]:
+    """একটি রাউন্ডের সব ম্যাচ ও bye বাল্ক ইনসার্ট; নোটিফিকেশন ইভেন্ট ফেরত"""
+    now = int(time.time())
+    matches, rows, byes = [], [], []
+    for slot, (p1, p2) in enumerate(pairs):
+        if p2 is None:
+            rows.append((t['id'], rnd, slot, None, p1, None, p1))
+            byes.append(p1)
+            continue
+        mid = str(uuid.uuid4())[:8]
+        matches.append((mid, p1, p2, 0, 'waiting_for_code', now))
+        rows.append((t['id'], rnd, slot, mid, p1, p2, None))
+    c.executemany('INSERT INTO active_matches(match_id, player1_id, player2_id, fee, status, created_at) VALUES(?,?,?,?,?,?)',
+                  matches)
+    c.executemany('''INSERT INTO tournament_matches(tournament_id, round, slot, match_id, player1_id, player2_id, winner_id)
+                     VALUES(?,?,?,?,?,?,?)''', rows)
+    if byes and t['format'] == SWISS:
+        c.executemany("UPDATE tournament_players SET score=score+1, had_bye=1 WHERE tournament_id=? AND user_id=?",
+                      [(t['id'], u) for u in byes])
+    c.execute("UPDATE tournaments SET current_round=?, status='running' WHERE id=?", (rnd, t['id']))
+    return {'kind': 'round', 'tournament_id': t['id'], 'name': t['name'], 'round': rnd,
+            'matches': [(m[0], m[1], m[2]) for m in matches], 'byes': byes}
+
+def _finish(c, t: Dict[str, Any], winner: int) -> Dict[str, Any]:
+    c.execute("SELECT COUNT(*) FROM tournament_players WHERE tournament_id=?", (t['id'],))
+    prize = round(t['entry_fee'] * c.fetchone()[0] * config.TOURNAMENT_PRIZE_SHARE, 2)
+    c.execute("UPDATE tournaments SET status='completed', winner_id=? WHERE id=?", (winner, t['id']))
+    if prize > 0:
+        db.adjust_balance_sync(winner, prize, 'tournament_prize', f"tournament {t['id']}")
+    return {'kind': 'finished', 'tournament_id': t['id'], 'name': t['name'], 'winner': winner, 'prize': prize}
+
+def _queue_event(ev: Dict[str, Any]) -> None:
+    """কমিটের পরে ইভেন্ট deliver_events এর জন্য জমা"""
+    db.after_commit(lambda: _events.append(ev))
+
+def _advance(c, t: Dict[str, Any]) -> Dict[str, Any]:
+    """রাউন্ড শেষ: পরের রাউন্ড তৈরি অথবা টুর্নামেন্ট শেষ"""
+    rnd = t['current_round']
+    if t['format'] == SINGLE:
+        c.execute("SELECT winner_id FROM tournament_matches WHERE tournament_id=? AND round=? ORDER BY slot",
+                  (t['id'], rnd))
+        winners = [r[0] for r in c.fetchall()]
+        if len(winners) == 1:
+            return _finish(c, t, winners[0])
+        return _create_round(c, t, rnd + 1, zip(winners[0::2], winners[1::2]))
+
+    c.execute("SELECT user_id, score, seed, had_bye FROM tournament_players WHERE tournament_id=?", (t['id'],))
+    standings = [tuple(r) for r in c.fetchall()]
+    if rnd >= t['total_rounds']:
+        best = min(standings, key=lambda p: (-p[1], p[2]))
+        return _finish(c, t, best[0])
+    c.execute("SELECT player1_id, player2_id FROM tournament_matches WHERE tournament_id=? AND player2_id IS NOT NULL",
+              (t['id'],))
+    played = {frozenset(r) for r in c.fetchall()}
+    pairs, bye = swiss_pairs(standings, played)
+    if bye is not None:
+        pairs.append((bye, None))
+    return _create_round(c, t, rnd + 1, pairs)
+
+# --- Public API (sync) ---
+def create_sync(name: str, fmt: str, entry_fee: float = 0, rounds: int = 0) -> Optional[int]:
+    try:
+        with db.transaction() as c:
+            c.execute("INSERT INTO tournaments(name, format, entry_fee, total_rounds, created_at) VALUES(?,?,?,?,?)",
+                      (name, fmt, entry_fee, rounds, int(time.time())))
+            return c.lastrowid
+    except Exception as e:
+        logger.error(f"tournament create_sync error: {e}")
+        return None
+
+def join_sync(tid: int, uid: int) -> Tuple[bool, str]:
+    """রেজিস্ট্রেশন (এন্ট্রি ফি একই ট্রানজ্যাকশনে কাটা হয়)"""
+    try:
+        with db.transaction() as c:
+            t = _get(c, tid)
+            if not t or t['status'] != 'registration':
+                return False, "রেজিস্ট্রেশন খোলা নেই।"
+            c.execute("SELECT 1 FROM tournament_players WHERE tournament_id=? AND user_id=?", (tid, uid))
+            if c.fetchone():
+                return False, "আপনি আগেই রেজিস্টার করেছেন।"
+            if t['entry_fee'] > 0:
+                c.execute("SELECT balance FROM users WHERE user_id=?", (uid,))
+                r = c.fetchone()
+                if not r or (r[0] or 0) < t['entry_fee']:
+                    return False, "❌ অপর্যাপ্ত ব্যালেন্স।"
+                db.adjust_balance_sync(uid, -t['entry_fee'], 'tournament_entry', f"tournament {tid}")
+            c.execute("INSERT INTO tournament_players(tournament_id, user_id, joined_at) VALUES(?,?,?)",
+                      (tid, uid, int(time.time())))
+            return True, f"✅ '{t['name']}' টুর্নামেন্টে রেজিস্ট্রেশন সম্পন্ন।"
+    except Exception as e:
+        logger.error(f"tournament join_sync error: {e}")
+        return False, "একটি ত্রুটি ঘটেছে।"
+
+def start_sync(tid: int) -> Tuple[bool, str]:
+    """elo_rating অনুযায়ী সিডিং করে প্রথম রাউন্ড তৈরি"""
+    try:
+        with db.transaction() as c:
+            t = _get(c, tid)
+            if not t or t['status'] != 'registration':
+                return False, "টুর্নামেন্ট শুরু করা যাচ্ছে না।"
+            c.execute("""SELECT tp.user_id FROM tournament_players tp JOIN users u ON u.user_id = tp.user_id
+                         WHERE tp.tournament_id=? ORDER BY u.elo_rating DESC, tp.joined_at""", (tid,))
+            seeded = [r[0] for r in c.fetchall()]
+            if len(seeded) < 2:
+                return False, "কমপক্ষে ২ জন খেলোয়াড় লাগবে।"
+            c.executemany("UPDATE tournament_players SET seed=? WHERE tournament_id=? AND user_id=?",
+                          [(i + 1, tid, uid) for i, uid in enumerate(seeded)])
+            rounds = (len(seeded) - 1).bit_length()
+            if t['format'] == SWISS and t['total_rounds']:
+                rounds = t['total_rounds']
+            c.execute("UPDATE tournaments SET total_rounds=? WHERE id=?", (rounds, tid))
+            t['total_rounds'] = rounds
+            if t['format'] == SINGLE:
+                pairs = seed_pairs(seeded)
+            else:
+                standings = [(uid, 0, i + 1, 0) for i, uid in enumerate(seeded)]
+                pairs, bye = swiss_pairs(standings, set())
+                if bye is not None:
+                    pairs.append((bye, None))
+            _queue_event(_create_round(c, t, 1, pairs))
+            return True, f"✅ টুর্নামেন্ট শুরু: {len(seeded)} খেলোয়াড়, {rounds} রাউন্ড।"
+    except Exception as e:
+        logger.error(f"tournament start_sync error: {e}")
+        return False, "একটি ত্রুটি ঘটেছে।"
+
+def on_match_resolved_sync(mid: str, wid: int) -> None:
+    """db.resolve_match_sync হুক: টুর্নামেন্ট ম্যাচ হলে রেজাল্ট রেকর্ড ও রাউন্ড এগোনো"""
+    with db.transaction() as c:
+        c.execute("SELECT tournament_id, round, player1_id, player2_id FROM tournament_matches WHERE match_id=?", (mid,))
+        r = c.fetchone()
+        if not r:
+            return
+        tid, rnd, p1, p2 = r
+        loser = p2 if wid == p1 else p1
+        c.execute("UPDATE tournament_matches SET winner_id=? WHERE match_id=?", (wid, mid))
+        t = _get(c, tid)
+        if t['format'] == SINGLE:
+            c.execute("UPDATE tournament_players SET eliminated=1 WHERE tournament_id=? AND user_id=?", (tid, loser))
+        else:
+            c.execute("UPDATE tournament_players SET score=score+1 WHERE tournament_id=? AND user_id=?", (tid, wid))
+        c.execute("SELECT COUNT(*) FROM tournament_matches WHERE tournament_id=? AND round=? AND winner_id IS NULL",
+                  (tid, rnd))
+        if c.fetchone()[0] == 0 and t['status'] == 'running' and rnd == t['current_round']:
+            _queue_event(_advance(c, t))
+
+def list_open_sync() -> List[Dict[str, Any]]:
+    try:
+        c = db.get_read_conn().cursor()
+        c.execute("""SELECT t.id, t.name, t.format, t.status, t.entry_fee, t.current_round, t.total_rounds,
+                            (SELECT COUNT(*) FROM tournament_players tp WHERE tp.tournament_id = t.id) AS players
+                     FROM tournaments t WHERE t.status != 'completed' ORDER BY t.id""")
+        return [dict(r) for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"tournament list_open_sync error: {e}")
+        return []
+
+def standings_sync(tid: int, limit: int = 10) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    try:
+        c = db.get_read_conn().cursor()
+        t = _get(c, tid)
+        if not t:
+            return None, []
+        c.execute("""SELECT u.ingame_name, tp.score, tp.seed, tp.eliminated FROM tournament_players tp
+                     JOIN users u ON u.user_id = tp.user_id WHERE tp.tournament_id=?
+                     ORDER BY tp.eliminated, tp.score DESC, tp.seed LIMIT ?""", (tid, limit))
+        return t, [dict(r) for r in c.fetchall()]
+    except Exception as e:
+        logger.error(f"tournament standings_sync error: {e}")
+        return None, []
+
+db.add_resolve_hook(on_match_resolved_sync)
+
+# --- Async Wrappers ---
+async def create(name: str, fmt: str, entry_fee: float = 0, rounds: int = 0) -> Optional[int]:
+    return await db.run_db(create_sync, name, fmt, entry_fee, rounds)
+
+async def join(tid: int, uid: int) -> Tuple[bool, str]:
+    return await db.run_db(join_sync, tid, uid)
+
+async def start(tid: int) -> Tuple[bool, str]:
+    return await db.run_db(start_sync, tid)
+
+async def list_open() -> List[Dict[str, Any]]:
+    return await db.run_db(list_open_sync)
+
+async def standings(tid: int, limit: int = 10) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+    return await db.run_db(standings_sync, tid, limit)
+
+# --- Notifications ---
+def _set_states_sync(rows: List[Tuple[Optional[str], Optional[str], int]]) -> None:
+    try:
+        with db.transaction() as c:
+            c.executemany("UPDATE users SET state=?, state_data=? WHERE user_id=?", rows)
+    except Exception as e:
+        logger.error(f"tournament _set_states_sync error: {e}")
+
+def _names_sync(tid: int) -> Dict[int, str]:
+    c = db.get_read_conn().cursor()
+    c.execute("""SELECT tp.user_id, u.ingame_name FROM tournament_players tp
+                 JOIN users u ON u.user_id = tp.user_id WHERE tp.tournament_id=?""", (tid,))
+    return {r[0]: r[1] for r in c.fetchall()}
+
+async def _send_all(bot, messages: List[Tuple[int, str]]) -> None:
+    """চাঙ্কে ভাগ করে সমান্তরালে মেসেজ পাঠানো"""
+    chunk = config.TOURNAMENT_FANOUT_CHUNK
+    for i in range(0, len(messages), chunk):
+        results = await asyncio.gather(*(bot.send_message(uid, txt, rate_limit_args=outbound.MATCH)
+                                         for uid, txt in messages[i:i + chunk]),
+                                       return_exceptions=True)
+        for r in results:
+            if isinstance(r, Exception):
+                logger.warning(f"Tournament notification failed: {r}")
+
+async def deliver_events(bot) -> None:
+    """জমা থাকা রাউন্ড/ফলাফল ইভেন্ট খেলোয়াড়দের পাঠানো"""
+    while _events:
+        ev = _events.popleft()
+        names = await db.run_db(_names_sync, ev['tournament_id'])
+        if ev['kind'] == 'finished':
+            await _send_all(bot, [(a, f"🏆 '{ev['name']}' শেষ! বিজয়ী: {names.get(ev['winner'])}") for a in config.ADMINS]
+                            + [(ev['winner'], f"🏆 অভিনন্দন! আপনি '{ev['name']}' জিতেছেন। পুরস্কার: {ev['prize']} TK")])
+            continue
+        await db.run_db(_set_states_sync, [('awaiting_room_code', mid, p1) for mid, p1, _ in ev['matches']])
+        messages = []
+        head = f"🏆 {ev['name']} - Round {ev['round']}"
+        for mid, p1, p2 in ev['matches']:
+            messages.append((p1, f"{head}\nপ্রতিপক্ষ: {names.get(p2)}\nরুম কোড দিন।"))
+            messages.append((p2, f"{head}\nপ্রতিপক্ষ: {names.get(p1)}\nরুম কোডের জন্য অপেক্ষা করুন।"))
+        messages.extend((u, f"{head}\nএই রাউন্ডে আপনি bye পেয়েছেন, সরাসরি পরের রাউন্ডে।") for u in ev['byes'])
+        await _send_all(bot, messages)
@@ -5,6 +5,7 @@ import time
 from datetime import datetime, timedelta
 from typing import Dict, Tuple, Optional
 from functools import wraps
+import rating
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +42,14 @@ class RateLimiter:
                                   if now - t < self.window_seconds]
         return max(0, self.max_requests - len(self.requests[user_id]))
 
+    def prune(self) -> int:
+        """উইন্ডোর ভেতরে কোনো রিকোয়েস্ট নেই এমন ইউজার মুছে ফেলা (না হলে dict শুধু বাড়ে)"""
+        cutoff = time.time() - self.window_seconds
+        stale = [uid for uid, times in self.requests.items() if not times or times[-1] <= cutoff]
+        for uid in stale:
+            del self.requests[uid]
+        return len(stale)
+
 # গ্লোবাল রেট লিমিটার
 rate_limiter = RateLimiter(max_requests=10, window_seconds=30)
 
@@ -167,7 +176,5 @@ def is_within_hours(target_time: datetime, hours: int) -> bool:
 
 # --- ELO Calculation Helper ---
 def calculate_elo_gain(player_elo: int, opponent_elo: int, won: bool, k_factor: int = 32) -> int:
-    """ELO পয়েন্ট লাভ গণনা করুন"""
-    expected = 1 / (1 + 10**((opponent_elo - player_elo) / 400))
-    outcome = 1 if won else 0
-    return int(round(k_factor * (outcome - expected)))
+    """ELO পয়েন্ট লাভ গণনা করুন (rating.py এর শেয়ার্ড ইমপ্লিমেন্টেশন)"""
+    return int(round(rating.elo_delta(player_elo, opponent_elo, 1 if won else 0, k_factor)))
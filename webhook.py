@@ -0,0 +1,212 @@
+# webhook.py - Webhook মোড: লোকাল HTTP ফ্রন্ট + user_id অনুযায়ী শার্ড করা worker প্রসেস
+# প্রতিটি worker নিজস্ব event loop, Application এবং DB read pool চালায়। একই ইউজারের
+# সব আপডেট সবসময় একই worker এ যায়, তাই স্টেট মেশিনের ক্রম ঠিক থাকে। ওয়ালেট ও
+# ম্যাচমেকিং লেখা db.transaction() (BEGIN IMMEDIATE) দিয়ে প্রসেসগুলোর মধ্যে সিরিয়ালাইজ হয়।
+import asyncio
+import hmac
+import json
+import logging
+import multiprocessing
+import queue as queue_mod
+import secrets
+import signal
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import config
+
+logger = logging.getLogger(__name__)
+
+def shard_for(update: Dict[str, Any], workers: int) -> int:
+    """আপডেটের ইউজার আইডি থেকে worker নম্বর"""
+    for key, value in update.items():
+        if key == 'update_id' or not isinstance(value, dict):
+            continue
+        user = value.get('from') or value.get('user')
+        if user and 'id' in user:
+            return user['id'] % workers
+        chat = value.get('chat')
+        if chat and 'id' in chat:
+            return chat['id'] % workers
+    return 0
+
+# --- Worker Process ---
+async def _worker_loop(index: int, inbox, run_jobs: bool) -> None:
+    from telegram import Update
+    import bot
+
+    app = bot.build_application(polling=False, run_jobs=run_jobs)
+    bot.app_instance = app
+    # ব্লকিং queue.get এর জন্য আলাদা থ্রেড, যাতে DB executor আটকে না যায়
+    reader = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'inbox-{index}')
+    loop = asyncio.get_running_loop()
+    async with app:
+        await app.start()
+        # post_init শুধু run_polling এ চলে, তাই এখানে সরাসরি
+        bot.monitor.monitor.start(f'worker-{index}')
+        logger.info(f"Webhook worker {index} ready")
+        while True:
+            raw = await loop.run_in_executor(reader, inbox.get)
+            if raw is None:
+                break
+            try:
+                await app.update_queue.put(Update.de_json(json.loads(raw), app.bot))
+            except Exception as e:
+                logger.error(f"Worker {index} bad update: {e}")
+        await bot.monitor.monitor.stop()
+        await app.stop()
+        bot.deposits.validator.flush_alerts()  # ফ্রন্টের শেষ ব্যাকআপ শিপের আগে
+    reader.shutdown(wait=False)
+
+def _worker_main(index: int, inbox, run_jobs: bool) -> None:
+    """worker প্রসেসের এন্ট্রি পয়েন্ট (spawn)"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # শাটডাউন ফ্রন্ট নিয়ন্ত্রণ করে
+    asyncio.run(_worker_loop(index, inbox, run_jobs))
+
+# --- HTTP Front ---
+class WebhookFront:
+    """Telegram webhook গ্রহণ করে আপডেট worker দের কাছে পাঠায়"""
+    def __init__(self, workers: int, path: str = config.WEBHOOK_PATH, secret: str = config.WEBHOOK_SECRET):
+        self.workers = max(1, workers)
+        if not secret:
+            raise ValueError("webhook front needs a secret token")
+        self.path = '/' + path.strip('/')
+        self.secret = secret
+        self.inboxes: List[Any] = []
+        self.procs: List[multiprocessing.Process] = []
+        self.routed = [0] * self.workers
+        self.rejected = 0
+        self.unavailable = 0
+        self._dead_logged = set()
+
+    def start_workers(self) -> None:
+        ctx = multiprocessing.get_context('spawn')
+        for i in range(self.workers):
+            inbox = ctx.Queue(maxsize=config.WEBHOOK_INBOX_SIZE)
+            proc = ctx.Process(target=_worker_main, args=(i, inbox, i == 0), name=f'bot-worker-{i}', daemon=True)
+            proc.start()
+            self.inboxes.append(inbox)
+            self.procs.append(proc)
+        logger.info(f"Started {self.workers} webhook workers")
+
+    def stop_workers(self, timeout: float = 10) -> None:
+        for inbox in self.inboxes:
+            try:
+                inbox.put(None)
+            except (ValueError, OSError):
+                pass
+        for proc in self.procs:
+            proc.join(timeout)
+            if proc.is_alive():
+                proc.terminate()
+
+    def dispatch(self, method: str, path: str, headers: Dict[str, str], body: bytes) -> str:
+        """একটি HTTP রিকোয়েস্ট প্রসেস করে স্ট্যাটাস লাইন ফেরত দেয়"""
+        if method != 'POST' or path.split('?', 1)[0] != self.path:
+            return '404 Not Found'
+        token = headers.get('x-telegram-bot-api-secret-token', '')
+        if not hmac.compare_digest(token.encode(), self.secret.encode()):
+            self.rejected += 1
+            return '403 Forbidden'
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return '400 Bad Request'
+        shard = shard_for(update, self.workers)
+        if self.procs and not self.procs[shard].is_alive():
+            # মৃত worker এর কিউতে জমিয়ে রাখার বদলে Telegram কে পরে আবার পাঠাতে বলা
+            if shard not in self._dead_logged:
+                self._dead_logged.add(shard)
+                logger.error(f"Webhook worker {shard} is dead (exit code {self.procs[shard].exitcode}); "
+                             f"its updates get 503 until restart")
+            self.unavailable += 1
+            return '503 Service Unavailable'
+        try:
+            self.inboxes[shard].put_nowait(body)
+        except queue_mod.Full:
+            self.unavailable += 1
+            return '503 Service Unavailable'
+        self.routed[shard] += 1
+        return '200 OK'
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            if not request_line:
+                return
+            method, path, _ = request_line.decode('latin-1').split(' ', 2)
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                k, _, v = line.decode('latin-1').partition(':')
+                headers[k.strip().lower()] = v.strip()
+            length = int(headers.get('content-length', 0) or 0)
+            if length < 0 or length > config.WEBHOOK_MAX_BODY:
+                status = '413 Payload Too Large'
+            else:
+                body = await reader.readexactly(length) if length else b''
+                status = self.dispatch(method, path, headers, body)
+            writer.write(f'HTTP/1.1 {status}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n'.encode())
+            await writer.drain()
+        except (ValueError, asyncio.IncompleteReadError, ConnectionError) as e:
+            logger.warning(f"Webhook request error: {e}")
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = config.WEBHOOK_LISTEN, port: int = config.WEBHOOK_PORT,
+                    stop: Optional[asyncio.Event] = None) -> None:
+        server = await asyncio.start_server(self._handle, host, port)
+        logger.info(f"Webhook front listening on http://{host}:{port}{self.path}")
+        stop = stop or asyncio.Event()
+        async with server:
+            await stop.wait()
+
+async def _set_webhook(secret: str) -> None:
+    """WEBHOOK_URL থাকলে Telegram এ webhook সেট করা"""
+    if not config.WEBHOOK_URL:
+        logger.warning("WEBHOOK_URL not set; skipping setWebhook")
+        return
+    from telegram import Bot
+    async with Bot(config.TOKEN, base_url=config.TELEGRAM_BASE_URL) as b:
+        await b.set_webhook(url=config.WEBHOOK_URL, secret_token=secret,
+                            allowed_updates=['message', 'callback_query'])
+    logger.info(f"Webhook set to {config.WEBHOOK_URL}")
+
+async def _run_front(front: WebhookFront) -> None:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass
+    await _set_webhook(front.secret)
+    await front.serve(stop=stop)
+
+def run(workers: Optional[int] = None) -> None:
+    """webhook মোডে বট চালানো (db.init_db আগে থেকেই হয়ে থাকতে হবে)"""
+    if config.STORAGE_BACKEND != 'sqlite':
+        raise RuntimeError(f"STORAGE_BACKEND={config.STORAGE_BACKEND} is not supported by the bot; use sqlite")
+    secret = config.WEBHOOK_SECRET
+    if not secret:
+        if not config.WEBHOOK_URL:
+            # বাইরে থেকে সেট করা webhook এর secret জানা নেই; secret ছাড়া যে কেউ নকল আপডেট পাঠাতে পারে
+            raise RuntimeError("WEBHOOK_SECRET is required when WEBHOOK_URL is not set")
+        secret = secrets.token_urlsafe(32)
+        logger.info("WEBHOOK_SECRET not set; using a random secret for this run")
+    front = WebhookFront(workers or config.WEBHOOK_WORKERS, secret=secret)
+    if config.BACKUP_ENABLED:
+        # ফ্রন্টের খোলা connection: শেষ worker বন্ধ হলে SQLite WAL checkpoint করে মুছে ফেলে না
+        import db
+        db.get_conn()
+    front.start_workers()
+    try:
+        asyncio.run(_run_front(front))
+    finally:
+        logger.info(f"Shutting down webhook workers (routed={front.routed})")
+        front.stop_workers()
+        if config.BACKUP_ENABLED:
+            # শেষ শিপ সব worker (ও তাদের হ্যান্ডলার, জব) থামার পরে, যাতে কোনো commit বাদ না পড়ে
+            import backup
+            backup.shipper.ship_sync(checkpoint=True)